@@ -0,0 +1,142 @@
+# slamtec_emulator/action_history.py
+
+import array
+import bisect
+import collections
+import dataclasses
+import itertools
+import json
+import os
+import threading
+
+# Finished actions kept in memory per robot
+DEFAULT_RETENTION = int(os.environ.get("EMULATOR_ACTION_HISTORY", "1000"))
+
+# Directory for the spill files of evicted actions; unset keeps nothing on disk
+SPILL_DIR = os.environ.get("EMULATOR_ACTION_SPILL_DIR") or None
+
+
+class ActionHistory:
+    """
+    The finished actions of a robot, by action_id.
+
+    The newest 'retention' actions are kept in memory (oldest evicted first).
+    With a spill path, evicted actions are appended to a JSON-lines file and
+    stay available to get() and query(); only their id, file offset, result
+    and action name remain in memory, in compact arrays (~36 bytes each).
+
+    Actions are kept in the order they finished, which with queue priorities
+    and preemption is not the order of their ids.
+    """
+
+    def __init__(self, retention=None, spill_path=None):
+        self.retention = DEFAULT_RETENTION if retention is None else retention
+        self.spill_path = spill_path
+        self._recent = collections.OrderedDict()  # action_id -> ActionInfo, oldest first
+        self._lock = threading.Lock()
+        self.evicted = 0  # evicted and not spilled, i.e. forgotten
+
+        # Index of the spill file, one entry per spilled action, in eviction order
+        self._spill = None
+        self._spill_end = 0
+        self._spill_ids = array.array("q")
+        self._spill_offsets = array.array("q")
+        self._spill_results = array.array("b")
+        self._spill_names = array.array("H")  # index into _names
+        self._names = []
+        self._name_codes = {}
+        # The spilled ids sorted, with their index in the arrays above, for get()
+        self._sorted_ids = array.array("q")
+        self._sorted_indexes = array.array("q")
+
+    def __len__(self):
+        return len(self._recent) + len(self._spill_ids)
+
+    def add(self, action):
+        with self._lock:
+            self._recent[action.action_id] = action
+            while len(self._recent) > self.retention:
+                _, oldest = self._recent.popitem(last=False)
+                if self.spill_path is None:
+                    self.evicted += 1
+                else:
+                    self._write_spill(oldest)
+
+    def get(self, action_id, default=None):
+        """The ActionInfo of a recent action, or the dict of a spilled one."""
+        with self._lock:
+            action = self._recent.get(action_id)
+            if action is not None:
+                return action
+            i = bisect.bisect_left(self._sorted_ids, action_id)
+            if i < len(self._sorted_ids) and self._sorted_ids[i] == action_id:
+                return self._read_spill(self._sorted_indexes[i])
+        return default
+
+    def query(self, offset=0, limit=50, action_name=None, result=None):
+        """
+        Returns (actions, total): one page of the matching actions, newest
+        first, and the number of matching actions overall. Spilled actions
+        are filtered on the in-memory index and read only if on the page.
+        """
+        with self._lock:
+            recent = [
+                action
+                for action in reversed(self._recent.values())
+                if (action_name is None or action.action_name == action_name)
+                and (result is None or action.state.result == result)
+            ]
+            spilled = self._spilled_matches(action_name, result)
+            total = len(recent) + len(spilled)
+
+            page = recent[offset : offset + limit]
+            if len(page) < limit:
+                start = max(offset - len(recent), 0)
+                for i in itertools.islice(spilled, start, start + limit - len(page)):
+                    page.append(self._read_spill(i))
+        return page, total
+
+    # --- spill file ---
+
+    def _spilled_matches(self, action_name, result):
+        """Indexes of the matching spilled actions, newest first."""
+        indexes = range(len(self._spill_ids) - 1, -1, -1)
+        if action_name is not None:
+            code = self._name_codes.get(action_name)
+            names = self._spill_names
+            indexes = [i for i in indexes if names[i] == code]
+        if result is not None:
+            results = self._spill_results
+            indexes = [i for i in indexes if results[i] == result]
+        return indexes
+
+    def _write_spill(self, action):
+        if self._spill is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            self._spill = open(self.spill_path, "w+b")
+        record = json.dumps(dataclasses.asdict(action), separators=(",", ":")).encode()
+        self._spill.seek(self._spill_end)
+        self._spill_offsets.append(self._spill_end)
+        self._spill_end += self._spill.write(record + b"\n")
+        # Usually at or near the end: actions finish roughly in id order
+        i = bisect.bisect_left(self._sorted_ids, action.action_id)
+        self._sorted_ids.insert(i, action.action_id)
+        self._sorted_indexes.insert(i, len(self._spill_ids))
+        self._spill_ids.append(action.action_id)
+        self._spill_results.append(int(action.state.result))
+        name = str(action.action_name)
+        if name not in self._name_codes:
+            self._name_codes[name] = len(self._names)
+            self._names.append(name)
+        self._spill_names.append(self._name_codes[name])
+
+    def _read_spill(self, i):
+        self._spill.seek(self._spill_offsets[i])
+        return json.loads(self._spill.readline())
+
+
+def spill_path_for(device_id):
+    """The spill file of a robot, if spilling is enabled (EMULATOR_ACTION_SPILL_DIR)."""
+    if SPILL_DIR is None:
+        return None
+    return os.path.join(SPILL_DIR, f"actions-{device_id}.jsonl")
@@ -0,0 +1,541 @@
+# slamtec_emulator/actions.py
+"""
+Action simulations, the per-robot action queue and the motion loop that
+drives every running simulation of the process.
+
+A robot runs one action at a time. Actions submitted while it is busy wait
+in its ActionQueue, highest priority first and in submission order within a
+priority, instead of being refused. An action preempts (aborts) the running
+one when its priority is higher, and a MoveBy replaces a running MoveBy, so
+remote control commands sent periodically make one continuous motion. The
+priority is the "priority" field of the request (an emulator extension),
+else ACTION_PRIORITIES, else 0.
+
+Each Simulation is advanced one SIMULATION_TICK at a time by a single
+scheduler timer for all robots, which only exists while some robot is
+running a simulated action or moving. A simulation waiting on something
+else suspends instead: the robot leaves the timer until it is woken. Motion
+is such a wait: simulations hand it to the fleet's kinematics (see
+kinematics.py), which the same timer steps for all robots at once, and are
+woken when the robot has arrived. Actions without a simulation here complete
+as soon as they start.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+
+from kinematics import FleetKinematics
+from models.Action import SlamtecActionName, SlamtecActionResult, SlamtecActionStatus
+from scheduler import scheduler
+
+# Interval between two motion steps, in seconds (20 Hz by default)
+SIMULATION_TICK = 1 / float(os.environ.get("EMULATOR_MOTION_HZ", "20"))
+
+# Remote control speeds; navigation goes at the robot's base.max_moving_speed
+MOVE_SPEED = 0.5  # meters per second
+TURN_SPEED = 1.0  # radians per second
+
+# Duration of a MoveBy without "duration", in seconds (as on the robot)
+MOVE_BY_DURATION = 0.5
+
+# Actions a robot keeps waiting behind the running one; more are refused
+MAX_QUEUED = int(os.environ.get("EMULATOR_ACTION_QUEUE", "100"))
+
+DEFAULT_PRIORITY = 0
+# Remote control overrides navigation
+ACTION_PRIORITIES = {SlamtecActionName.MOVE_BY: 10}
+
+# (linear m/s, angular rad/s) of the MoveBy directions: forward, backward, right, left
+MOVE_BY_DIRECTIONS = {
+    0: (MOVE_SPEED, 0.0),
+    1: (-MOVE_SPEED, 0.0),
+    2: (0.0, -TURN_SPEED),
+    3: (0.0, TURN_SPEED),
+}
+
+NO_PATH = "Failed to find a path to the target"
+
+# Returned by start() or tick() to stop ticking until robot.wake_action()
+SUSPEND = object()
+
+log = logging.getLogger(__name__)
+
+
+class Simulation:
+    """
+    An action's behaviour. start() and tick() return None while the action
+    runs, SUSPEND while it waits to be woken, or (stage, result, reason) once
+    it has ended; both run with the robot's action lock held. This base class
+    ends at once, successfully.
+    """
+
+    moves = False  # whether the robot leaves its place (and its dock)
+
+    def __init__(self, options):
+        self.options = options if isinstance(options, dict) else {}
+
+    def prepare(self, robot):
+        """Work that can be done before start(), in the submitting request thread."""
+
+    def start(self, robot):
+        return None, SlamtecActionResult.SUCCESS, ""
+
+    def tick(self, robot):
+        return None
+
+    def abort(self, robot):
+        """Called when the action is aborted or preempted, with the robot's action lock held."""
+
+
+class FollowPath(Simulation):
+    """Follows a planned path through one or more targets."""
+
+    moves = True
+    stage = "MOVING_TO_TARGET"
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.path = None
+        self.prepared = False
+
+    def targets(self, robot):
+        """The (x, y) targets, in order."""
+        target = self.options.get("target") or {}
+        return [(target.get("x"), target.get("y"))]
+
+    def prepare(self, robot):
+        pose = robot.pose.snapshot()
+        start = (pose.x, pose.y)
+        grid = robot.planning_grid()
+        path = [[float(start[0]), float(start[1])]]
+        for x, y in self.targets(robot):
+            leg = grid.plan(start, (pose.x if x is None else x, pose.y if y is None else y))
+            if leg is None:
+                path = None
+                break
+            path += leg[1:]
+            start = leg[-1]
+        self.path = path
+        self.prepared = True
+
+    def start(self, robot):
+        if not self.prepared:
+            self.prepare(robot)
+        if self.path is None:
+            log.info("[Action %s] No path to %s", robot.current_action.action_id, self.targets(robot))
+            return "Failed", SlamtecActionResult.FAILED, NO_PATH
+        log.info("[Action %s] Started: Moving to %s", robot.current_action.action_id, self.path[-1])
+        robot._update_action(self.stage, status=SlamtecActionStatus.WORKING)
+        motion.kinematics.follow(robot, self.path)
+        return SUSPEND
+
+    def restart(self, robot, stage):
+        """Plans and starts following a new path (targets() changed), in 'stage'."""
+        FollowPath.prepare(self, robot)
+        self.stage = stage
+        return FollowPath.start(self, robot)
+
+    def tick(self, robot):
+        if motion.kinematics.moving(robot):
+            return SUSPEND
+        pose = robot.pose
+        log.info("[Action %s] Finished. Final pose: (%.2f, %.2f)", robot.current_action.action_id, pose.x, pose.y)
+        return self.arrived(robot)
+
+    def arrived(self, robot):
+        return "Arrived", SlamtecActionResult.SUCCESS, ""
+
+    def abort(self, robot):
+        motion.kinematics.stop(robot)
+
+
+class SeriesMoveTo(FollowPath):
+    """Goes through the "targets" in order."""
+
+    def targets(self, robot):
+        return [(target.get("x"), target.get("y")) for target in self.options.get("targets") or []]
+
+    def start(self, robot):
+        if not self.options.get("targets"):
+            return "Failed", SlamtecActionResult.FAILED, "No targets"
+        return super().start(robot)
+
+
+class GoHome(FollowPath):
+    """
+    Goes to the home pose, turns to its yaw and docks there unless
+    gohome_options.flags is "no_dock".
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.turning = False
+
+    def targets(self, robot):
+        home = robot.home_pose
+        return [(home["x"], home["y"])]
+
+    def tick(self, robot):
+        if not self.turning:
+            return super().tick(robot)
+        if motion.kinematics.moving(robot):
+            return SUSPEND
+        if (self.options.get("gohome_options") or {}).get("flags", "dock") == "dock":
+            robot.dock()
+            return "Docked", SlamtecActionResult.SUCCESS, ""
+        return "Arrived", SlamtecActionResult.SUCCESS, ""
+
+    def arrived(self, robot):
+        self.turning = True
+        motion.kinematics.rotate_to(robot, robot.home_pose.get("yaw", 0.0))
+        return SUSPEND
+
+
+class RotateTo(Simulation):
+    """Turns in place to the yaw "angle", the short way round."""
+
+    moves = True
+
+    def start(self, robot):
+        angle = self.options.get("angle")
+        if not isinstance(angle, (int, float)):
+            return "Failed", SlamtecActionResult.FAILED, "angle is required"
+        robot._update_action("ROTATING", status=SlamtecActionStatus.WORKING)
+        motion.kinematics.rotate_to(robot, angle)
+        return SUSPEND
+
+    def tick(self, robot):
+        if motion.kinematics.moving(robot):
+            return SUSPEND
+        return "Arrived", SlamtecActionResult.SUCCESS, ""
+
+    def abort(self, robot):
+        motion.kinematics.stop(robot)
+
+
+class MoveBy(Simulation):
+    """
+    Remote control: drives in a "direction", or forward while turning at
+    "theta" rad/s, for "duration" ms, then brakes. Like the robot, it does
+    not avoid obstacles.
+    """
+
+    moves = True
+
+    def start(self, robot):
+        direction, theta = self.options.get("direction"), self.options.get("theta")
+        if direction in MOVE_BY_DIRECTIONS:
+            linear, angular = MOVE_BY_DIRECTIONS[direction]
+        elif isinstance(theta, (int, float)):
+            linear, angular = MOVE_SPEED, float(theta)
+        else:
+            return "Failed", SlamtecActionResult.FAILED, "direction or theta is required"
+        duration = self.options.get("duration")
+        duration = duration / 1000 if isinstance(duration, (int, float)) else MOVE_BY_DURATION
+        robot._update_action("MOVING", status=SlamtecActionStatus.WORKING)
+        motion.kinematics.drive(robot, linear, angular, max(duration, SIMULATION_TICK))
+        return SUSPEND
+
+    def tick(self, robot):
+        if motion.kinematics.moving(robot):
+            return SUSPEND
+        return "Done", SlamtecActionResult.SUCCESS, ""
+
+    def abort(self, robot):
+        motion.kinematics.stop(robot)
+
+
+class EnterElevator(Simulation):
+    """
+    Calls the "elevator_id" car to the robot's floor and gets in when it has
+    room. The robot then rides it until a LeaveElevator.
+    """
+
+    moves = True
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.elevator = None
+
+    def start(self, robot):
+        elevator = robot.world.elevators.get(self.options.get("elevator_id"))
+        if elevator is None or not elevator.serves(robot.floor.name):
+            return "Failed", SlamtecActionResult.FAILED, "Unknown elevator on this floor"
+        if robot.curr_floor["elevator"]:
+            return "Failed", SlamtecActionResult.FAILED, "Already in an elevator"
+        self.elevator = elevator
+        robot._update_action("WAITING_FOR_ELEVATOR", status=SlamtecActionStatus.WORKING)
+        elevator.call(robot, robot.floor.name)
+        return self.tick(robot)
+
+    def tick(self, robot):
+        if robot.curr_floor["elevator"] != self.elevator.id:
+            return SUSPEND
+        return "Entered", SlamtecActionResult.SUCCESS, ""
+
+    def abort(self, robot):
+        if self.elevator is not None:
+            self.elevator.cancel(robot)
+
+
+class LeaveElevator(FollowPath):
+    """
+    Rides to the floor set with setCurrentFloor, then drives out of the car
+    to "target" (default: the elevator's waiting pose on that floor).
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.elevator = None
+        self.leaving = False
+
+    def targets(self, robot):
+        target = self.options.get("target") or self.elevator.waiting_pose
+        return [(target.get("x"), target.get("y"))]
+
+    def prepare(self, robot):
+        """Plans once out, on the floor the robot leaves the car."""
+
+    def start(self, robot):
+        elevator_id = robot.curr_floor["elevator"]
+        if not elevator_id or self.options.get("elevator_id") not in (None, elevator_id):
+            return "Failed", SlamtecActionResult.FAILED, "Not in this elevator"
+        self.elevator = robot.world.elevators[elevator_id]
+        if self.elevator.riding(robot) and self.elevator.destination(robot) is None:
+            return "Failed", SlamtecActionResult.FAILED, "No destination floor, set it with setCurrentFloor"
+        robot._update_action("TAKING_ELEVATOR", status=SlamtecActionStatus.WORKING)
+        return self.tick(robot)
+
+    def tick(self, robot):
+        if self.leaving:
+            return super().tick(robot)
+        if self.elevator.riding(robot):
+            return SUSPEND
+        self.leaving = True
+        robot.curr_floor.update({"elevator": ""})
+        return self.restart(robot, "LEAVING_ELEVATOR")
+
+
+class MultiFloorMove(FollowPath):
+    """
+    Goes to a POI ("target": {"poi_name"}) or a pose ("target": {"building",
+    "floor", "pose"}) on any floor: to the waiting pose of the elevator that
+    should come first, up or down in it, then on to the target.
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.goal = None  # (x, y) of the current leg
+        self.target = None  # (x, y) on the target floor
+        self.floor = None  # target Floor
+        self.elevator = None
+        self.phase = None  # to_elevator, waiting, riding or to_target
+
+    def targets(self, robot):
+        return [self.goal]
+
+    def prepare(self, robot):
+        """Plans in start(), once the target floor is known."""
+
+    def start(self, robot):
+        target = self.options.get("target") or {}
+        if "poi_name" in target:
+            self.floor, poi = robot.find_poi(target["poi_name"])
+            if poi is None:
+                return "Failed", SlamtecActionResult.FAILED, f"POI {target['poi_name']} not found"
+            pose = poi["pose"]
+        else:
+            self.floor = robot.world.floor(target.get("floor"), target.get("building"))
+            if self.floor is None:
+                return "Failed", SlamtecActionResult.FAILED, f"Unknown floor {target.get('floor')}"
+            pose = target.get("pose") or {}
+        self.target = (pose.get("x"), pose.get("y"))
+        if robot.curr_floor["elevator"]:
+            return "Failed", SlamtecActionResult.FAILED, "Leave the elevator first"
+        if self.floor is robot.floor:
+            return self._to_target(robot)
+
+        self.elevator = robot.world.elevator_between(robot.floor.name, self.floor.name)
+        if self.elevator is None:
+            return "Failed", SlamtecActionResult.FAILED, f"No elevator to floor {self.floor.name}"
+        self.elevator.reserve(robot)
+        self.phase = "to_elevator"
+        waiting = self.elevator.waiting_pose
+        self.goal = (waiting["x"], waiting["y"])
+        ended = self.restart(robot, "MOVING_TO_ELEVATOR")
+        if ended is not SUSPEND:
+            self.elevator.cancel(robot)
+        return ended
+
+    def _to_target(self, robot):
+        self.phase = "to_target"
+        self.goal = self.target
+        return self.restart(robot, "MOVING_TO_TARGET")
+
+    def tick(self, robot):
+        # Boarding sets curr_floor's elevator, arriving changes the floor
+        if self.phase == "waiting":
+            if robot.curr_floor["elevator"] != self.elevator.id:
+                return SUSPEND
+            self.phase = "riding"
+            robot._update_action("TAKING_ELEVATOR")
+        if self.phase == "riding":
+            if robot.floor is not self.floor:
+                return SUSPEND
+            robot.curr_floor.update({"elevator": ""})
+            return self._to_target(robot)
+        return super().tick(robot)
+
+    def arrived(self, robot):
+        if self.phase != "to_elevator":
+            return super().arrived(robot)
+        self.phase = "waiting"
+        robot._update_action("WAITING_FOR_ELEVATOR")
+        self.elevator.call(robot, robot.floor.name, self.floor.name)
+        return SUSPEND
+
+    def abort(self, robot):
+        super().abort(robot)
+        if self.phase in ("to_elevator", "waiting"):
+            self.elevator.cancel(robot)
+
+
+SIMULATIONS = {
+    SlamtecActionName.MOVE_TO: FollowPath,
+    SlamtecActionName.SERIES_MOVE_TO: SeriesMoveTo,
+    SlamtecActionName.GO_HOME: GoHome,
+    SlamtecActionName.ROTATE_TO: RotateTo,
+    SlamtecActionName.MOVE_BY: MoveBy,
+    SlamtecActionName.ENTER_ELEVATOR: EnterElevator,
+    SlamtecActionName.LEAVE_ELEVATOR: LeaveElevator,
+    SlamtecActionName.MULTI_FLOOR_MOVE: MultiFloorMove,
+}
+
+
+def simulation_for(action_name, options):
+    return SIMULATIONS.get(action_name, Simulation)(options)
+
+
+def default_priority(action_name):
+    return ACTION_PRIORITIES.get(action_name, DEFAULT_PRIORITY)
+
+
+class QueuedAction:
+    """An action with its priority and simulation, queued or running."""
+
+    __slots__ = ("info", "priority", "simulation", "seq")
+
+    def __init__(self, info, priority, simulation):
+        self.info = info  # ActionInfo, replaced (not changed) by the robot
+        self.priority = priority
+        self.simulation = simulation
+        self.seq = 0
+
+    def preempted_by(self, action):
+        """Whether 'action' aborts this running action rather than waiting for it."""
+        if action.priority != self.priority:
+            return action.priority > self.priority
+        return isinstance(action.simulation, MoveBy) and isinstance(self.simulation, MoveBy)
+
+
+class ActionQueue:
+    """
+    The actions waiting for a robot, highest priority first, then in
+    submission order. Changed with the robot's action lock held; get() and
+    len() are safe without it. Removed actions stay in the heap until they
+    reach its top, so removing one never scans the queue.
+    """
+
+    def __init__(self):
+        self._heap = []  # (-priority, seq, action_id)
+        self._actions = {}  # action_id -> QueuedAction
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._actions)
+
+    def push(self, action):
+        action.seq = next(self._seq)
+        self._actions[action.info.action_id] = action
+        heapq.heappush(self._heap, (-action.priority, action.seq, action.info.action_id))
+
+    def pop(self):
+        """The next action to run, or None."""
+        while self._heap:
+            action = self._actions.pop(heapq.heappop(self._heap)[2], None)
+            if action is not None:
+                return action
+        return None
+
+    def get(self, action_id):
+        return self._actions.get(action_id)
+
+    def remove(self, action_id):
+        return self._actions.pop(action_id, None)
+
+    def clear(self):
+        """Empties the queue; returns the removed actions in running order."""
+        actions = self.ordered()
+        self._actions = {}
+        self._heap = []
+        return actions
+
+    def ordered(self):
+        return sorted(self._actions.values(), key=lambda action: (-action.priority, action.seq))
+
+
+class MotionLoop:
+    """
+    One scheduler timer that steps the kinematics of the process's fleet and
+    then ticks the running simulation of every robot in the loop, every
+    SIMULATION_TICK. Robots join when they start a simulated action or are
+    woken and leave when they have none left or suspend (both with their
+    action lock held); robots whose motion completed are woken first.
+    """
+
+    def __init__(self):
+        self._robots = {}  # insertion-ordered set
+        self._lock = threading.Lock()
+        self._timer = None
+        self.kinematics = FleetKinematics(on_command=self._start)
+
+    def __len__(self):
+        return len(self._robots)
+
+    def add(self, robot):
+        with self._lock:
+            self._robots[robot] = None
+            self._start_timer()
+
+    def discard(self, robot):
+        with self._lock:
+            self._robots.pop(robot, None)
+
+    def _start(self):
+        with self._lock:
+            self._start_timer()
+
+    def _start_timer(self):
+        """Call with _lock held."""
+        if self._timer is None:
+            self._timer = scheduler.call_every(SIMULATION_TICK, self._tick, delay=SIMULATION_TICK)
+
+    def _tick(self):
+        for robot in self.kinematics.step(SIMULATION_TICK):
+            robot.wake_action()
+        with self._lock:
+            robots = list(self._robots)
+        for robot in robots:
+            robot.tick_action()
+        with self._lock:
+            # A command given since active was read starts a new timer
+            if not self._robots and not self.kinematics.active:
+                self._timer = None
+                return False
+        return True
+
+
+motion = MotionLoop()
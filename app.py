@@ -1,12 +1,49 @@
 # slamtec_emulator/app.py
 
+import argparse
 import json
+import logging
+import math
+import os
 import re
-from flask import Flask, jsonify, request, Response
-from mock_data import robot_state
+import uuid
+from dataclasses import asdict
+from flask import Flask, jsonify, request, Response, has_request_context
+from werkzeug.local import LocalProxy
+from actions import motion
+from event_bus import READ_LIMIT
+from fleet import Fleet, FleetDispatcher, serve_fleet_ports
+from laser_scan import scanner
+import faults
+import logs
+import metrics
+import mock_data
+import recorder
+import snapshot
+import validation
+import world
+from occupancy_map import load_map, set_default_map
+from planner import parse_segment
+from response_cache import dumps
+from spec import load_examples, load_requests, load_route_manifest
+from scheduler import scheduler
+from streaming import Payload, payload_response
+import stcm
 
 # from models.Action import ActionInfo
+from models.Action import SlamtecActionResult
 from models.Cargo import DoorStatus
+from models.Task import DeliveryTaskStatus
+
+# Longest long poll of GET /api/platform/v1/events, in seconds
+MAX_EVENT_WAIT = 30.0
+# Interval of keepalive comments on an idle event stream, in seconds
+SSE_KEEPALIVE = 15.0
+# Largest page of GET /api/core/motion/v1/actions
+MAX_ACTIONS_PAGE = 1000
+
+log = logging.getLogger(__name__)
+
 # --- Utility Functions ---
 
 
@@ -15,36 +52,69 @@ def convert_path_to_flask(path):
     return re.sub(r"{(\w+)}", r"<string:\1>", path)
 
 
-# --- Flask App Initialization ---
+# --- Robot State ---
+
+# All robots hosted by this process. A single-robot fleet behaves exactly like
+# the original emulator; see fleet.py for how requests pick a robot.
+fleet = Fleet()
+
+
+def get_robot_state():
+    """Returns the RobotState addressed by the current request."""
+    if has_request_context():
+        return fleet.resolve(request.environ)
+    return fleet.default
+
 
-app = Flask(__name__)
+# Handlers use robot_state as before; it resolves to the right robot per request.
+robot_state = LocalProxy(get_robot_state)
 
 # --- Mock API Logic Functions ---
 
 
+def cached_json(name, version, build):
+    """
+    A JSON response from the robot's response cache (see response_cache.py):
+    the body is only encoded again once 'version' changes, and clients whose
+    If-None-Match still names it get a 304.
+    """
+    body, etag = robot_state.responses.get(name, version, build)
+    headers = {"ETag": f'"{etag}"'}
+    if "If-None-Match" in request.headers and request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype="application/json", headers=headers)
+
+
+def cached_dict(name, state):
+    """cached_json for a VersionedDict of the robot state."""
+    return cached_json(name, state.version, lambda: state)
+
+
 def get_power_status():
     """Handler for GET /api/core/system/v1/power/status"""
-    return jsonify(robot_state.power_status)
+    return cached_dict("power_status", robot_state.power_status)
 
 
 def get_robot_info():
     """Handler for GET /api/core/system/v1/robot/info"""
-    return jsonify(robot_state.robot_info)
+    return cached_dict("robot_info", robot_state.robot_info)
 
 
 def get_robot_health():
     """Handler for GET /api/core/system/v1/robot/health"""
-    return jsonify(robot_state.robot_health)
+    return cached_dict("robot_health", robot_state.robot_health)
 
 
 def shutdown_robot():
     """Handler for POST /api/core/system/v1/power/:shutdown"""
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     shutdown_time = data.get("shutdown_time_interval", 0)
     restart_time = data.get("restart_time_interval", 0)
 
-    print(
-        f"Received shutdown request: shutdown in {shutdown_time} mins, restart in {restart_time} mins."
+    log.info(
+        "Received shutdown request: shutdown in %s mins, restart in %s mins.",
+        shutdown_time,
+        restart_time,
     )
     # Here you could simulate a state change
     robot_state.power_status["powerStage"] = "shutingdown"
@@ -53,43 +123,84 @@ def shutdown_robot():
 
 def get_pose():
     """Handler for GET /api/core/slam/v1/localization/pose"""
-    return jsonify(robot_state.pose)
+    return jsonify(robot_state.pose.to_dict())
+
+
+def get_odo_pose():
+    """Handler for GET /api/core/slam/v1/localization/odopose"""
+    return jsonify(robot_state.odo_pose())
+
+
+def get_odometry():
+    """Handler for GET /api/core/statistics/v1/odometry: the distance travelled, in meters"""
+    return jsonify(robot_state.odometry())
 
 
 def set_pose():
     """Handler for PUT /api/core/slam/v1/localization/pose"""
     new_pose_data = request.get_json()
     robot_state.update_pose(new_pose_data)
-    print(f"Robot pose updated to: {robot_state.pose}")
-    return jsonify({"status": "success", "pose": robot_state.pose})
+    log.debug("Robot pose updated to: %s", robot_state.pose)
+    return jsonify({"status": "success", "pose": robot_state.pose.to_dict()})
 
 
 def get_current_pois():
-    """Handler for GET /api/core/artifact/v1/pois"""
+    """
+    Handler for GET /api/core/artifact/v1/pois
+    Optional min_x/min_y/max_x/max_y query parameters restrict the listing to a region.
+    """
+    bounds = {
+        key: request.args.get(key, type=float)
+        for key in ("min_x", "min_y", "max_x", "max_y")
+        if key in request.args
+    }
+    if bounds:
+        return jsonify(robot_state.pois.within(**bounds))
     return jsonify(list(robot_state.pois.values()))
 
 
+def get_poi_by_id(poi_id):
+    """Handler for GET /api/core/artifact/v1/pois/{poi_id}"""
+    poi = robot_state.pois.get(poi_id)
+    if poi is None:
+        return jsonify({"error": "POI not found"}), 404
+    return jsonify(poi)
+
+
+def modify_poi(poi_id):
+    """Handler for PUT /api/core/artifact/v1/pois/{poi_id}"""
+    data = request.get_json(silent=True) or {}
+    if robot_state.modify_poi(poi_id, data.get("pose"), data.get("metadata")) is None:
+        return jsonify({"error": "POI not found"}), 404
+    return jsonify(True)
+
+
+def search_nearby_poi():
+    """
+    Handler for POST /api/multi-floor/map/v1/pois/:search_nearby
+    An optional {"max_distance": meters} body limits how far the search goes.
+    """
+    data = request.get_json(silent=True) or {}
+    return jsonify(robot_state.search_nearby_poi(data.get("max_distance")))
+
+
 def add_poi():
     """Handler for POST /api/core/artifact/v1/pois"""
     poi_data = request.get_json()
     new_poi = robot_state.add_poi(poi_data)
-    print(f"Added new POI: {new_poi}")
+    log.debug("Added new POI: %s", new_poi)
     return jsonify(new_poi), 201
 
 
 def delete_poi(poi_id):
     """Handler for DELETE /api/core/artifact/v1/pois/{poi_id}"""
     if robot_state.delete_poi(poi_id):
-        print(f"Deleted POI with ID: {poi_id}")
+        log.debug("Deleted POI with ID: %s", poi_id)
         return jsonify(True)
     else:
         return jsonify({"error": "POI not found"}), 404
 
 
-@app.route(
-    "/api/delivery/v1/cargos/<string:cargo_id>/boxes/<int:box_id>/<string:op>",
-    methods=["PUT"],
-)
 def operate_box(cargo_id, box_id, op):
     """
     Triggers a box to open or close, interrupting any prior command.
@@ -132,15 +243,19 @@ def create_action():
 
     action_name = data.get("action_name")
     options = data.get("options", {})
+    # Emulator extension: the action's place in the queue (see actions.py)
+    priority = data.get("priority")
+    if priority is not None and type(priority) is not int:
+        return jsonify({"error": "priority must be an integer"}), 400
 
-    # Try to start the new action
-    action_info = robot_state.start_new_action(action_name, options)
+    # Start the new action, or queue it behind the running one
+    action_info = robot_state.start_new_action(action_name, options, priority)
 
     if not action_info:
         return jsonify(
             {
                 "error": "Failed to create action",
-                "reason": "Another action is already in progress.",
+                "reason": "Another action is already in progress and the action queue is full.",
             }
         ), 400  # 400 Bad Request is appropriate here
 
@@ -150,33 +265,195 @@ def create_action():
 def clear_pois():
     """Handler for DELETE /api/core/artifact/v1/pois"""
     robot_state.pois.clear()
-    print("All POIs cleared.")
+    log.debug("All POIs cleared.")
     return jsonify(True)
 
 
-@app.route(
-    "/api/core/motion/v1/actions/<int:action_id>",
-    methods=["GET"],
-)
 def getActionResult(action_id):
-    """Handler for query /api/core/motion/v1/actions/{}"""
+    """Handler for query /api/core/motion/v1/actions/{}: a running, queued or finished action"""
     if action_id == -1:
         return jsonify({"error": f"Action ID {action_id} not found"}), 404
-    if robot_state.current_action is not None:
-        if robot_state.current_action.action_id == action_id:
-            return jsonify((robot_state.current_action)), 200
-
-    value = robot_state.action_history.get(action_id, None)
+    value = robot_state.find_action(action_id)
     if value is not None:
         return jsonify(value), 200
     return jsonify({"error": f"Action ID {action_id} not found"}), 404
 
 
+def list_actions():
+    """
+    Handler for GET /api/core/motion/v1/actions (not in the spec): the
+    finished actions, newest first, paginated with ?offset=&limit= and
+    filtered by ?action_name= and ?result= (0, -1, -2 or SUCCESS, FAILED, ABORTED).
+    """
+    result = request.args.get("result")
+    if result is not None:
+        try:
+            result = int(result) if result.lstrip("-").isdigit() else SlamtecActionResult[result.upper()]
+        except KeyError:
+            return jsonify({"error": f"Unknown action result: {result}"}), 400
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    limit = min(max(request.args.get("limit", 50, type=int), 0), MAX_ACTIONS_PAGE)
+    actions, total = robot_state.action_history.query(
+        offset, limit, action_name=request.args.get("action_name"), result=result
+    )
+    return jsonify({"total": total, "offset": offset, "limit": limit, "actions": actions})
+
+
+def search_path():
+    """Handler for POST /api/core/motion/v1/:search_path"""
+    data = request.get_json(silent=True) or {}
+    path = robot_state.search_path(data.get("target") or {})
+    return jsonify({"path_points": path or []})
+
+
+def get_lines(usage):
+    """Handler for GET /api/core/artifact/v1/lines/{usage}"""
+    store = robot_state.lines(usage)
+    if store is None:
+        return jsonify({"error": f"Invalid usage {usage}"}), 400
+    return jsonify(list(store.values()))
+
+
+def _check_lines(lines):
+    """Raises ValueError unless 'lines' is a list of lines the planner can use."""
+    if not isinstance(lines, list):
+        raise ValueError("a list of lines is required")
+    for line in lines:
+        parse_segment(line)
+
+
+def add_lines(usage):
+    """Handler for POST /api/core/artifact/v1/lines/{usage}"""
+    if robot_state.lines(usage) is None:
+        return jsonify({"error": f"Invalid usage {usage}"}), 400
+    lines = request.get_json(silent=True) or []
+    try:
+        _check_lines(lines)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    robot_state.add_lines(usage, lines)
+    return jsonify(True)
+
+
+def modify_lines(usage):
+    """Handler for PUT /api/core/artifact/v1/lines/{usage}"""
+    if robot_state.lines(usage) is None:
+        return jsonify({"error": f"Invalid usage {usage}"}), 400
+    lines = request.get_json(silent=True) or []
+    try:
+        _check_lines(lines)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    robot_state.modify_lines(usage, lines)
+    return jsonify(True)
+
+
+def clear_lines(usage):
+    """Handler for DELETE /api/core/artifact/v1/lines/{usage}"""
+    if robot_state.lines(usage) is None:
+        return jsonify({"error": f"Invalid usage {usage}"}), 400
+    robot_state.clear_lines(usage)
+    return jsonify(True)
+
+
+def remove_line_by_id(usage, id):
+    """Handler for DELETE /api/core/artifact/v1/lines/{usage}/{id}"""
+    if robot_state.lines(usage) is None or not id.isdigit():
+        return jsonify({"error": f"Invalid line {usage}/{id}"}), 400
+    return jsonify(robot_state.remove_line(usage, int(id)))
+
+
+def get_rectangle_areas(usage):
+    """Handler for GET /api/core/artifact/v1/rectangle-areas/{usage}"""
+    return jsonify(list(robot_state.rectangle_areas.get(usage, {}).values()))
+
+
+def add_rectangle_area(usage):
+    """Handler for POST /api/core/artifact/v1/rectangle-areas/{usage}"""
+    data = request.get_json(silent=True) or {}
+    if "area" not in data:
+        return jsonify({"error": "area is required"}), 400
+    try:
+        parse_segment(data["area"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    robot_state.add_rectangle_area(usage, data)
+    return jsonify(True)
+
+
+def edit_rectangle_area(usage, id):
+    """Handler for PUT /api/core/artifact/v1/rectangle-areas/{usage}/{id}"""
+    if not id.isdigit():
+        return jsonify({"error": f"Invalid area id {id}"}), 400
+    data = request.get_json(silent=True) or {}
+    if "area" in data:
+        try:
+            parse_segment(data["area"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    return jsonify(robot_state.edit_rectangle_area(usage, int(id), data))
+
+
+def remove_rectangle_area_by_id(usage, id):
+    """Handler for DELETE /api/core/artifact/v1/rectangle-areas/{usage}/{id}"""
+    if not id.isdigit():
+        return jsonify({"error": f"Invalid area id {id}"}), 400
+    return jsonify(robot_state.remove_rectangle_area(usage, int(id)))
+
+
+def clear_rectangle_areas(usage):
+    """Handler for DELETE /api/core/artifact/v1/rectangle-areas/{usage}"""
+    robot_state.clear_rectangle_areas(usage)
+    return jsonify(True)
+
+
 def get_binary_map():
     """Handler for GET /api/core/slam/v1/maps/stcm"""
-    # Simulate a binary map file response
-    dummy_map_data = b"\xde\xad\xbe\xef" * 100  # Dummy binary data
-    return Response(dummy_map_data, mimetype="application/octet-stream")
+    occupancy_map = robot_state.map
+    payload = Payload(
+        stcm.encode(occupancy_map, robot_state.map_artifacts()),
+        f"stcm-{occupancy_map.version}-{robot_state.artifacts_version}",
+    )
+    return payload_response(payload, request)
+
+
+def set_composite_map():
+    """Handler for PUT /api/core/slam/v1/maps/stcm"""
+    try:
+        occupancy_map, artifacts = stcm.decode(request.get_data())
+    except stcm.StcmError as e:
+        return jsonify({"error": str(e)}), 400
+    robot_state.set_map(occupancy_map, artifacts)
+    return jsonify(True)
+
+
+def get_explore_map():
+    """Handler for GET /api/core/slam/v1/maps/explore[?min_x=&min_y=&max_x=&max_y=]"""
+    occupancy_map = robot_state.map
+    window = occupancy_map.window(
+        *(request.args.get(k, type=float) for k in ("min_x", "min_y", "max_x", "max_y"))
+    )
+    payload = Payload(
+        occupancy_map.explore_segments(*window),
+        "explore-{}-{}-{}-{}-{}".format(occupancy_map.version, *window),
+    )
+    return payload_response(payload, request)
+
+
+def get_known_area():
+    """Handler for GET /api/core/slam/v1/knownarea"""
+    return jsonify(robot_state.map.known_area())
+
+
+def clear_map():
+    """Handler for DELETE /api/core/slam/v1/maps"""
+    robot_state.clear_map()
+    return jsonify(True)
+
+
+def get_laser_scan():
+    """Handler for GET /api/core/system/v1/laserscan"""
+    return Response(scanner.scan(robot_state.map, robot_state.pose), mimetype="application/json")
 
 
 def get_localization_quality():
@@ -186,18 +463,94 @@ def get_localization_quality():
 
 def get_cargos():
     """Handler for GET /api/delivery/v1/cargos"""
-    ret = []
-    for cargo in robot_state.cargos:
-        ret.append(cargo.to_dict())
-    return jsonify(ret)
+    cargos = robot_state.cargos
+    return cached_json(
+        "cargos",
+        tuple(cargo.version for cargo in cargos),
+        lambda: [cargo.to_dict() for cargo in cargos],
+    )
+
+
+def get_tasks():
+    """Handler for GET /api/delivery/v1/tasks?type=&status="""
+    tasks = robot_state.tasks.list(request.args.get("status"), request.args.get("type"))
+    return jsonify([task.to_dict() for task in tasks])
+
+
+def create_task():
+    """Handler for POST /api/delivery/v1/tasks, one PostTaskRequestEntry"""
+    order_ids, errors = robot_state.tasks.submit([request.get_json()])
+    if not order_ids:
+        return jsonify({"result": False, "errors": errors})
+    return jsonify({"result": True, "order_id": order_ids[0], "errors": []})
+
+
+def create_tasks():
+    """Handler for POST /api/delivery/v1/tasks/:batch, a list of PostTaskRequestEntry"""
+    order_ids, errors = robot_state.tasks.submit(request.get_json())
+    return jsonify({"result": not errors, "order_ids": order_ids, "errors": errors})
+
+
+def cancel_all_tasks():
+    """Handler for DELETE /api/delivery/v1/tasks"""
+    canceled = robot_state.tasks.cancel_all()
+    return jsonify({"status": "success", "canceled": canceled})
+
+
+def cancel_task_by_task_id(task_id):
+    """Handler for DELETE /api/delivery/v1/tasks/<task_id>"""
+    if not robot_state.tasks.cancel(task_id):
+        return jsonify({"error": f"No unfinished task {task_id}"}), 404
+    return jsonify({"status": "success"})
+
+
+def cancel_task_by_order_id(order_id):
+    """Handler for DELETE /api/delivery/v1/tasks/orders/<order_id>"""
+    if not robot_state.tasks.cancel_order(order_id):
+        return jsonify({"error": f"No unfinished task for order {order_id}"}), 404
+    return jsonify({"status": "success"})
+
+
+def set_task_execution():
+    """Handler for PUT /api/delivery/v1/tasks/:task_execution"""
+    data = request.get_json(silent=True) or {}
+    tasks = robot_state.tasks
+    if "enable_task_execution" in data:
+        tasks.set_execution(data["enable_task_execution"])
+    return jsonify({"enable_task_execution": tasks.execution_enabled})
+
+
+def end_task():
+    """Handler for PUT /api/delivery/v1/tasks/:task_finish: the running and queued tasks succeed"""
+    robot_state.tasks.cancel_all(DeliveryTaskStatus.SUCCEEDED, "")
+    return "", 204
+
+
+def start_pickup():
+    """Handler for PUT /api/delivery/v1/tasks/:start_pickup"""
+    robot_state.tasks.start_pickup()
+    return "", 204
+
+
+def end_pickup():
+    """Handler for PUT /api/delivery/v1/tasks/:end_pickup"""
+    robot_state.tasks.end_pickup()
+    return "", 204
 
 
 # A generic handler for endpoints that are not yet specifically implemented
 def generic_handler(*args, **kwargs):
-    print(f"Generic handler called for: {request.path} [{request.method}]")
-    print(f"Path args: {kwargs}")
-    if request.is_json:
-        print(f"Request JSON: {request.get_json()}")
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Generic handler called for: %s [%s]", request.path, request.method)
+        log.debug("Path args: %s", kwargs)
+        if request.is_json:
+            log.debug("Request JSON: %s", request.get_json(silent=True))
+
+    # The example response compiled from the spec's response schema
+    example = example_responses.get(request.endpoint)
+    if example is not None:
+        body, status, mimetype = example
+        return Response(body, status=status, mimetype=mimetype)
 
     # Return a generic success response for POST/PUT/DELETE
     if request.method in ["POST", "PUT", "DELETE"]:
@@ -212,12 +565,19 @@ def generic_handler(*args, **kwargs):
     return jsonify({"message": f"Endpoint {request.path} not fully implemented."})
 
 
+def encode_example(status, media_type, example):
+    """The (body, status, mimetype) served by generic_handler for a compiled spec example."""
+    if media_type is None or example is None:
+        return b"", status, media_type
+    if media_type == "text/plain" and isinstance(example, str):
+        return example.encode(), status, media_type
+    return dumps(example), status, media_type
+
+
 def get_current_action():
-    if (
-        robot_state.current_action is not None
-        and robot_state.current_action.action_id != -1
-    ):
-        return jsonify(robot_state.current_action)
+    current_action = robot_state.current_action  # read once, the simulation replaces it
+    if current_action is not None and current_action.action_id != -1:
+        return jsonify(current_action)
     else:
         return jsonify("Action Not Found"), 404
 
@@ -229,12 +589,427 @@ def abort_current_action():
     return jsonify({"status": "success", "message": "Action aborted."}), 200
 
 
+def get_action_queue():
+    """
+    Handler for GET /emulator/v1/actions/queue (not in the spec): the actions
+    waiting behind the current one, in the order they will run.
+    """
+    queued = robot_state.action_queue.ordered()
+    return jsonify(
+        {
+            "depth": len(queued),
+            "actions": [{**asdict(action.info), "priority": action.priority} for action in queued],
+        }
+    )
+
+
+def clear_action_queue():
+    """Handler for DELETE /emulator/v1/actions/queue: aborts every queued action"""
+    return jsonify({"removed": robot_state.clear_action_queue()})
+
+
+def cancel_action(action_id):
+    """Handler for DELETE /emulator/v1/actions/<action_id>: aborts a running or queued action"""
+    if not robot_state.cancel_action(action_id):
+        return jsonify({"error": f"Action ID {action_id} is neither running nor queued"}), 404
+    return jsonify({"status": "success"})
+
+
+def get_home_pose():
+    """Handler for GET /api/core/slam/v1/homepose"""
+    return jsonify(robot_state.home_pose)
+
+
+def set_home_pose():
+    """Handler for PUT /api/core/slam/v1/homepose"""
+    data = request.get_json(silent=True) or {}
+    robot_state.home_pose = {**robot_state.home_pose, **data}
+    return jsonify(True)
+
+
 def get_current_floor():
-    return jsonify(robot_state.curr_floor), 200
+    return cached_dict("curr_floor", robot_state.curr_floor)
+
+
+# --- Multi-floor (see world.py) ---
+
+
+def _floor_arg(args):
+    """The Floor named by ?floor=&building=: None for every floor, False if unknown."""
+    if not args.get("floor"):
+        return None
+    return robot_state.world.floor(args["floor"], args.get("building")) or False
+
+
+def get_floors():
+    """Handler for GET /api/multi-floor/map/v1/floors"""
+    return jsonify([floor.info() for floor in robot_state.world.floors.values()])
+
+
+def set_current_floor():
+    """
+    Handler for PUT /api/multi-floor/map/v1/floors/:current
+    In an elevator, the robot rides to that floor instead (see LeaveElevatorAction).
+    """
+    data = request.get_json(silent=True) or {}
+    robot = get_robot_state()
+    floor = robot.world.floor(data.get("floor"), data.get("building"))
+    if floor is None:
+        return jsonify({"error": f"Unknown floor {data.get('floor')}"}), 400
+    elevator = robot.world.elevators.get(robot.curr_floor["elevator"])
+    if elevator is not None and elevator.riding(robot):
+        if not elevator.serves(floor.name):
+            return jsonify({"error": f"Elevator {elevator.id} does not serve floor {floor.name}"}), 400
+        elevator.send(robot, floor.name)
+    else:
+        robot.change_floor(floor, data.get("pose"))
+    return jsonify(True)
+
+
+def get_all_pois():
+    """Handler for GET /api/multi-floor/map/v1/pois?floor=&building="""
+    floor = _floor_arg(request.args)
+    if floor is False:
+        return jsonify({"error": "Invalid floor or building"}), 400
+    floors = [floor] if floor else robot_state.world.floors.values()
+    pois = []
+    for floor in floors:
+        for poi in robot_state.floor_pois(floor):
+            metadata = poi.get("metadata", {})
+            pose = poi.get("pose", {})
+            pois.append(
+                {
+                    "id": poi["id"],
+                    "poi_name": metadata.get("display_name", poi["id"]),
+                    "type": metadata.get("type", "ROOM"),
+                    "floor": floor.name,
+                    "building": floor.building,
+                    "pose": {"x": pose.get("x", 0.0), "y": pose.get("y", 0.0), "yaw": pose.get("yaw", 0.0)},
+                }
+            )
+    return jsonify(pois)
+
+
+def get_home_docks():
+    """Handler for GET /api/multi-floor/map/v1/homedocks?floor=&building="""
+    floor = _floor_arg(request.args)
+    if floor is False:
+        return jsonify({"error": "Invalid floor or building"}), 400
+    floors = [floor] if floor else robot_state.world.floors.values()
+    return jsonify([dock for floor in floors for dock in floor.homedocks])
+
+
+def get_current_home_dock():
+    """Handler for GET /api/multi-floor/map/v1/homedocks/:current"""
+    dock = robot_state.home_dock
+    if dock is None:
+        return jsonify({"result": False, "msg": "No home dock"})
+    return jsonify({"result": True, "msg": "", "data": dock})
+
+
+def set_current_home_dock():
+    """Handler for PUT /api/multi-floor/map/v1/homedocks/:current"""
+    data = request.get_json(silent=True) or {}
+    _, dock = robot_state.world.homedock(data.get("dock_id"))
+    if dock is None:
+        return jsonify({"error": f"Unknown home dock {data.get('dock_id')}"}), 400
+    robot_state.set_home_dock(dock)
+    return jsonify(True)
+
+
+def search_nearby_home_dock():
+    """Handler for POST /api/multi-floor/map/v1/homedocks/:search_nearby: the closest dock on this floor"""
+    pose = robot_state.pose.snapshot()
+    dock = min(
+        robot_state.floor.homedocks,
+        key=lambda dock: math.hypot(dock["pose"]["x"] - pose.x, dock["pose"]["y"] - pose.y),
+        default=None,
+    )
+    if dock is None:
+        return jsonify({"error": "No home dock on this floor"}), 404
+    return jsonify(dock)
+
+
+def reload_stcm():
+    """Handler for POST /api/multi-floor/map/v1/stcm/:reload"""
+    data = request.get_json(silent=True) or {}
+    robot_state.reload_map(data.get("pose"))
+    return jsonify(True)
+
+
+def set_pose_by_poi():
+    """Handler for PUT /api/multi-floor/localization/v1/pose: moves the robot to a POI, on any floor"""
+    data = request.get_json(silent=True) or {}
+    floor, poi = robot_state.find_poi(data.get("poi_name"))
+    if poi is None:
+        return jsonify(False)
+    robot_state.change_floor(floor, poi["pose"])
+    return jsonify(True)
+
+
+def set_pose_by_home_dock():
+    """Handler for PUT /api/multi-floor/localization/v1/homedock: puts the robot on a dock, on any floor"""
+    data = request.get_json(silent=True) or {}
+    floor, dock = robot_state.world.homedock(data.get("dock_id"))
+    if dock is None:
+        return jsonify({"error": f"Unknown home dock {data.get('dock_id')}"}), 400
+    robot_state.change_floor(floor, dock["pose"])
+    robot_state.dock()
+    return jsonify(True)
+
+
+def get_elevators():
+    """Handler for GET /api/multi-floor/map/v1/elevators"""
+    return jsonify([elevator.info() for elevator in robot_state.world.elevators.values()])
+
+
+def get_elevator_by_id(elevator_id):
+    """Handler for GET /api/multi-floor/map/v1/elevators/{elevator_id}"""
+    elevator = robot_state.world.elevators.get(elevator_id)
+    if elevator is None:
+        return jsonify({"error": f"Unknown elevator {elevator_id}"}), 400
+    return jsonify(elevator.info())
+
+
+def get_pose_relation_to_elevator(elevator_id):
+    """Handler for GET /api/multi-floor/map/v1/elevators/{elevator_id}/pose_relation"""
+    elevator = robot_state.world.elevators.get(elevator_id)
+    if elevator is None:
+        return jsonify({"error": f"Unknown elevator {elevator_id}"}), 400
+    if robot_state.curr_floor["elevator"] == elevator_id:
+        return jsonify("in_elevator")
+    pose = robot_state.pose.snapshot()
+    distance = math.hypot(elevator.pose["x"] - pose.x, elevator.pose["y"] - pose.y)
+    if elevator.serves(robot_state.floor.name) and distance <= world.SILL_DISTANCE:
+        return jsonify("close_to_elevator_sill")
+    return jsonify("out_of_elevator")
+
+
+def get_elevator_status():
+    """Handler for GET /emulator/v1/elevators (not in the spec): the live state of every car"""
+    return jsonify([elevator.status() for elevator in robot_state.world.elevators.values()])
+
+
+def get_events():
+    """
+    Handler for GET /api/platform/v1/events
+
+    Returns the robot's recent events (see event_bus.py), oldest first:
+      ?after=<id>   only events after that id; the X-Event-Cursor response
+                    header carries the id to pass next time
+      ?wait=<s>     long poll: wait up to s seconds for an event
+      ?types=A,B    only events of these types
+      ?limit=<n>    at most n events (1 to READ_LIMIT)
+    With "Accept: text/event-stream" (or ?stream=sse) the response is a
+    Server-Sent Events stream that resumes from Last-Event-ID.
+    """
+    types = request.args.get("types")
+    types = set(types.split(",")) if types else None
+    after = request.args.get("after", type=int)
+    events = robot_state.events
+
+    if request.args.get("stream") == "sse" or request.accept_mimetypes.best == "text/event-stream":
+        after = request.headers.get("Last-Event-ID", type=int) or after
+        return Response(sse_stream(events, after, types), mimetype="text/event-stream")
+
+    wait = min(request.args.get("wait", 0.0, type=float), MAX_EVENT_WAIT)
+    limit = min(max(request.args.get("limit", READ_LIMIT, type=int), 1), READ_LIMIT)
+    batch, cursor = events.read(after, timeout=wait, limit=limit, types=types)
+    response = jsonify(batch)
+    response.headers["X-Event-Cursor"] = str(cursor)
+    return response
+
+
+def sse_stream(events, after, types):
+    """Streams events as Server-Sent Events, with a comment line as keepalive."""
+    cursor = after
+    while True:
+        batch, cursor = events.read(cursor, timeout=SSE_KEEPALIVE, types=types)
+        if not batch:
+            yield ": keepalive\n\n"
+        for event in batch:
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def get_fleet_robots():
+    """Lists the robots hosted by this emulator process."""
+    return jsonify(fleet.describe())
+
+
+def get_metrics():
+    """Handler for GET /metrics: this process's metrics in the Prometheus text format."""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def _register_gauges():
+    """Gauges read from the fleet at scrape time."""
+    states = fleet.states
+    metrics.registry.gauge(
+        "emulator_robots_loaded",
+        "Robots instantiated in this process.",
+        None,
+        lambda: {None: len(states())},
+    )
+    metrics.registry.gauge(
+        "emulator_running_actions",
+        "Robots with an action in progress.",
+        None,
+        lambda: {None: sum(state.current_action is not None for state in states())},
+    )
+    metrics.registry.gauge(
+        "emulator_queued_actions",
+        "Actions waiting behind the running action of their robot.",
+        None,
+        lambda: {None: sum(len(state.action_queue) for state in states())},
+    )
+    metrics.registry.gauge(
+        "emulator_running_box_operations",
+        "Box door operations in progress.",
+        None,
+        lambda: {None: sum(c._timer is not None for state in states() for c in state.cargos)},
+    )
+    metrics.registry.gauge(
+        "emulator_delivery_tasks_queued",
+        "Delivery tasks waiting to run.",
+        None,
+        lambda: {None: sum(state.tasks.queued for state in states())},
+    )
+    metrics.registry.gauge(
+        "emulator_elevator_riders",
+        "Robots in each elevator car.",
+        "elevator",
+        lambda: {elevator.id: len(elevator.riders) for elevator in world.get_world().elevators.values()},
+    )
+    metrics.registry.gauge(
+        "emulator_elevator_waiting",
+        "Robots waiting for each elevator car.",
+        "elevator",
+        lambda: {elevator.id: elevator.waiting_count() for elevator in world.get_world().elevators.values()},
+    )
+    metrics.registry.gauge(
+        "emulator_moving_robots",
+        "Robots moving, braking or charging.",
+        None,
+        lambda: {None: motion.kinematics.active},
+    )
+    metrics.registry.gauge(
+        "emulator_scheduler_pending_timers",
+        "Timers waiting on the simulation scheduler.",
+        None,
+        lambda: {None: scheduler.pending()},
+    )
+
+
+# --- Emulator Administration ---
+
+
+def get_clock():
+    """Handler for GET /emulator/v1/clock"""
+    return jsonify(dict(scheduler.clock.describe(), pending_timers=scheduler.pending()))
+
+
+def set_clock():
+    """Handler for PUT /emulator/v1/clock, body {"speed": 10 | "max" | "manual"}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        scheduler.set_speed(data.get("speed", 1))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(scheduler.clock.describe())
+
+
+def step_clock():
+    """Handler for POST /emulator/v1/clock/:step, body {"seconds": 1.5}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        fired = scheduler.advance(float(data.get("seconds", 0)))
+    except TypeError:
+        return jsonify({"error": "seconds must be a number"}), 400
+    except (RuntimeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(dict(scheduler.clock.describe(), fired=fired))
+
+
+def get_snapshot():
+    """Handler for GET /emulator/v1/snapshot: the robot's state as a binary snapshot (see snapshot.py)"""
+    payload = Payload(snapshot.encode(get_robot_state()), f"snapshot-{uuid.uuid4().hex}")
+    return Response(
+        payload.iter_range(),
+        mimetype="application/octet-stream",
+        headers={"Content-Length": str(payload.length)},
+    )
+
+
+def _restored(robot, state):
+    return jsonify(
+        {
+            "floor": robot.curr_floor["floor"],
+            "floors": list(state["floors"]),
+            "actions": len(state["action_history"]),
+        }
+    )
+
+
+def restore_snapshot():
+    """Handler for PUT /emulator/v1/snapshot: replaces the robot's state with an uploaded snapshot"""
+    robot = get_robot_state()
+    try:
+        state = snapshot.decode(request.get_data())
+        robot.restore(state)
+    except snapshot.SnapshotError as e:
+        return jsonify({"error": str(e)}), 400
+    return _restored(robot, state)
+
+
+def list_snapshots():
+    """Handler for GET /emulator/v1/snapshots: the snapshots saved under EMULATOR_SNAPSHOT_DIR"""
+    return jsonify(snapshot.list_names())
+
+
+def save_snapshot(name):
+    """Handler for PUT /emulator/v1/snapshots/<name>: saves the robot's state under a name"""
+    try:
+        path = snapshot.path_for(name)
+    except snapshot.SnapshotError as e:
+        return jsonify({"error": str(e)}), 400
+    snapshot.write_file(path, get_robot_state())
+    return jsonify({"name": name, "bytes": os.path.getsize(path)})
+
+
+def load_snapshot(name):
+    """Handler for POST /emulator/v1/snapshots/<name>/:restore: restores a saved snapshot, memory-mapped"""
+    robot = get_robot_state()
+    try:
+        state = snapshot.read_file(snapshot.path_for(name))
+        robot.restore(state)
+    except FileNotFoundError:
+        return jsonify({"error": f"No snapshot {name}"}), 404
+    except snapshot.SnapshotError as e:
+        return jsonify({"error": str(e)}), 400
+    return _restored(robot, state)
+
+
+def delete_snapshot(name):
+    """Handler for DELETE /emulator/v1/snapshots/<name>"""
+    try:
+        os.remove(snapshot.path_for(name))
+    except FileNotFoundError:
+        return jsonify({"error": f"No snapshot {name}"}), 404
+    except snapshot.SnapshotError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(True)
 
 
 # --- Dynamic Route Creation ---
 
+# Flask endpoint name -> operationId of the spec, for every route created from
+# it (routes without an operationId map to their endpoint name)
+operation_ids = {}
+
+# Flask endpoint name -> pre-encoded (body, status, mimetype) of the spec's
+# example response, for every route served by generic_handler
+example_responses = {}
+
 # Mapping from operationId to our specific handler functions
 # This makes the code cleaner and easier to manage.
 handler_map = {
@@ -243,61 +1018,275 @@ handler_map = {
     "getRobotHealth": get_robot_health,
     "shutdown": shutdown_robot,
     "getPose": get_pose,
+    "getOdoPose": get_odo_pose,
+    "getOdometry": get_odometry,
     "getLocalizationQuality": get_localization_quality,
+    "getLaserScan": get_laser_scan,
+    "getEvents": get_events,
     "setPose": set_pose,
     "getCurrentPois": get_current_pois,
     "addPois": add_poi,
     "deletePoi": delete_poi,
+    "getPoiById": get_poi_by_id,
+    "modifyPoi": modify_poi,
+    "searchNearbyPoi": search_nearby_poi,
     "clearPois": clear_pois,
     "getCompositeMap": get_binary_map,
+    "setCompositeMap": set_composite_map,
+    "getExploreMap": get_explore_map,
+    "getKnownArea": get_known_area,
+    "clearMap": clear_map,
     "getCargos": get_cargos,
+    "getTasks": get_tasks,
+    "createTask": create_task,
+    "createTasks": create_tasks,
+    "cancelAllTasks": cancel_all_tasks,
+    "cancelTaskByTaskId": cancel_task_by_task_id,
+    "cancelTaskByOrderId": cancel_task_by_order_id,
+    "setTaskExecution": set_task_execution,
+    "endTask": end_task,
+    "startPickup": start_pickup,
+    "endPickup": end_pickup,
     "getCurrentAction": get_current_action,
     "createAction": create_action,
     "abortCurrentAction": abort_current_action,
     "getCurrentFloor": get_current_floor,
+    "getFloors": get_floors,
+    "setCurrentFloor": set_current_floor,
+    "getAllPois": get_all_pois,
+    "getMutilFloorHomeDocks": get_home_docks,
+    "getCurrentHomeDock": get_current_home_dock,
+    "setCurrentHomeDock": set_current_home_dock,
+    "searchNearbyHomeDock": search_nearby_home_dock,
+    "reloadStcm": reload_stcm,
+    "setPoseByPOI": set_pose_by_poi,
+    "setPoseByHomedock": set_pose_by_home_dock,
+    "getElevators": get_elevators,
+    "getElevatorsByID": get_elevator_by_id,
+    "getPoseRelationToElevator": get_pose_relation_to_elevator,
+    "getHomePose": get_home_pose,
+    "setHomePose": set_home_pose,
+    "searchPath": search_path,
+    "getLines": get_lines,
+    "addLines": add_lines,
+    "modifyLines": modify_lines,
+    "clearLines": clear_lines,
+    "removeLineById": remove_line_by_id,
+    "getRectangleAreas": get_rectangle_areas,
+    "addRectangleArea": add_rectangle_area,
+    "editRectangleArea": edit_rectangle_area,
+    "removeRectangleAreaById": remove_rectangle_area_by_id,
+    "clearRectangleAreas": clear_rectangle_areas,
     #    "operateBox": operate_box,
 }
 
 
-def create_routes_from_spec(app, spec_file):
+def endpoint_name(method, path):
+    """The Flask endpoint name of a spec operation."""
+    return f"{method}_{path.replace('/', '_')}"
+
+
+def create_routes_from_spec(app, spec_file, verbose=False):
     """
-    Reads the OpenAPI spec and dynamically creates Flask routes.
+    Dynamically creates Flask routes for every operation in the OpenAPI spec.
+    Uses the cached route manifest, so the full spec is only parsed when it changed.
     """
-    with open(spec_file, "r", encoding="utf-8") as f:
-        spec = json.load(f)
+    routes = load_route_manifest(spec_file)
+    examples = {
+        (method, path): encode_example(status, media_type, example)
+        for method, path, status, media_type, example in load_examples(spec_file)
+    }
 
-    for path, path_item in spec["paths"].items():
+    for operation_id, path, method in routes:
         flask_path = convert_path_to_flask(path)
 
-        for method, operation in path_item.items():
-            if method.lower() in ["get", "post", "put", "delete"]:
-                operation_id = operation.get("operationId")
-                summary = operation.get("summary", "No summary")
+        # Choose the handler function
+        if operation_id and operation_id in handler_map:
+            handler_func = handler_map[operation_id]
+        else:
+            handler_func = generic_handler
+
+        endpoint = endpoint_name(method, path)
+        operation_ids[endpoint] = operation_id or endpoint
+        if handler_func is generic_handler and (method, path) in examples:
+            example_responses[endpoint] = examples[method, path]
+
+        # Add the rule to the app
+        app.add_url_rule(
+            flask_path,
+            endpoint=endpoint,
+            view_func=handler_func,
+            methods=[method.upper()],
+        )
+        if verbose:
+            print(
+                f"Created route: {method.upper():<7} {flask_path:<60} -> {handler_func.__name__:<20} ({operation_id})"
+            )
+
+    log.info("Created %d routes from %s", len(routes), spec_file)
+
+
+def create_app(
+    spec_file="swagger-conf.json",
+    robots=1,
+    base_port=1448,
+    shard=0,
+    shards=1,
+    verbose_routes=False,
+    faults_file=None,
+    validation_mode=None,
+    record_file=None,
+):
+    """
+    Application factory: builds the Flask app and registers every route once.
+    Used by the development server below and by the production launcher in serve.py.
+    faults_file (default: EMULATOR_FAULTS) injects the faults of faults.py,
+    validation_mode (default: EMULATOR_VALIDATION) is a mode of validation.py,
+    record_file (default: EMULATOR_RECORD) is the traffic log of recorder.py.
+    """
+    fleet.configure(size=robots, base_port=base_port, shard=shard, shards=shards)
 
-                # Choose the handler function
-                if operation_id and operation_id in handler_map:
-                    handler_func = handler_map[operation_id]
-                else:
-                    handler_func = generic_handler
+    app = Flask(__name__)
+    app.wsgi_app = FleetDispatcher(app.wsgi_app, fleet)
 
-                # Use the operationId as the endpoint name for Flask
-                endpoint_name = f"{method}_{path.replace('/', '_')}"
+    # Routes that are not (or not correctly) described by the spec
+    app.add_url_rule(
+        "/api/delivery/v1/cargos/<string:cargo_id>/boxes/<int:box_id>/<string:op>",
+        view_func=operate_box,
+        methods=["PUT"],
+    )
+    app.add_url_rule("/api/core/motion/v1/actions", view_func=list_actions, methods=["GET"])
+    app.add_url_rule(
+        "/api/core/motion/v1/actions/<int:action_id>",
+        view_func=getActionResult,
+        methods=["GET"],
+    )
+    app.add_url_rule("/fleet/v1/robots", view_func=get_fleet_robots, methods=["GET"])
+    app.add_url_rule("/emulator/v1/clock", view_func=get_clock, methods=["GET"])
+    app.add_url_rule("/emulator/v1/clock", view_func=set_clock, methods=["PUT"])
+    app.add_url_rule("/emulator/v1/clock/:step", view_func=step_clock, methods=["POST"])
+    app.add_url_rule("/emulator/v1/actions/queue", view_func=get_action_queue, methods=["GET"])
+    app.add_url_rule("/emulator/v1/actions/queue", view_func=clear_action_queue, methods=["DELETE"])
+    app.add_url_rule(
+        "/emulator/v1/actions/<int:action_id>", view_func=cancel_action, methods=["DELETE"]
+    )
+    app.add_url_rule("/emulator/v1/elevators", view_func=get_elevator_status, methods=["GET"])
+    app.add_url_rule("/emulator/v1/snapshot", view_func=get_snapshot, methods=["GET"])
+    app.add_url_rule("/emulator/v1/snapshot", view_func=restore_snapshot, methods=["PUT"])
+    app.add_url_rule("/emulator/v1/snapshots", view_func=list_snapshots, methods=["GET"])
+    app.add_url_rule("/emulator/v1/snapshots/<string:name>", view_func=save_snapshot, methods=["PUT"])
+    app.add_url_rule("/emulator/v1/snapshots/<string:name>", view_func=delete_snapshot, methods=["DELETE"])
+    app.add_url_rule(
+        "/emulator/v1/snapshots/<string:name>/:restore", view_func=load_snapshot, methods=["POST"]
+    )
 
-                # Add the rule to the app
-                app.add_url_rule(
-                    flask_path,
-                    endpoint=endpoint_name,
-                    view_func=handler_func,
-                    methods=[method.upper()],
-                )
-                print(
-                    f"Created route: {method.upper():<7} {flask_path:<60} -> {handler_func.__name__:<20} ({summary})"
-                )
+    # Load the configuration and create all routes
+    create_routes_from_spec(app, spec_file, verbose=verbose_routes)
+    validation.install(app, load_requests(spec_file), endpoint_name, validation_mode)
+
+    # Inside the metrics wrapper, so injected latency shows in the histograms
+    faults.install(app, operation_ids, faults_file)
+    if metrics.ENABLED:
+        # Time every handler under its operationId (or its view name outside the spec)
+        for endpoint, view in app.view_functions.items():
+            if endpoint != "static":
+                app.view_functions[endpoint] = metrics.timed(operation_ids.get(endpoint, endpoint), view)
+        app.add_url_rule("/metrics", view_func=get_metrics, methods=["GET"])
+        _register_gauges()
+    # Outermost, so the log has the paths as clients sent them
+    recorder.install(app, record_file, shard=shard if shards > 1 else None)
+    return app
 
 
 if __name__ == "__main__":
-    # Load the configuration and create all routes
-    create_routes_from_spec(app, "swagger-conf.json")
+    parser = argparse.ArgumentParser(description="Slamtec robot API emulator")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=1448)
+    parser.add_argument(
+        "--robots", type=int, default=1, help="number of robots hosted by this process"
+    )
+    parser.add_argument(
+        "--port-per-robot",
+        action="store_true",
+        help="also listen on port+i for robot i (fleet mode)",
+    )
+    parser.add_argument(
+        "--time-factor",
+        default=None,
+        help='simulation speed: a factor such as 10, "max" or "manual"',
+    )
+    parser.add_argument(
+        "--map",
+        default=None,
+        help='initial map: a .stcm or .npy file, or "office:<size in meters>"',
+    )
+    parser.add_argument(
+        "--world",
+        default=None,
+        help='floors and elevators: a JSON file or "building:<floors>[:<elevators>[:<capacity>]]"',
+    )
+    parser.add_argument(
+        "--snapshot",
+        default=None,
+        help="snapshot file every robot starts from (see snapshot.py; default: EMULATOR_SNAPSHOT)",
+    )
+    parser.add_argument(
+        "--faults",
+        default=None,
+        help="fault injection file (see faults.py; default: EMULATOR_FAULTS)",
+    )
+    parser.add_argument(
+        "--record",
+        default=None,
+        help="traffic log to record requests to (see recorder.py; default: EMULATOR_RECORD)",
+    )
+    parser.add_argument(
+        "--validation",
+        default=None,
+        choices=validation.MODES,
+        help="request validation against the spec (default: EMULATOR_VALIDATION or strict)",
+    )
+    parser.add_argument(
+        "--print-routes", action="store_true", help="print every created route"
+    )
+    parser.add_argument(
+        "--log-level",
+        default=None,
+        choices=logs.LEVELS,
+        help="emulator log level (default: EMULATOR_LOG_LEVEL or info)",
+    )
+    parser.add_argument(
+        "--no-debug",
+        action="store_true",
+        help="disable the Flask debugger and reloader",
+    )
+    args = parser.parse_args()
+
+    logs.configure(args.log_level)
+    if args.time_factor is not None:
+        scheduler.set_speed(args.time_factor)
+    if args.map is not None:
+        set_default_map(load_map(args.map))
+    if args.world is not None:
+        world.set_world(world.load_world(args.world))
+        # Created when mock_data was imported, before the world was known
+        mock_data.robot_state.enter_world(world.get_world())
+    if args.snapshot is not None:
+        # Read by every robot created from now on
+        os.environ["EMULATOR_SNAPSHOT"] = args.snapshot
+        mock_data.robot_state.restore(snapshot.startup_state())
+
+    app = create_app(
+        robots=args.robots,
+        base_port=args.port,
+        verbose_routes=args.print_routes,
+        faults_file=args.faults,
+        validation_mode=args.validation,
+        record_file=args.record,
+    )
 
-    # Run the Flask development server
-    app.run(host="0.0.0.0", port=1448, debug=True)
+    if args.port_per_robot:
+        serve_fleet_ports(app, args.host, fleet)
+    else:
+        # Run the Flask development server. For load tests use serve.py instead.
+        app.run(host=args.host, port=args.port, debug=not args.no_debug)
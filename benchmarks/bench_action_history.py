@@ -0,0 +1,96 @@
+# slamtec_emulator/benchmarks/bench_action_history.py
+"""
+Action history memory benchmark: one million finished actions in the old
+unbounded dict versus the bounded ActionHistory, with and without spilling
+evicted actions to disk.
+
+Usage (from the repository root):
+    python benchmarks/bench_action_history.py --actions 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from action_history import ActionHistory  # noqa: E402
+from models.Action import (  # noqa: E402
+    ActionInfo,
+    ActionState,
+    SlamtecActionName,
+    SlamtecActionResult,
+    SlamtecActionStatus,
+)
+
+NAMES = [SlamtecActionName.MOVE_TO, SlamtecActionName.GO_HOME]
+RESULTS = [SlamtecActionResult.SUCCESS] * 8 + [SlamtecActionResult.FAILED, SlamtecActionResult.ABORTED]
+
+
+def make_action(action_id):
+    return ActionInfo(
+        action_id=action_id,
+        action_name=NAMES[action_id % len(NAMES)],
+        stage="Arrived",
+        state=ActionState(
+            status=SlamtecActionStatus.DONE,
+            result=RESULTS[action_id % len(RESULTS)],
+            reason="",
+        ),
+    )
+
+
+def measure(label, count, store, add):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for action_id in range(count):
+        add(make_action(action_id))
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<34} {current / 1e6:>8.1f} MB held   "
+        f"{elapsed / count * 1e6:>6.2f} us/add   {len(store):>9,} retrievable"
+    )
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--actions", type=int, default=1_000_000)
+    parser.add_argument("--retention", type=int, default=1000)
+    args = parser.parse_args()
+
+    unbounded = {}
+    measure("dict (unbounded, before)", args.actions, unbounded, lambda a: unbounded.update({a.action_id: a}))
+    del unbounded
+
+    bounded = ActionHistory(retention=args.retention)
+    measure(f"ActionHistory(retention={args.retention})", args.actions, bounded, bounded.add)
+    del bounded
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        spill_path = os.path.join(spill_dir, "actions.jsonl")
+        spilled = ActionHistory(retention=args.retention, spill_path=spill_path)
+        measure("  + spill to disk", args.actions, spilled, spilled.add)
+        print(f"{'  spill file':<34} {os.path.getsize(spill_path) / 1e6:>8.1f} MB on disk")
+
+        queries = {
+            "get(spilled id)": lambda: spilled.get(args.actions // 2),
+            "query(page 1)": lambda: spilled.query(0, 50),
+            "query(deep page)": lambda: spilled.query(args.actions // 2, 50),
+            "query(result=ABORTED, page 1)": lambda: spilled.query(0, 50, result=SlamtecActionResult.ABORTED),
+        }
+        for label, query in queries.items():
+            start = time.perf_counter()
+            for _ in range(10):
+                query()
+            print(f"{'  ' + label:<34} {(time.perf_counter() - start) / 10 * 1000:>8.2f} ms")
+        spilled._spill.close()
+
+
+if __name__ == "__main__":
+    main()
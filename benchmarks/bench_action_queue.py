@@ -0,0 +1,110 @@
+# slamtec_emulator/benchmarks/bench_action_queue.py
+"""
+Action queue benchmark: dispatcher threads that share one robot, each
+sending MoveTo actions and polling until theirs is done. Without a queue
+(EMULATOR_ACTION_QUEUE=0, the old behaviour) a dispatcher must retry each
+POST until the robot is free; with the queue it submits all its actions
+once and waits for the last. Reports the POSTs and status polls sent per
+completed action, and the 400 answers.
+
+Usage (from the repository root):
+    python benchmarks/bench_action_queue.py --clients 8 --actions 10
+"""
+
+import argparse
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import actions  # noqa: E402
+from scheduler import scheduler  # noqa: E402
+
+MOVE_TO = "slamtec.agent.actions.MoveToAction"
+ACTIONS = "/api/core/motion/v1/actions"
+
+# Interval between two polls of a dispatcher, in seconds of wall time
+POLL_INTERVAL = 0.005
+
+
+def submit(client, body, statuses):
+    """POSTs an action until it is accepted; returns its id."""
+    while True:
+        response = client.post(ACTIONS, json=body)
+        statuses["post"] += 1
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            return response.get_json()["action_id"]
+        time.sleep(POLL_INTERVAL)
+
+
+def wait(client, action_id, statuses):
+    """Polls an action until it is done."""
+    while True:
+        response = client.get(f"{ACTIONS}/{action_id}")
+        statuses["poll"] += 1
+        if response.get_json()["state"]["status"] == 4:
+            return
+        time.sleep(POLL_INTERVAL)
+
+
+def dispatcher(app, index, count, queued, statuses):
+    """
+    Sends 'count' MoveTo actions: one at a time without a queue, all at once
+    (then waits for the last one) with it.
+    """
+    client = app.test_client()
+    bodies = [
+        {"action_name": MOVE_TO, "options": {"target": {"x": 3.0 if (index + i) % 2 else 1.0, "y": 2.5}}}
+        for i in range(count)
+    ]
+    if queued:
+        action_ids = [submit(client, body, statuses) for body in bodies]
+        wait(client, action_ids[-1], statuses)
+    else:
+        for body in bodies:
+            wait(client, submit(client, body, statuses), statuses)
+
+
+def run(app, clients, count, queued):
+    counters = [collections.Counter() for _ in range(clients)]  # one per thread
+    threads = [
+        threading.Thread(target=dispatcher, args=(app, i, count, queued, counters[i]))
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counters, collections.Counter())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--actions", type=int, default=10, help="MoveTo actions per client")
+    parser.add_argument("--speed", default="50", help="clock speed factor (or max)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    import app as emulator
+
+    app = emulator.create_app()
+    scheduler.set_speed(args.speed if args.speed == "max" else float(args.speed))
+    done = args.clients * args.actions
+    print(f"{args.clients} dispatchers x {args.actions} MoveTo actions on one robot")
+    print(f"{'mode':<10} {'POSTs/action':>14} {'polls/action':>14} {'400s':>8}")
+    for mode, queued in (("retry", 0), ("queue", actions.MAX_QUEUED)):
+        actions.MAX_QUEUED = queued
+        statuses = run(app, args.clients, args.actions, queued)
+        print(
+            f"{mode:<10} {statuses['post'] / done:>14.1f} {statuses['poll'] / done:>14.1f} {statuses[400]:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
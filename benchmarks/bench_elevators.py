@@ -0,0 +1,89 @@
+# slamtec_emulator/benchmarks/bench_elevators.py
+"""
+Elevator contention benchmark: many robots of a generated building (see
+world.py) each making MultiFloorMove trips to rooms on random other floors,
+sharing a few small elevators, with the clock at maximum speed. Reports the
+trips, the simulated time they took, the floors the cars travelled and the
+robot simulation steps run, against the steps robots polling every tick
+while they wait for a car would need.
+
+Usage (from the repository root):
+    python benchmarks/bench_elevators.py --robots 200 --floors 10 --elevators 4 --capacity 4 --trips 3
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import world  # noqa: E402
+from actions import SIMULATION_TICK  # noqa: E402
+from mock_data import RobotState  # noqa: E402
+from models.Action import SlamtecActionName  # noqa: E402
+from scheduler import scheduler  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--robots", type=int, default=200)
+    parser.add_argument("--floors", type=int, default=10)
+    parser.add_argument("--elevators", type=int, default=4)
+    parser.add_argument("--capacity", type=int, default=4, help="robots per car")
+    parser.add_argument("--trips", type=int, default=3, help="MultiFloorMove actions per robot")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    building = world.generate_building(args.floors, args.elevators, args.capacity)
+    world.set_world(building)
+    floors = list(building.floors)
+    # Room POIs are "<floor>-<room>", the same rooms on every floor
+    rooms = [poi["metadata"]["display_name"].split("-", 1)[1] for poi in building.floors[floors[0]].pois]
+    rng = random.Random(args.seed)
+
+    # Count the simulation steps the motion loop runs
+    ticks = [0]
+    tick_action = RobotState.tick_action
+
+    def counted(robot):
+        ticks[0] += 1
+        tick_action(robot)
+
+    RobotState.tick_action = counted
+
+    robots = [RobotState(device_id=f"BENCH{i:05d}") for i in range(args.robots)]
+    scheduler.set_speed("max")
+    sim_start, start = scheduler.now(), time.perf_counter()
+    for robot in robots:
+        floor = robot.floor.name
+        for _ in range(args.trips):
+            floor = rng.choice([name for name in floors if name != floor])
+            target = {"poi_name": f"{floor}-{rng.choice(rooms)}"}
+            robot.start_new_action(SlamtecActionName.MULTI_FLOOR_MOVE, {"target": target})
+    while any(robot.current_action is not None for robot in robots):
+        time.sleep(0.05)
+    elapsed, simulated = time.perf_counter() - start, scheduler.now() - sim_start
+
+    trips = sum(robot.action_history.query(0, 0)[1] for robot in robots)
+    succeeded = sum(robot.action_history.query(0, 0, result=0)[1] for robot in robots)
+    travelled = sum(elevator.floors_travelled for elevator in building.elevators.values())
+    polled = args.robots * simulated / SIMULATION_TICK
+    print(
+        f"{args.robots} robots x {args.trips} trips, {args.floors} floors, "
+        f"{args.elevators} elevators of {args.capacity}"
+    )
+    print(f"{'trips succeeded':<36} {succeeded:>10,} / {trips:,}")
+    print(f"{'simulated time':<36} {simulated:>10.0f} s   ({simulated / elapsed:,.0f}x real time)")
+    print(f"{'simulated time per trip of a robot':<36} {simulated / args.trips:>10.0f} s")
+    print(f"{'floors travelled by the cars':<36} {travelled:>10,}")
+    print(
+        f"{'robot simulation steps run':<36} {ticks[0]:>10,}   ({ticks[0] / polled:.0%} of polling every tick)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# slamtec_emulator/benchmarks/bench_kinematics.py
+"""
+Kinematics benchmark: a fleet of robots driving MoveTo actions to random
+targets, each given a new one as soon as it arrives, stepped by the motion
+loop at 20 Hz on a manual clock. Reports the cost of a motion step of the
+whole fleet (kinematics and woken simulations) against the 50 ms a 20 Hz
+tick allows, and against writing every pose one robot at a time as the
+simulations did before.
+
+Usage (from the repository root):
+    python benchmarks/bench_kinematics.py --robots 1000 --seconds 60
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import scheduler  # noqa: E402
+
+scheduler.set_speed("manual")
+
+from actions import SIMULATION_TICK, motion  # noqa: E402
+from mock_data import RobotState  # noqa: E402
+
+MOVE_TO = "slamtec.agent.actions.MoveToAction"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--robots", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=60.0, help="simulated time")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    rng = random.Random(1)
+
+    robots = [RobotState(device_id=f"BENCHKINEMATICS{i}") for i in range(args.robots)]
+    grid = robots[0].planning_grid()
+
+    def send(robot):
+        while True:
+            target = {"x": rng.uniform(-8.0, 8.0), "y": rng.uniform(-8.0, 8.0)}
+            if grid.plan((robot.pose.x, robot.pose.y), (target["x"], target["y"])) is not None:
+                robot.start_new_action(MOVE_TO, {"target": target})
+                return
+
+    for robot in robots:
+        robot.update_pose({"yaw": rng.uniform(-3.0, 3.0)})
+        send(robot)
+    print(f"{args.robots:,} robots, motion steps at {1 / SIMULATION_TICK:.0f} Hz")
+
+    ticks = round(args.seconds / SIMULATION_TICK)
+    durations = []
+    arrivals = 0
+    for _ in range(ticks):
+        start = time.perf_counter()
+        scheduler.advance(SIMULATION_TICK)
+        durations.append(time.perf_counter() - start)
+        for robot in robots:
+            if robot.current_action is None:
+                arrivals += 1
+                send(robot)
+    durations.sort()
+    mean = sum(durations) / len(durations)
+    share = mean / SIMULATION_TICK
+    print(f"{'motion step of the fleet, mean':<44} {mean * 1000:>8.2f} ms   ({share:.1%} of a tick)")
+    print(f"{'  median':<44} {durations[len(durations) // 2] * 1000:>8.2f} ms")
+    print(f"{'  99th percentile':<44} {durations[int(len(durations) * 0.99)] * 1000:>8.2f} ms")
+    print(f"{'  per robot':<44} {mean / args.robots * 1e6:>8.2f} us")
+    distance = sum(robot.odometry() for robot in robots)
+    print(f"{'arrivals in {:.0f} s simulated'.format(args.seconds):<44} {arrivals:>8,}")
+    print(f"{'distance travelled (odometry)':<44} {distance:>8,.0f} m")
+    battery = sum(robot.power_status["batteryPercentage"] for robot in robots) / args.robots
+    print(f"{'mean battery left':<44} {battery:>8.1f} %")
+
+    # Before: every simulation wrote its robot's pose on its own, under its locks
+    start = time.perf_counter()
+    for _ in range(20):
+        for robot in robots:
+            with robot._action_lock:
+                pose = robot.pose.snapshot()
+                robot.update_pose({"x": pose.x + 0.01, "y": pose.y})
+    per_robot = (time.perf_counter() - start) / 20
+    print(f"{'per-robot pose updates, one tick':<44} {per_robot * 1000:>8.2f} ms   ({per_robot / mean:.1f}x)")
+    for robot in robots:
+        motion.kinematics.halt(robot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# slamtec_emulator/benchmarks/bench_laser_scan.py
+"""
+Laser scan benchmark: ray casting cost per scan for 360 to 1,440 beams, and
+what a fleet of robots polled at 10-20 Hz costs with the per-pose scan cache.
+
+Usage (from the repository root):
+    python benchmarks/bench_laser_scan.py --robots 200 --pollers 4
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions import SIMULATION_TICK  # noqa: E402
+from laser_scan import LaserScanner  # noqa: E402
+from models.Pose import Pose3D  # noqa: E402
+from occupancy_map import generate_office_map  # noqa: E402
+
+
+def random_poses(occupancy_map, count, rng):
+    """Poses on free cells of the map."""
+    free = occupancy_map.grid.view("i1") < 0
+    poses = []
+    while len(poses) < count:
+        row, col = rng.randrange(occupancy_map.height), rng.randrange(occupancy_map.width)
+        if free[row, col]:
+            x, y = occupancy_map.cell_to_world(row, col)
+            poses.append(Pose3D(x=x, y=y, yaw=rng.uniform(-3.14, 3.14)))
+    return poses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=float, default=40.0, help="map edge length in meters")
+    parser.add_argument("--robots", type=int, default=200)
+    parser.add_argument("--pollers", type=int, default=4, help="clients polling each robot")
+    parser.add_argument("--hz", type=float, default=20.0, help="polling rate of each client")
+    args = parser.parse_args()
+
+    half = args.size / 2
+    occupancy_map = generate_office_map(args.size, args.size, origin=(-half, -half))
+    rng = random.Random(3)
+    poses = random_poses(occupancy_map, args.robots, rng)
+
+    print(f"{args.robots} robots, {args.pollers} pollers each at {args.hz:g} Hz")
+    for beams in (360, 720, 1440):
+        scanner = LaserScanner(beams=beams, cache_size=args.robots)
+
+        start = time.perf_counter()
+        for pose in poses:
+            scanner.ranges(occupancy_map, pose.x, pose.y, pose.yaw)
+        ray_cast = (time.perf_counter() - start) / len(poses)
+
+        # One second of polling: robots move every simulation tick, each of
+        # their pollers reads a scan hz times a second.
+        moves_per_second = round(1 / SIMULATION_TICK)
+        start = time.perf_counter()
+        for poll in range(int(args.hz)):
+            if poll * moves_per_second // int(args.hz) != (poll - 1) * moves_per_second // int(args.hz):
+                for pose in poses:
+                    pose.x += 0.01
+            for _ in range(args.pollers):
+                for pose in poses:
+                    scanner.scan(occupancy_map, pose)
+        second = time.perf_counter() - start
+
+        print(
+            f"{beams:>5} beams: ray cast {ray_cast * 1000:6.2f} ms/scan, one second of polling "
+            f"({scanner.hits + scanner.misses} polls, {scanner.misses} computed) "
+            f"takes {second:5.2f} CPU-s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+# slamtec_emulator/benchmarks/bench_load.py
+"""
+Load generator: replays a request log or runs synthetic client profiles
+against the emulator, and reports latency percentiles and throughput per
+operationId of the spec.
+
+Targets:
+    in-process (default)   the Flask app through its test client, no sockets
+    --url http://host:port a running emulator (python app.py / serve.py); its
+                           clock is changed only with --time-factor, and restored
+
+Sources:
+    --profile dispatcher   polls action, pose and battery; sends MoveTo to POIs
+    --profile delivery     opens and closes box doors, delivers, polls cargos
+    --profile monitor      one client watching a whole fleet (needs --robots)
+    --log FILE             replays a request log, see below
+
+A request log has one JSON object per line:
+    {"method": "GET", "path": "/api/core/slam/v1/localization/pose"}
+    {"method": "POST", "path": "/api/core/motion/v1/actions", "body": {...}}
+with optional "headers" (a dict). Paths may carry a query string and a
+/robots/<robot_id> prefix. Every client replays the whole log in order, as
+fast as the target answers; see benchmarks/logs/sample.jsonl.
+
+Usage (from the repository root):
+    python benchmarks/bench_load.py --profile dispatcher --clients 16 --duration 10
+    python benchmarks/bench_load.py --profile monitor --robots 50 --url http://127.0.0.1:1448
+    python benchmarks/bench_load.py --log benchmarks/logs/sample.jsonl --save run.json
+    python benchmarks/bench_load.py --profile delivery --compare run.json   # exit 1 on regressions
+"""
+
+import argparse
+import collections
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+from werkzeug.exceptions import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MOVE_TO = "slamtec.agent.actions.MoveToAction"
+CARGO_ID = "3fa85f64-5717-4562-b3fc-2c963f66afa6"
+
+
+# --- Synthetic client profiles ---
+#
+# A profile is a generator of (method, path, body) requests. The response to
+# each request (status, parsed JSON or None) is sent back into the generator,
+# so a profile can follow up on what the emulator answered.
+
+
+def dispatcher_profile(rng, prefix):
+    """A dispatcher that keeps one robot busy: send it to a POI, poll until done."""
+    pois = (yield "GET", f"{prefix}/api/core/artifact/v1/pois", None)[1] or []
+    while True:
+        target = rng.choice(pois)["pose"] if pois else {"x": rng.uniform(-3, 3), "y": rng.uniform(-3, 3)}
+        status, action = yield "POST", f"{prefix}/api/core/motion/v1/actions", {
+            "action_name": MOVE_TO,
+            "options": {"target": {"x": target["x"], "y": target["y"]}},
+        }
+        action_id = action.get("action_id") if status == 200 and action else None
+        for _ in range(20):
+            yield "GET", f"{prefix}/api/core/system/v1/power/status", None
+            yield "GET", f"{prefix}/api/core/slam/v1/localization/pose", None
+            if action_id is None:
+                status, _ = yield "GET", f"{prefix}/api/core/motion/v1/actions/:current", None
+                if status == 404:
+                    break
+                continue
+            status, result = yield "GET", f"{prefix}/api/core/motion/v1/actions/{action_id}", None
+            if status == 200 and result and result.get("state", {}).get("status") == 4:
+                break
+        else:
+            yield "DELETE", f"{prefix}/api/core/motion/v1/actions/:current", None
+
+
+def delivery_profile(rng, prefix):
+    """A delivery run: load a box, drive to a POI, unload, with cargo polling."""
+    box = f"{prefix}/api/delivery/v1/cargos/{CARGO_ID}/boxes/0"
+    while True:
+        for op in (":open", ":close"):
+            yield "PUT", f"{box}/{op}", None
+            for _ in range(5):
+                yield "GET", f"{prefix}/api/delivery/v1/cargos", None
+        yield "POST", f"{prefix}/api/multi-floor/map/v1/pois/:search_nearby", {}
+        yield "POST", f"{prefix}/api/core/motion/v1/:search_path", {
+            "target": {"x": rng.uniform(-3, 3), "y": rng.uniform(-3, 3)}
+        }
+        yield "POST", f"{prefix}/api/core/motion/v1/actions", {
+            "action_name": MOVE_TO,
+            "options": {"target": {"x": rng.uniform(-3, 3), "y": rng.uniform(-3, 3)}},
+        }
+        for _ in range(5):
+            yield "GET", f"{prefix}/api/core/motion/v1/actions/:current", None
+            yield "GET", f"{prefix}/api/core/system/v1/robot/info", None
+        yield "GET", f"{prefix}/api/core/slam/v1/localization/quality", None
+
+
+def monitor_profile(rng, robots):
+    """A fleet dashboard: a status sweep over every robot, then their new events."""
+    cursors = {}
+    while True:
+        for robot in robots:
+            prefix = f"/robots/{robot}"
+            yield "GET", f"{prefix}/api/core/slam/v1/localization/pose", None
+            yield "GET", f"{prefix}/api/core/system/v1/power/status", None
+            yield "GET", f"{prefix}/api/core/system/v1/robot/health", None
+            yield "GET", f"{prefix}/api/core/motion/v1/actions/:current", None
+        for robot in robots:
+            after = cursors.get(robot, 0)
+            status, events = yield "GET", f"/robots/{robot}/api/platform/v1/events?after={after}", None
+            if status == 200 and events:
+                cursors[robot] = events[-1]["id"]
+
+
+def log_profile(entries):
+    while True:
+        for entry in entries:
+            yield entry["method"], entry["path"], entry.get("body"), entry.get("headers")
+
+
+def read_log(path):
+    """The entries of a request log (see the module docstring)."""
+    with open(path) as log:
+        entries = [json.loads(line) for line in log if line.strip()]
+    for number, entry in enumerate(entries, 1):
+        if "method" not in entry or "path" not in entry:
+            raise SystemExit(f"{path}:{number}: a log entry needs 'method' and 'path'")
+    return entries
+
+
+# --- Targets ---
+
+
+class InProcessTarget:
+    """The app's test client: measures the WSGI stack and handlers only."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, path, body, headers):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HttpTarget:
+    """One keep-alive HTTP/1.1 connection to a running emulator."""
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.base = parts.path.rstrip("/")
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def send(self, method, path, body, headers):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(method, self.base + path, body=data, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            return None, b""
+
+
+def set_clock(target, speed):
+    """Sets the target's simulation speed and returns the speed it had before."""
+    status, body = target.send("GET", "/emulator/v1/clock", None, None)
+    if status != 200:
+        raise SystemExit(f"could not read the simulation speed (HTTP {status})")
+    clock = json.loads(body)
+    previous = clock["factor"] if clock["mode"] == "realtime" else clock["mode"]
+    status, _ = target.send("PUT", "/emulator/v1/clock", {"speed": speed}, None)
+    if status != 200:
+        raise SystemExit(f"could not set the simulation speed to {speed!r} (HTTP {status})")
+    return previous
+
+
+# --- Measurement ---
+
+
+class Classifier:
+    """Maps request paths to the operationId of the route that serves them."""
+
+    def __init__(self, app, operation_ids):
+        self.adapter = app.url_map.bind("localhost")
+        self.operation_ids = operation_ids
+        self._cache = {}
+
+    def __call__(self, method, path):
+        path = urllib.parse.urlsplit(path).path
+        if path.startswith("/robots/"):
+            path = "/" + path.split("/", 3)[3] if path.count("/") >= 3 else "/"
+        key = (method, path)
+        operation = self._cache.get(key)
+        if operation is None:
+            try:
+                endpoint, _ = self.adapter.match(path, method=method)
+                operation = self.operation_ids.get(endpoint, endpoint)
+            except HTTPException:
+                operation = f"{method} {path} (no route)"
+            self._cache[key] = operation
+        return operation
+
+
+class Recorder:
+    """Latencies and status classes per operationId, shared by every client."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.client_errors = collections.Counter()  # 4xx
+        self.errors = collections.Counter()  # 5xx and failed connections
+
+    def add(self, operation, seconds, status):
+        with self.lock:
+            self.latencies[operation].append(seconds)
+            if status is None or status >= 500:
+                self.errors[operation] += 1
+            elif status >= 400:
+                self.client_errors[operation] += 1
+
+
+def percentile(ordered, q):
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def client_loop(target, requests, classify, recorder, stop, think):
+    try:
+        request = next(requests)
+        while not stop.is_set():
+            method, path, body, *headers = request
+            start = time.perf_counter()
+            status, data = target.send(method, path, body, headers[0] if headers else None)
+            recorder.add(classify(method, path), time.perf_counter() - start, status)
+            try:
+                response = (status, json.loads(data) if data else None)
+            except ValueError:
+                response = (status, None)
+            if think:
+                time.sleep(think)
+            request = requests.send(response)
+    except StopIteration:
+        return
+
+
+def run(make_target, make_requests, clients, duration, classify, think=0.0):
+    """Runs 'clients' threads for 'duration' seconds; returns (Recorder, elapsed seconds)."""
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=client_loop,
+            args=(make_target(), make_requests(i), classify, recorder, stop, think),
+        )
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
+
+
+def summarize(recorder, elapsed):
+    rows = {}
+    for operation, samples in recorder.latencies.items():
+        samples.sort()
+        rows[operation] = {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed,
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+            "4xx": recorder.client_errors[operation],
+            "errors": recorder.errors[operation],
+        }
+    return rows
+
+
+def print_report(rows, elapsed, baseline=None):
+    print(f"{'operationId':<34} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'4xx':>6} {'errors':>6}")
+    for operation, row in sorted(rows.items(), key=lambda item: -item[1]["requests"]):
+        line = (
+            f"{operation:<34} {row['requests']:>9,} {row['rps']:>9.0f} {row['p50_ms']:>8.2f} "
+            f"{row['p99_ms']:>8.2f} {row['4xx']:>6} {row['errors']:>6}"
+        )
+        if baseline and operation in baseline:
+            before = baseline[operation]["p50_ms"]
+            line += f"   p50 {100 * (row['p50_ms'] - before) / before:+.0f}%"
+        print(line)
+    total = sum(row["requests"] for row in rows.values())
+    print(f"{'total':<34} {total:>9,} {total / elapsed:>9.0f}   in {elapsed:.1f} s")
+
+
+def regressions(rows, baseline, tolerance, min_requests=100):
+    """Operations whose p50 latency grew by more than 'tolerance' (a fraction) over the baseline."""
+    return [
+        operation
+        for operation, row in rows.items()
+        if operation in baseline
+        and row["requests"] >= min_requests
+        and row["p50_ms"] > baseline[operation]["p50_ms"] * (1 + tolerance)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--profile", choices=sorted(PROFILES))
+    source.add_argument("--log", help="request log to replay (JSON lines)")
+    parser.add_argument("--url", help="base URL of a running emulator; default: in-process")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--robots", type=int, default=1, help="robots in the fleet; clients spread over them")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds, not reported")
+    parser.add_argument("--think", type=float, default=0.0, help="pause after each request, in seconds")
+    parser.add_argument(
+        "--time-factor",
+        help="simulation speed during the run; default: max in-process, the target's own with --url",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run; exit 1 on p50 regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 growth for --compare")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    # The app is built in both modes: its URL map names the operation of each request
+    import app as emulator
+
+    app = emulator.create_app(robots=args.robots)
+    classify = Classifier(app, emulator.operation_ids)
+
+    if args.url:
+        def make_target():
+            return HttpTarget(args.url)
+    else:
+        def make_target():
+            return InProcessTarget(app)
+
+    robots = [f"robot-{i}" for i in range(args.robots)]
+    entries = read_log(args.log) if args.log else None
+
+    def make_requests(client):
+        rng = random.Random(args.seed * 1000 + client)
+        prefix = f"/robots/{robots[client % len(robots)]}" if args.robots > 1 else ""
+        if entries is not None:
+            return log_profile(entries)
+        if args.profile == "monitor":
+            return monitor_profile(rng, robots)
+        return PROFILES[args.profile](rng, prefix)
+
+    # A running emulator may be shared: only change its clock when asked, and put it back
+    speed = args.time_factor or (None if args.url else "max")
+    previous = set_clock(make_target(), speed) if speed is not None else None
+    try:
+        if args.warmup:
+            run(make_target, make_requests, args.clients, args.warmup, classify, args.think)
+        recorder, elapsed = run(make_target, make_requests, args.clients, args.duration, classify, args.think)
+    finally:
+        if previous is not None and args.url:
+            set_clock(make_target(), previous)
+
+    rows = summarize(recorder, elapsed)
+    source = f"log {args.log}" if args.log else f"profile {args.profile}"
+    print(f"{source}, {args.clients} clients, {args.robots} robots, {args.url or 'in-process'}")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["operations"]
+    print_report(rows, elapsed, baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"args": vars(args), "elapsed": elapsed, "operations": rows}, f, indent=2)
+    if baseline:
+        slower = regressions(rows, baseline, args.tolerance)
+        if slower:
+            print(f"p50 regressions over {args.tolerance:.0%}: {', '.join(sorted(slower))}")
+            sys.exit(1)
+
+
+PROFILES = {
+    "dispatcher": dispatcher_profile,
+    "delivery": delivery_profile,
+    "monitor": monitor_profile,
+}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# slamtec_emulator/benchmarks/bench_map.py
+"""
+Map serving benchmark: full composite map downloads, ETag revalidation,
+byte ranges and explore-map crops of a large map, through the Flask app.
+
+Usage (from the repository root):
+    python benchmarks/bench_map.py --size 224   # 4480 x 4480 cells, ~20 MB
+    python benchmarks/bench_map.py --size 320   # ~41 MB
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import load_map, set_default_map  # noqa: E402
+
+
+def timed(label, runs, func):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        size = func()
+        samples.append(time.perf_counter() - start)
+    mean = statistics.mean(samples)
+    print(f"{label:<34} {mean * 1000:>9.2f} ms   {size:>12,} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=float, default=224.0, help="map edge length in meters")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    occupancy_map = load_map(f"office:{args.size}")
+    set_default_map(occupancy_map)
+    print(f"map {occupancy_map.width}x{occupancy_map.height} cells ({occupancy_map.grid.nbytes / 1e6:.1f} MB)")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import create_app
+
+        client = create_app().test_client()
+
+    stcm_url = "/api/core/slam/v1/maps/stcm"
+    etag = client.get(stcm_url).headers["ETag"]
+
+    def full():
+        return len(client.get(stcm_url).data)
+
+    def revalidate():
+        response = client.get(stcm_url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        return len(response.data)
+
+    def tail_range():
+        response = client.get(stcm_url, headers={"Range": "bytes=-1048576"})
+        assert response.status_code == 206
+        return len(response.data)
+
+    def crop():
+        response = client.get("/api/core/slam/v1/maps/explore?min_x=0&min_y=0&max_x=10&max_y=10")
+        return len(response.data)
+
+    def copy_baseline():
+        # What a naive handler does: materialise the whole map per request
+        return len(occupancy_map.grid.tobytes())
+
+    timed("stcm download (streamed)", args.runs, full)
+    timed("grid.tobytes() (per-call copy)", args.runs, copy_baseline)
+    timed("stcm If-None-Match -> 304", args.runs * 10, revalidate)
+    timed("stcm last 1 MiB (Range)", args.runs * 10, tail_range)
+    timed("explore crop 10m x 10m", args.runs * 10, crop)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# slamtec_emulator/benchmarks/bench_models.py
+"""
+State model memory benchmark: bytes and allocations per object for the
+slotted models and the fleet pose store, against the same models as plain
+(dict-backed) dataclasses.
+
+Usage (from the repository root):
+    python benchmarks/bench_models.py --count 100000
+"""
+
+import argparse
+import dataclasses
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.Action import ActionInfo, ActionState  # noqa: E402
+from models.Cargo import Box, Cargo, CargoOrientation, CargoType  # noqa: E402
+from models.Pose import Pose3D, PoseStore  # noqa: E402
+
+CARGO = {
+    "id": "3fa85f64-5717-4562-b3fc-2c963f66afa6",
+    "pos": 0,
+    "orientation": "FRONT",
+    "layer": 0,
+    "type": "TAKEOUT",
+    "errors": [],
+    "boxes": [
+        {
+            "id": i,
+            "door_status": "CLOSED",
+            "lock_status": "LOCKED",
+            "stock_status": "EMPTY",
+            "status": "EMPTY",
+            "errors": [],
+        }
+        for i in range(4)
+    ],
+}
+
+
+def unslotted(cls):
+    """The same dataclass without __slots__, i.e. the models before slotting."""
+    fields = [(f.name, f.type, f) for f in dataclasses.fields(cls)]
+    namespace = {
+        name: value
+        for name, value in vars(cls).items()
+        if callable(value) or isinstance(value, classmethod)
+        if not name.startswith("__")
+    }
+    return dataclasses.make_dataclass(cls.__name__, fields, namespace=namespace)
+
+
+def measure(label, count, factory):
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = [factory() for _ in range(count)]
+    elapsed = time.perf_counter() - start
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = snapshot.statistics("filename")
+    size = sum(s.size for s in stats)
+    blocks = sum(s.count for s in stats)
+    # The list holding the objects is not part of their cost
+    size -= sys.getsizeof(objects)
+    blocks -= 1
+    print(
+        f"{label:<34} {size / count:>8.0f} B/object  {blocks / count:>6.1f} allocs/object  "
+        f"{elapsed / count * 1e6:>6.2f} us/object"
+    )
+    return objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+    n = args.count
+
+    rng = random.Random(1)
+
+    def values():
+        # Distinct float objects, as the poses of moving robots are
+        return [rng.random() for _ in range(6)]
+
+    OldPose3D = unslotted(Pose3D)
+    store = PoseStore()
+    measure("Pose3D (dataclass)", n, lambda: OldPose3D(*values()))
+    measure("Pose3D (slots)", n, lambda: Pose3D(*values()))
+    measure("PoseStore row + view", n, lambda: store.allocate(Pose3D(*values())))
+
+    OldActionState, OldActionInfo = unslotted(ActionState), unslotted(ActionInfo)
+    measure("ActionInfo (dataclass)", n, lambda: OldActionInfo(1, "MoveTo", "Arrived", OldActionState()))
+    measure("ActionInfo (slots)", n, lambda: ActionInfo(1, "MoveTo", "Arrived", ActionState()))
+
+    OldBox, OldCargo = unslotted(Box), unslotted(Cargo)
+
+    def old_cargo():
+        # What Cargo.from_dict does, but building the unslotted boxes
+        return OldCargo(
+            id=CARGO["id"],
+            pos=CARGO["pos"],
+            orientation=CargoOrientation(CARGO["orientation"]),
+            layer=CARGO["layer"],
+            type=CargoType(CARGO["type"]),
+            errors=CARGO.get("errors", []),
+            boxes=[OldBox.from_dict(box) for box in CARGO["boxes"]],
+        )
+
+    measure("Cargo with 4 boxes (dataclass)", n // 10, old_cargo)
+    measure("Cargo with 4 boxes (slots)", n // 10, lambda: Cargo.from_dict(CARGO))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# slamtec_emulator/benchmarks/bench_planner.py
+"""
+Path planning benchmark on large synthetic office maps: planning grid
+construction, uncached searches between random points and cached repeats.
+
+Usage (from the repository root):
+    python benchmarks/bench_planner.py --size 100 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import generate_office_map  # noqa: E402
+from planner import PlanningGrid  # noqa: E402
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def report(label, samples):
+    print(
+        f"{label:<22} p50 {percentile(samples, 0.5) * 1000:>8.2f} ms   "
+        f"p99 {percentile(samples, 0.99) * 1000:>8.2f} ms   "
+        f"mean {statistics.mean(samples) * 1000:>8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=float, default=100.0, help="map edge length in meters")
+    parser.add_argument("--resolution", type=float, default=0.05)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    half = args.size / 2
+    start = time.perf_counter()
+    occupancy_map = generate_office_map(
+        args.size, args.size, args.resolution, origin=(-half, -half)
+    )
+    print(
+        f"map {occupancy_map.width}x{occupancy_map.height} cells generated in "
+        f"{(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+
+    start = time.perf_counter()
+    grid = PlanningGrid(occupancy_map)
+    print(
+        f"planning grid {grid.cols}x{grid.rows} built in "
+        f"{(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+
+    rng = random.Random(7)
+    pairs = []
+    while len(pairs) < args.queries:
+        a = (rng.uniform(-half, half), rng.uniform(-half, half))
+        b = (rng.uniform(-half, half), rng.uniform(-half, half))
+        cell_a, cell_b = grid.cell_of(*a), grid.cell_of(*b)
+        if cell_a and cell_b and not grid.blocked[cell_a] and not grid.blocked[cell_b]:
+            pairs.append((a, b))
+
+    uncached, cached = [], []
+    found = 0
+    for a, b in pairs:
+        t = time.perf_counter()
+        found += grid.plan(a, b) is not None
+        uncached.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        grid.plan(a, b)
+        cached.append(time.perf_counter() - t)
+
+    print(f"{found}/{len(pairs)} queries found a path")
+    report("search (uncached)", uncached)
+    report("search (cached)", cached)
+    print(f"throughput uncached: {len(uncached) / sum(uncached) * 60:,.0f} searches/minute")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# slamtec_emulator/benchmarks/bench_poi_index.py
+"""
+POI store benchmark: nearest-neighbour and bounding-box queries on the
+spatial index versus a linear scan, for a large map, and the cost of
+adding, moving and removing POIs in it.
+
+Usage (from the repository root):
+    python benchmarks/bench_poi_index.py --pois 100000
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poi_index import PoiIndex  # noqa: E402
+
+
+def make_pois(count, extent, rng):
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "pose": {"x": rng.uniform(0, extent), "y": rng.uniform(0, extent), "yaw": 0.0},
+            "metadata": {"display_name": f"poi-{i}"},
+        }
+        for i in range(count)
+    ]
+
+
+def linear_nearest(pois, x, y):
+    return min(pois, key=lambda p: math.hypot(p["pose"]["x"] - x, p["pose"]["y"] - y))
+
+
+def timed(label, queries, func, per="query"):
+    start = time.perf_counter()
+    for query in queries:
+        func(*query)
+    elapsed = (time.perf_counter() - start) / len(queries)
+    print(f"{label:<28} {elapsed * 1e6:>10.1f} us/{per}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pois", type=int, default=100_000)
+    parser.add_argument("--extent", type=float, default=500.0, help="map size in meters")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--writes", type=int, default=3000, help="POIs added, moved and removed")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    pois = make_pois(args.pois, args.extent, rng)
+
+    start = time.perf_counter()
+    index = PoiIndex(pois)
+    print(f"built index of {len(index)} POIs in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    points = [(rng.uniform(0, args.extent), rng.uniform(0, args.extent)) for _ in range(args.queries)]
+    boxes = [(x, y, x + 10.0, y + 10.0) for x, y in points]
+
+    # Sanity check against brute force
+    for x, y in points[:20]:
+        assert index.nearest(x, y)[0] is linear_nearest(pois, x, y)
+
+    timed("nearest (index)", points, index.nearest)
+    timed("nearest (linear scan)", points[:20], lambda x, y: linear_nearest(pois, x, y))
+    timed("10m x 10m box (index)", boxes, index.within)
+    timed(
+        "10m x 10m box (linear scan)",
+        boxes[:20],
+        lambda a, b, c, d: [
+            p for p in pois if a <= p["pose"]["x"] <= c and b <= p["pose"]["y"] <= d
+        ],
+    )
+    far = [(args.extent * 10, args.extent * 10)] * 20
+    timed("nearest, far off the map", far, index.nearest)
+
+    # Writes must not grow with the size of the index (addPois in a loop)
+    added = make_pois(args.writes, args.extent, rng)
+    timed("add", [(poi,) for poi in added], index.add, per="write")
+    moves = [(poi["id"], {"x": rng.uniform(0, args.extent)}) for poi in added]
+    timed("update pose", moves, index.update, per="write")
+    timed("remove", [(poi["id"],) for poi in added], index.remove, per="write")
+    assert len(index) == args.pois
+
+
+if __name__ == "__main__":
+    main()
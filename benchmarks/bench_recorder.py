@@ -0,0 +1,130 @@
+# slamtec_emulator/benchmarks/bench_recorder.py
+"""
+Traffic recording benchmark: the time recorder.py adds to a request on its
+thread (around a trivial WSGI app, and through the whole emulator), the
+rate at which the writer thread encodes and writes the log, and the replay
+of the recorded log by replay.py at maximum speed and deterministically.
+
+Usage (from the repository root):
+    python benchmarks/bench_recorder.py --requests 20000
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recorder  # noqa: E402
+import replay  # noqa: E402
+import snapshot  # noqa: E402
+
+ACTIONS = "/api/core/motion/v1/actions"
+MOVE_TO = "slamtec.agent.actions.MoveToAction"
+TARGET = {"target": {"x": 2.0, "y": 1.0}}
+BODY = b'{"x":1.0,"y":2.0,"yaw":0.0}'
+
+
+def trivial_app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "application/json"), ("Content-Length", str(len(BODY)))])
+    return [BODY]
+
+
+def call_wsgi(app, environ):
+    for _ in app(dict(environ), lambda status, headers, exc_info=None: None):
+        pass
+
+
+def per_request(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def dispatcher_mix(client):
+    """A dispatcher's requests: pose, battery and action polling, a MoveTo every 20 requests."""
+    requests = itertools.count()
+
+    def send():
+        i = next(requests)
+        if i % 20 == 0:
+            response = client.post(ACTIONS, json={"action_name": MOVE_TO, "options": TARGET})
+        elif i % 3 == 0:
+            response = client.get("/api/core/slam/v1/localization/pose")
+        elif i % 3 == 1:
+            response = client.get("/api/core/system/v1/power/status")
+        else:
+            response = client.get("/api/core/motion/v1/actions/:current")
+        response.get_data()
+
+    return send
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    directory = tempfile.mkdtemp()
+
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": "/api/core/slam/v1/localization/pose",
+        "QUERY_STRING": "",
+        "REMOTE_ADDR": "127.0.0.1",
+        "REMOTE_PORT": "50000",
+        "HTTP_ACCEPT": "application/json",
+        "wsgi.input": io.BytesIO(),
+    }
+    writer = recorder.LogWriter(os.path.join(directory, "trivial.jsonl"))
+    recorded = recorder.TrafficRecorder(trivial_app, writer)
+    bare = per_request(lambda: call_wsgi(trivial_app, environ), args.requests)
+    wrapped = per_request(lambda: call_wsgi(recorded, environ), args.requests)
+    print(f"{'trivial WSGI app':<44} {bare * 1e6:>8.2f} us/request")
+    print(f"{'  recorded':<44} {wrapped * 1e6:>8.2f} us/request   (+{(wrapped - bare) * 1e6:.2f} us)")
+    started = time.perf_counter()
+    writer.close()
+    written = (time.perf_counter() - started) / args.requests
+    print(f"{'  writer: encode and write the log':<44} {written * 1e6:>8.2f} us/request")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as emulator
+
+        app = emulator.create_app()
+    with contextlib.redirect_stdout(io.StringIO()):
+        per_request(dispatcher_mix(app.test_client()), 1000)
+        plain = per_request(dispatcher_mix(app.test_client()), args.requests)
+    # Replays start from the state the recording started from
+    start = b"".join(snapshot.encode(emulator.mock_data.robot_state))
+    path = os.path.join(directory, "traffic.jsonl")
+    writer = recorder.install(app, path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        traced = per_request(dispatcher_mix(app.test_client()), args.requests)
+    writer.close()
+    print(f"{'emulator, test client, dispatcher mix':<44} {plain * 1e6:>8.2f} us/request")
+    print(f"{'  recorded':<44} {traced * 1e6:>8.2f} us/request   ({(traced - plain) / plain:+.1%})")
+    print(f"{'  log size':<44} {os.path.getsize(path) / args.requests:>8.0f} bytes/request")
+
+    entries = recorder.read_log(path)
+    fresh = emulator.create_app()
+    classify = replay.Classifier(fresh, emulator.operation_ids)
+    runs = (("replay at max speed", None, False), ("replay, deterministic", 1.0, True))
+    for label, speed, deterministic in runs:
+        fresh.test_client().put("/emulator/v1/snapshot", data=start)
+        differ = replay.Differ()
+        engine = replay.Replay(entries, lambda: replay.InProcessTarget(fresh), classify, differ, speed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed = engine.run_deterministic() if deterministic else engine.run()
+        differing = sum(bool(result.diffs) for result in engine.results)
+        print(f"{label:<44} {len(entries) / elapsed:>8,.0f} req/s   ({differing:,} responses differ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# slamtec_emulator/benchmarks/bench_responses.py
+"""
+Response cache benchmark: the hot read endpoints served from pre-encoded
+bodies versus encoding the state with jsonify on every request, plus the
+cost of a 304 revalidation.
+
+Usage (from the repository root):
+    python benchmarks/bench_responses.py --requests 20000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import response_cache  # noqa: E402
+
+# (path, handler name in app.py, what the handler used to encode per request)
+ENDPOINTS = [
+    ("/api/core/system/v1/robot/info", "get_robot_info", lambda state: state.robot_info),
+    ("/api/core/system/v1/power/status", "get_power_status", lambda state: state.power_status),
+    (
+        "/api/delivery/v1/cargos",
+        "get_cargos",
+        lambda state: [cargo.to_dict() for cargo in state.cargos],
+    ),
+]
+
+
+def per_request(func, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        func()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as emulator
+        from flask import jsonify
+
+        app = emulator.create_app()
+    state = emulator.fleet.default
+
+    print(f"JSON encoder: {'orjson' if response_cache.orjson else 'json (orjson not installed)'}")
+    print("handler time in a request context, without the HTTP round trip (us per request):")
+    print(f"{'endpoint':<36} {'jsonify':>10} {'uncached':>10} {'cached':>10} {'304':>10}")
+    for path, handler_name, build in ENDPOINTS:
+        handler = getattr(emulator, handler_name)
+        with app.test_request_context(path):
+            jsonify_us = per_request(lambda: jsonify(build(state)), args.requests)
+            # A fresh cache per call: the first request after every change
+            uncached_us = per_request(
+                lambda: state.__dict__.update(responses=response_cache.ResponseCache()) or handler(),
+                args.requests,
+            )
+            etag = handler().headers["ETag"]
+            cached_us = per_request(handler, args.requests)
+        with app.test_request_context(path, headers={"If-None-Match": etag}):
+            revalidate_us = per_request(handler, args.requests)
+        print(f"{path:<36} {jsonify_us:>10.1f} {uncached_us:>10.1f} {cached_us:>10.1f} {revalidate_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
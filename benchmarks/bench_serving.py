@@ -0,0 +1,136 @@
+# slamtec_emulator/benchmarks/bench_serving.py
+"""
+Throughput benchmark: Flask development server (python app.py) versus the
+production launcher (python serve.py).
+
+Each mode is started as a subprocess and hammered over HTTP by a pool of
+keep-alive client threads for a fixed duration.
+
+Usage (from the repository root):
+    python benchmarks/bench_serving.py --clients 32 --duration 10
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = [
+    "/api/core/system/v1/robot/info",
+    "/api/core/system/v1/power/status",
+    "/api/core/slam/v1/localization/pose",
+    "/api/delivery/v1/cargos",
+]
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+def client_loop(port, stop, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    i = 0
+    while not stop.is_set():
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException):
+            errors.append("conn")
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run_load(port, clients, duration):
+    stop = threading.Event()
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=client_loop, args=(port, stop, latencies, errors))
+        for _ in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": len(errors),
+        "rps": count / duration,
+        "p50_ms": latencies[count // 2] * 1000 if count else 0.0,
+        "p99_ms": latencies[int(count * 0.99)] * 1000 if count else 0.0,
+    }
+
+
+def bench_mode(name, command, port, clients, duration):
+    process = subprocess.Popen(
+        command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port)
+        run_load(port, clients, 1.0)  # warm-up
+        result = run_load(port, clients, duration)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    print(
+        f"{name:<12} {result['rps']:>10.0f} req/s   p50 {result['p50_ms']:>7.2f} ms   "
+        f"p99 {result['p99_ms']:>7.2f} ms   errors {result['errors']}"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--port", type=int, default=18448)
+    args = parser.parse_args()
+
+    python = sys.executable
+    dev = bench_mode(
+        "dev-server",
+        [python, "app.py", "--port", str(args.port)],
+        args.port,
+        args.clients,
+        args.duration,
+    )
+    prod = bench_mode(
+        "serve.py",
+        [python, "serve.py", "--port", str(args.port + 1), "--threads", str(args.threads)],
+        args.port + 1,
+        args.clients,
+        args.duration,
+    )
+    if dev["rps"]:
+        print(f"speed-up: {prod['rps'] / dev['rps']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
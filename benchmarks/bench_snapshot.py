@@ -0,0 +1,88 @@
+# slamtec_emulator/benchmarks/bench_snapshot.py
+"""
+Snapshot benchmark: a robot with many POIs and its own large map is saved to
+a snapshot file and restored from it, from the file (memory-mapped) and from
+uploaded bytes, against rebuilding the same POIs with POST requests.
+
+Usage (from the repository root):
+    python benchmarks/bench_snapshot.py --pois 100000 --map-size 224
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot  # noqa: E402
+from mock_data import RobotState  # noqa: E402
+from occupancy_map import load_map  # noqa: E402
+
+# POIs posted through the app to estimate the cost of rebuilding a scenario
+POSTED = 2000
+
+
+def timed(label, func, items=None):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    per_item = f"   ({elapsed / items * 1e6:.2f} us/POI)" if items else ""
+    print(f"{label:<40} {elapsed * 1000:>10.1f} ms{per_item}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pois", type=int, default=100000)
+    parser.add_argument("--map-size", type=float, default=224.0, help="edge of the robot's own map, in meters")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    rng = random.Random(1)
+    half = args.map_size / 2
+    robot = RobotState(device_id="BENCHSNAPSHOT")
+    robot.set_map(load_map(f"office:{args.map_size}"))
+    robot.pois = type(robot.pois)(
+        {
+            "id": f"poi-{i}",
+            "pose": {"x": rng.uniform(-half, half), "y": rng.uniform(-half, half), "yaw": 0.0},
+            "metadata": {"display_name": f"P{i}"},
+        }
+        for i in range(args.pois)
+    )
+    print(f"robot with {args.pois:,} POIs and a {robot.map.width} x {robot.map.height} cell map")
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.snap")
+    timed("save to a file", lambda: snapshot.write_file(path, robot))
+    print(f"{'snapshot size':<40} {os.path.getsize(path) / 1e6:>10.1f} MB")
+
+    restored = RobotState(device_id="BENCHRESTORED")
+    timed("restore from the file (memory-mapped)", lambda: restored.restore(snapshot.read_file(path)))
+    timed("first nearest-POI query (builds index)", lambda: restored.pois.nearest(0.0, 0.0), args.pois)
+    with open(path, "rb") as f:
+        data = f.read()
+    timed("restore from uploaded bytes", lambda: restored.restore(snapshot.decode(data)))
+    assert len(restored.pois) == args.pois and restored.map.width == robot.map.width
+
+    import app as emulator
+
+    client = emulator.create_app().test_client()
+    start = time.perf_counter()
+    for i in range(POSTED):
+        client.post(
+            "/api/core/artifact/v1/pois",
+            json={"id": f"post-{i}", "pose": {"x": 1.0, "y": 2.0, "yaw": 0.0}, "metadata": {"display_name": f"P{i}"}},
+        )
+    per_poi = (time.perf_counter() - start) / POSTED
+    print(
+        f"{'rebuild with POST (estimated)':<40} {per_poi * args.pois * 1000:>10.1f} ms"
+        f"   ({per_poi * 1e6:.2f} us/POI, in-process, no network)"
+    )
+
+
+if __name__ == "__main__":
+    main()
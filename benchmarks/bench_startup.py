@@ -0,0 +1,91 @@
+# slamtec_emulator/benchmarks/bench_startup.py
+"""
+Cold-start benchmark for route creation.
+
+Times everything after the (constant) module imports. Compares, in fresh interpreter processes:
+  * legacy:  json.load of the full spec plus a printed line per route
+  * rebuild: create_app() with an empty manifest cache
+  * cached:  create_app() with a warm manifest cache
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LEGACY = """
+import json, time
+import app
+from flask import Flask
+t = time.perf_counter()
+flask_app = Flask("legacy")
+with open("swagger-conf.json", "r", encoding="utf-8") as f:
+    spec = json.load(f)
+for path, path_item in spec["paths"].items():
+    flask_path = app.convert_path_to_flask(path)
+    for method, operation in path_item.items():
+        if method.lower() in ["get", "post", "put", "delete"]:
+            handler = app.handler_map.get(operation.get("operationId"), app.generic_handler)
+            flask_app.add_url_rule(flask_path, endpoint=f"{method}_{path}", view_func=handler, methods=[method.upper()])
+            print(f"Created route: {method.upper():<7} {flask_path:<60} -> {handler.__name__:<20} ({operation.get('summary')})")
+import sys
+print(time.perf_counter() - t, file=sys.stderr)
+"""
+
+FACTORY = """
+import time
+import app
+t = time.perf_counter()
+app.create_app()
+import sys
+print(time.perf_counter() - t, file=sys.stderr)
+"""
+
+
+def run(code, env):
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return float(result.stderr.strip().splitlines()[-1])
+
+
+def report(name, samples):
+    print(
+        f"{name:<8} median {statistics.median(samples) * 1000:>8.1f} ms   "
+        f"min {min(samples) * 1000:>8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    legacy, rebuild, cached = [], [], []
+    for _ in range(args.runs):
+        legacy.append(run(LEGACY, dict(os.environ)))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = dict(os.environ, EMULATOR_CACHE_DIR=cache_dir)
+            rebuild.append(run(FACTORY, env))
+            cached.append(run(FACTORY, env))
+
+    report("legacy", legacy)
+    report("rebuild", rebuild)
+    report("cached", cached)
+
+
+if __name__ == "__main__":
+    main()
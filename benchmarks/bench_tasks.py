@@ -0,0 +1,77 @@
+# slamtec_emulator/benchmarks/bench_tasks.py
+"""
+Delivery task benchmark: submitting batches of tasks, looking tasks up by
+task and order id, cancelling them, and running them with the clock at
+maximum speed.
+
+Usage (from the repository root):
+    python benchmarks/bench_tasks.py --tasks 100000 --batch 100 --run 200
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_data import RobotState  # noqa: E402
+from scheduler import scheduler  # noqa: E402
+
+
+def entry(poi_name, cargo_id=None):
+    task = {"location": {"poi_name": poi_name}, "type": "TAKEOUT", "no_pickup_wait": True}
+    if cargo_id is not None:
+        task["cargos"] = [{"cargo_id": cargo_id, "boxes": ["000"]}]
+    return task
+
+
+def per_item(func, items):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) / items * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=100000, help="tasks submitted per robot")
+    parser.add_argument("--batch", type=int, default=100, help="tasks per :batch request")
+    parser.add_argument("--run", type=int, default=200, help="tasks executed at maximum speed")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    robot = RobotState()
+    robot.tasks.retention = args.tasks
+    robot.add_poi({"id": "bench", "pose": {"x": 1.0, "y": 0.5, "yaw": 0.0}, "metadata": {}})
+    cargo_id = robot.cargos[0].id
+    robot.tasks.set_execution(False)  # only queue, so the numbers are the queue's own
+
+    batches = [[entry("bench", cargo_id)] * args.batch for _ in range(args.tasks // args.batch)]
+    total = len(batches) * args.batch
+    order_ids = []
+    submit_us = per_item(lambda: [order_ids.extend(robot.tasks.submit(batch)[0]) for batch in batches], total)
+    task_ids = [robot.tasks.by_order(order_id).id for order_id in order_ids]
+    print(f"{total:,} tasks queued on one robot")
+    print(f"{'submit (validated, in batches of ' + str(args.batch) + ')':<40} {submit_us:>8.2f} us/task")
+    print(f"{'get by task id':<40} {per_item(lambda: [robot.tasks.get(t) for t in task_ids], total):>8.2f} us")
+    print(f"{'get by order id':<40} {per_item(lambda: [robot.tasks.by_order(o) for o in order_ids], total):>8.2f} us")
+    print(f"{'list (whole queue)':<40} {per_item(robot.tasks.list, 1) / 1000:>8.2f} ms")
+    cancel = order_ids[: total // 2]
+    print(f"{'cancel by order id':<40} {per_item(lambda: [robot.tasks.cancel_order(o) for o in cancel], len(cancel)):>8.2f} us/task")
+    print(f"{'cancel all (the rest)':<40} {per_item(robot.tasks.cancel_all, total - len(cancel)):>8.2f} us/task")
+
+    # Execution: move to the POI, open and close a box, at maximum clock speed
+    scheduler.set_speed("max")
+    robot.tasks.submit([entry("bench", cargo_id)] * args.run)
+    start = time.perf_counter()
+    robot.tasks.set_execution(True)
+    while robot.tasks.queued or robot.tasks.list():
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    succeeded = len(robot.tasks.list("succeeded"))
+    print(f"{'run at max speed':<40} {args.run / elapsed:>8.1f} tasks/s   ({succeeded:,} succeeded)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# slamtec_emulator/benchmarks/bench_validation.py
+"""
+Request validation benchmark: the cost of the compiled validators per
+request, and a whole request through the test client with validation off
+versus strict.
+
+Usage (from the repository root):
+    python benchmarks/bench_validation.py --requests 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import validation  # noqa: E402
+from spec import load_requests  # noqa: E402
+
+# (method, spec path, request path, JSON body)
+REQUESTS = [
+    ("put", "/api/core/slam/v1/localization/pose", "/api/core/slam/v1/localization/pose", {"x": 1.0, "y": 2.0, "yaw": 0.5}),
+    (
+        "post",
+        "/api/core/motion/v1/actions",
+        "/api/core/motion/v1/actions",
+        {
+            "action_name": "slamtec.agent.actions.MoveToAction",
+            "options": {"target": {"x": 3.0, "y": 4.0}, "move_options": {"mode": 0, "flags": []}},
+        },
+    ),
+    (
+        "post",
+        "/api/core/artifact/v1/pois",
+        "/api/core/artifact/v1/pois",
+        {"id": "bench", "pose": {"x": 1.0, "y": 1.0, "yaw": 0.0}, "metadata": {"display_name": "bench"}},
+    ),
+    (
+        "post",
+        "/api/core/artifact/v1/lines/{usage}",
+        "/api/core/artifact/v1/lines/walls",
+        [{"start": {"x": i, "y": 0.0}, "end": {"x": i, "y": 1.0}} for i in range(20)],
+    ),
+]
+
+
+# Rounds of the whole-request comparison
+ROUNDS = 10
+
+
+def per_request(func, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        func()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    import app as emulator
+
+    requests = load_requests("swagger-conf.json")
+    operations = {(method, path): (parameters, body) for method, path, parameters, body in requests["operations"]}
+    compiler = validation.SchemaCompiler(requests["schemas"])
+    apps = {mode: emulator.create_app(validation_mode=mode) for mode in (validation.OFF, validation.STRICT)}
+
+    print("us per request: the validator alone, then whole requests through the test client")
+    print(f"{'request':<44} {'validate':>10} {'off':>10} {'strict':>10}")
+    for method, spec_path, path, body in REQUESTS:
+        validate = validation.compile_operation(compiler, *operations[method, spec_path])
+        with apps[validation.OFF].test_request_context(path, method=method.upper(), json=body) as ctx:
+            ctx.request.get_json()  # parsed once, as by the handler
+            kwargs = ctx.request.view_args or {}
+            assert validate(ctx.request, kwargs) is None
+            validate_us = per_request(lambda: validate(ctx.request, kwargs), args.requests)
+        # Alternate the modes in rounds, so state that grows with every request
+        # (POIs, lines) slows both down alike
+        totals = [0.0, 0.0]
+        clients = [app.test_client() for app in apps.values()]
+        for _ in range(ROUNDS):
+            for i, client in enumerate(clients):
+                totals[i] += per_request(
+                    lambda: client.open(path, method=method.upper(), json=body),
+                    args.requests // 10 // ROUNDS,
+                ) / ROUNDS
+        print(f"{method.upper() + ' ' + path:<44} {validate_us:>10.1f} {totals[0]:>10.1f} {totals[1]:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
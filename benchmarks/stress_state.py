@@ -0,0 +1,214 @@
+# slamtec_emulator/benchmarks/stress_state.py
+"""
+Concurrency stress test: reader threads hammer the GET endpoints of one
+robot while writer threads change its pose, POIs, virtual walls, areas,
+box doors and actions, with the simulation running as fast as possible.
+
+Every response is checked: no exception, no 5xx, and invariants that a
+torn or half-updated read would break (a pose written with pitch == roll,
+which motion leaves alone, POIs written with x == y, region queries only
+returning POIs inside the region). Exits with status 1 on any failure.
+
+Usage (from the repository root):
+    python benchmarks/stress_state.py --readers 8 --writers 4 --duration 10
+"""
+
+import argparse
+import collections
+import contextlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CARGO_ID = "3fa85f64-5717-4562-b3fc-2c963f66afa6"
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+        self.failures = collections.Counter()
+        self.examples = {}
+
+    def ok(self, op):
+        with self.lock:
+            self.counts[op] += 1
+
+    def fail(self, op, problem):
+        with self.lock:
+            self.counts[op] += 1
+            key = f"{op}: {problem.splitlines()[-1] if problem else problem}"
+            self.failures[key] += 1
+            self.examples.setdefault(key, problem)
+
+
+def check_pose(pose):
+    if pose["pitch"] != pose["roll"]:
+        return f"torn pose {pose}"
+
+
+def check_pois(pois, region=None):
+    for poi in pois:
+        x, y = poi["pose"]["x"], poi["pose"]["y"]
+        if poi["id"].startswith("stress-") and x != y:
+            return f"torn POI {poi}"
+        if region and not (region[0] <= x <= region[2] and region[1] <= y <= region[3]):
+            return f"POI {poi['id']} outside {region}"
+
+
+def reader_ops():
+    region = (0.0, 0.0, 10.0, 10.0)
+    query = "min_x=0&min_y=0&max_x=10&max_y=10"
+    return [
+        ("getPose", "GET", "/api/core/slam/v1/localization/pose", None, check_pose),
+        ("getCurrentPois", "GET", "/api/core/artifact/v1/pois", None, check_pois),
+        (
+            "getCurrentPois(region)",
+            "GET",
+            f"/api/core/artifact/v1/pois?{query}",
+            None,
+            lambda pois: check_pois(pois, region),
+        ),
+        ("searchNearbyPoi", "POST", "/api/multi-floor/map/v1/pois/:search_nearby", {}, None),
+        ("getCurrentAction", "GET", "/api/core/motion/v1/actions/:current", None, None),
+        ("listActions", "GET", "/api/core/motion/v1/actions?limit=5", None, None),
+        ("getCargos", "GET", "/api/delivery/v1/cargos", None, None),
+        ("getLines", "GET", "/api/core/artifact/v1/lines/walls", None, None),
+        ("getRectangleAreas", "GET", "/api/core/artifact/v1/rectangle-areas/forbidden_area", None, None),
+        ("getPowerStatus", "GET", "/api/core/system/v1/power/status", None, None),
+        ("searchPath", "POST", "/api/core/motion/v1/:search_path", {"target": {"x": 3.0, "y": 3.0}}, None),
+        ("getEvents", "GET", "/api/platform/v1/events", None, None),
+    ]
+
+
+def writer_ops(rng):
+    k = rng.uniform(0.0, 10.0)
+    poi_id = f"stress-{rng.randrange(1000)}"
+    box_op = rng.choice([":open", ":close"])
+    return [
+        ("setPose", "PUT", "/api/core/slam/v1/localization/pose", {"x": 1.0, "y": 1.0, "yaw": k, "pitch": k, "roll": k}),
+        ("addPois", "POST", "/api/core/artifact/v1/pois", {"id": poi_id, "pose": {"x": k, "y": k, "yaw": 0.0}}),
+        ("modifyPoi", "PUT", f"/api/core/artifact/v1/pois/{poi_id}", {"pose": {"x": k, "y": k}}),
+        ("deletePoi", "DELETE", f"/api/core/artifact/v1/pois/{poi_id}", None),
+        ("addLines", "POST", "/api/core/artifact/v1/lines/walls", [{"start": {"x": k, "y": 0.0}, "end": {"x": k, "y": 1.0}}]),
+        ("clearLines", "DELETE", "/api/core/artifact/v1/lines/walls", None),
+        (
+            "addRectangleArea",
+            "POST",
+            "/api/core/artifact/v1/rectangle-areas/forbidden_area",
+            {"area": {"start": {"x": k, "y": 8.0}, "end": {"x": k + 0.5, "y": 8.0}, "half_width": 0.2}},
+        ),
+        ("clearRectangleAreas", "DELETE", "/api/core/artifact/v1/rectangle-areas/forbidden_area", None),
+        ("operateBox", "PUT", f"/api/delivery/v1/cargos/{CARGO_ID}/boxes/0/{box_op}", None),
+        (
+            "createAction",
+            "POST",
+            "/api/core/motion/v1/actions",
+            {"action_name": "slamtec.agent.actions.MoveToAction", "options": {"target": {"x": k, "y": 2.5}}},
+        ),
+        ("abortCurrentAction", "DELETE", "/api/core/motion/v1/actions/:current", None),
+    ]
+
+
+def request(client, results, op, method, path, body, check=None):
+    try:
+        response = client.open(path, method=method, json=body)
+    except Exception:
+        results.fail(op, traceback.format_exc())
+        return
+    if response.status_code >= 500:
+        results.fail(op, f"HTTP {response.status_code}")
+        return
+    problem = check(response.get_json()) if check and response.status_code == 200 else None
+    if problem:
+        results.fail(op, problem)
+    else:
+        results.ok(op)
+
+
+def reader(app, results, stop, seed):
+    client = app.test_client()
+    rng = random.Random(seed)
+    ops = reader_ops()
+    while not stop.is_set():
+        request(client, results, *rng.choice(ops))
+
+
+def writer(app, results, stop, seed):
+    client = app.test_client()
+    rng = random.Random(seed)
+    while not stop.is_set():
+        request(client, results, *rng.choice(writer_ops(rng)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--pois", type=int, default=5000, help="POIs added before the run")
+    parser.add_argument(
+        "--switch-interval",
+        type=float,
+        default=1e-5,
+        help="interpreter thread switch interval; small values interleave threads more often",
+    )
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import create_app
+        from scheduler import scheduler
+
+        app = create_app()
+    app.config["PROPAGATE_EXCEPTIONS"] = True  # report handler exceptions, not just 500s
+    scheduler.set_speed("max")
+    sys.setswitchinterval(args.switch_interval)
+
+    results = Results()
+    stop = threading.Event()
+    threads = [threading.Thread(target=reader, args=(app, results, stop, i)) for i in range(args.readers)]
+    threads += [
+        threading.Thread(target=writer, args=(app, results, stop, 1000 + i)) for i in range(args.writers)
+    ]
+    # The handlers print a lot; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Start from a pose that satisfies check_pose, with enough POIs around
+        # the robot that index queries take long enough to overlap with writes
+        client = app.test_client()
+        client.put("/api/core/slam/v1/localization/pose", json={"yaw": 0.0})
+        rng = random.Random(0)
+        for i in range(args.pois):
+            k = rng.uniform(0.0, 20.0)
+            client.post("/api/core/artifact/v1/pois", json={"id": f"stress-seed-{i}", "pose": {"x": k, "y": k}})
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    total = sum(results.counts.values())
+    print(f"{total:,} requests in {elapsed:.1f} s ({args.readers} readers, {args.writers} writers)")
+    for op, count in sorted(results.counts.items()):
+        print(f"  {op:<26} {count:>8,}")
+    if results.failures:
+        print(f"{sum(results.failures.values()):,} FAILURES:")
+        for key, count in results.failures.most_common():
+            print(f"  {count:>6,} x {key}")
+        for key, example in list(results.examples.items())[:3]:
+            print(f"\n--- first {key.split(':')[0]} failure ---\n{example}")
+        sys.exit(1)
+    print("no failures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# slamtec_emulator/event_bus.py
+
+import collections
+import itertools
+import threading
+import time
+
+# Events kept per robot; older ones are dropped (readers notice via the ids)
+EVENT_CAPACITY = 256
+
+# Upper bound of events returned by one read
+READ_LIMIT = 100
+
+# Event types of the emulator itself, next to the spec's RobotEvent types
+# (GeneralEventType, ElevatorEventType, DeliveryEventType), which clients
+# are expected to ignore when they don't know them.
+ACTION_STARTED = "ACTION_STARTED"
+ACTION_FINISHED = "ACTION_FINISHED"
+POSE_CHANGED = "POSE_CHANGED"
+BOX_DOOR_STATUS_CHANGED = "BOX_DOOR_STATUS_CHANGED"
+SET_MAP_DONE = "SET_MAP_DONE"  # GeneralEventType
+DELIVERY_TASK_START = "DELIVERY_TASK_START"  # DeliveryEventType
+DELIVERY_NO_PICKUP = "DELIVERY_NO_PICKUP"  # DeliveryEventType
+DELIVERY_TASK_FINISHED = "DELIVERY_TASK_FINISHED"
+
+
+class EventBus:
+    """
+    A robot's recent events, in a bounded buffer. Every event gets the next
+    integer id, which readers use as a cursor: read(after=id) returns what
+    happened since, optionally blocking until something does.
+
+    'clock' returns the current time in seconds; event timestamps are in
+    milliseconds of (simulated) time, as strings like the spec's RobotEvent.
+    """
+
+    def __init__(self, clock, capacity=EVENT_CAPACITY):
+        self.clock = clock
+        self._events = collections.deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._changed = threading.Condition()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event_type, **data):
+        """Records an event and wakes up every blocked reader."""
+        with self._changed:
+            self._last_id = next(self._ids)
+            event = {
+                "id": self._last_id,
+                "type": event_type,
+                "timestamp": str(int(self.clock() * 1000)),
+            }
+            if data:
+                event["data"] = data
+            self._events.append(event)
+            self._changed.notify_all()
+        return event
+
+    def read(self, after=None, timeout=0.0, limit=READ_LIMIT, types=None):
+        """
+        Returns (events, cursor): the buffered events with an id above 'after'
+        (all of them if None), oldest first, restricted to 'types' if given.
+        Waits up to 'timeout' seconds of wall-clock time for a matching event
+        when there is none. Pass the returned cursor as 'after' to continue
+        where this read stopped. A limit below 1 reads nothing, at once.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            events, cursor = self._since(after or 0, limit, types)
+            while not events and limit > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+                events, cursor = self._since(cursor, limit, types)
+        return events, cursor
+
+    def _since(self, after, limit, types):
+        """(matching events with an id above 'after', id of the last event looked at)."""
+        if after > self._last_id:
+            after = 0  # a cursor from before the emulator restarted
+        oldest = self._last_id - len(self._events) + 1
+        start = max(after - oldest + 1, 0)
+        events = []
+        cursor = max(after, oldest - 1)
+        for event in itertools.islice(self._events, start, None):
+            if len(events) >= limit:
+                break
+            cursor = event["id"]
+            if types is None or event["type"] in types:
+                events.append(event)
+        return events, cursor
@@ -0,0 +1,226 @@
+# slamtec_emulator/faults.py
+"""
+Fault injection: makes chosen operations behave like a slow or flaky robot,
+so clients can be load-tested against latency, timeouts, 5xx errors and slow
+map downloads.
+
+Faults are described by a JSON file keyed by spec operationId (the names of
+handler_map, or the view name of routes outside the spec), loaded with
+--faults FILE or the EMULATOR_FAULTS environment variable:
+
+    {
+      "seed": 42,
+      "operations": {
+        "*": {"latency": {"distribution": "lognormal", "median": 0.02, "sigma": 0.5}},
+        "getPose": {"errors": {"rate": 0.05, "status": [500, 503]}},
+        "createAction": {"timeouts": {"rate": 0.01, "seconds": 10}},
+        "getCompositeMap": {"bandwidth": 262144}
+      }
+    }
+
+"*" applies to every operation; an operation's own entry overrides its keys.
+
+* latency: a delay before the handler runs. Distributions: "fixed"
+  (seconds), "uniform" (min, max), "normal" (mean, stddev; clipped at 0),
+  "lognormal" (median, sigma) and "exponential" (mean).
+* errors: answers with one of the given 5xx statuses (default 500) without
+  running the handler, at the given rate (0..1).
+* timeouts: hangs for the given seconds (default 30) then answers 504, at the
+  given rate.
+* bandwidth: sends the response body at most this many bytes per second.
+
+Only the views of operations with faults are wrapped, so without a fault
+file (or for operations it does not mention) requests take exactly the same
+path as before. Every operation draws from its own random generator seeded
+with (seed, operationId): the n-th request to an operation always gets the
+same faults, whatever the other operations receive.
+"""
+
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import jsonify, make_response
+
+log = logging.getLogger(__name__)
+
+# Key of the profile applied to every operation
+ALL_OPERATIONS = "*"
+
+# Throttled bodies are sent in slices of about this share of a second's
+# bandwidth, so the transfer rate stays smooth
+THROTTLE_SLICE = 0.05
+
+LATENCY_DISTRIBUTIONS = {
+    "fixed": lambda rng, p: p["seconds"],
+    "uniform": lambda rng, p: rng.uniform(p["min"], p["max"]),
+    "normal": lambda rng, p: max(rng.gauss(p["mean"], p["stddev"]), 0.0),
+    "lognormal": lambda rng, p: p["median"] * rng.lognormvariate(0.0, p["sigma"]),
+    "exponential": lambda rng, p: rng.expovariate(1.0 / p["mean"]),
+}
+
+PROFILE_KEYS = ("latency", "errors", "timeouts", "bandwidth")
+
+
+class FaultError(ValueError):
+    """Raised for an invalid fault file."""
+
+
+class FaultProfile:
+    """The faults injected into one operation, with its own random generator."""
+
+    __slots__ = (
+        "operation",
+        "latency",
+        "error_rate",
+        "error_statuses",
+        "timeout_rate",
+        "timeout",
+        "bandwidth",
+        "_rng",
+        "_lock",
+    )
+
+    def __init__(self, operation, config, seed=0):
+        unknown = set(config) - set(PROFILE_KEYS)
+        if unknown:
+            raise FaultError(f"{operation}: unknown keys {sorted(unknown)}")
+        self.operation = operation
+
+        latency = config.get("latency")
+        if latency is not None:
+            distribution = LATENCY_DISTRIBUTIONS.get(latency.get("distribution", "fixed"))
+            if distribution is None:
+                raise FaultError(
+                    f"{operation}: latency distribution must be one of {sorted(LATENCY_DISTRIBUTIONS)}"
+                )
+            params = {k: float(v) for k, v in latency.items() if k != "distribution"}
+            self.latency = functools.partial(distribution, p=params)
+            try:
+                self.latency(random.Random())
+            except KeyError as e:
+                raise FaultError(f"{operation}: latency is missing {e}") from None
+        else:
+            self.latency = None
+
+        errors = config.get("errors", {})
+        self.error_rate = float(errors.get("rate", 0.0))
+        statuses = errors.get("status", 500)
+        self.error_statuses = [statuses] if isinstance(statuses, int) else list(statuses)
+        if not all(500 <= status < 600 for status in self.error_statuses):
+            raise FaultError(f"{operation}: error statuses must be 5xx")
+
+        timeouts = config.get("timeouts", {})
+        self.timeout_rate = float(timeouts.get("rate", 0.0))
+        self.timeout = float(timeouts.get("seconds", 30.0))
+        if self.error_rate + self.timeout_rate > 1.0:
+            raise FaultError(f"{operation}: error and timeout rates add up to more than 1")
+
+        bandwidth = config.get("bandwidth")
+        self.bandwidth = float(bandwidth) if bandwidth else None
+
+        self._rng = random.Random(f"{seed}:{operation}")
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """
+        Returns (delay in seconds, status of an injected failure or None) for
+        the next request. Always consumes the same number of random values.
+        """
+        with self._lock:
+            delay = self.latency(self._rng) if self.latency else 0.0
+            roll = self._rng.random()
+            status = self._rng.choice(self.error_statuses)
+        if roll < self.timeout_rate:
+            return delay + self.timeout, 504
+        if roll < self.timeout_rate + self.error_rate:
+            return delay, status
+        return delay, None
+
+
+def load(path):
+    """
+    Reads a fault file. Returns (seed, {operationId: FaultProfile} of the
+    operations it names, the "*" settings or None).
+    """
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise FaultError(f"Cannot read fault file {path}: {e}") from None
+    seed = config.get("seed", 0)
+    operations = dict(config.get("operations", {}))
+    defaults = operations.pop(ALL_OPERATIONS, None)
+    profiles = {
+        operation: FaultProfile(operation, {**(defaults or {}), **settings}, seed)
+        for operation, settings in operations.items()
+    }
+    if defaults is not None:
+        FaultProfile(ALL_OPERATIONS, defaults)  # validate
+    return seed, profiles, defaults
+
+
+def throttled(chunks, bandwidth):
+    """Re-yields the byte chunks of a response body at most 'bandwidth' bytes per second."""
+    size = max(int(bandwidth * THROTTLE_SLICE), 1)
+    start = time.monotonic()
+    sent = 0
+    for chunk in chunks:
+        for i in range(0, len(chunk), size):
+            piece = chunk[i : i + size]
+            # Sleep until the bytes sent so far are due
+            ahead = start + sent / bandwidth - time.monotonic()
+            if ahead > 0:
+                time.sleep(ahead)
+            yield piece
+            sent += len(piece)
+
+
+def inject(profile, view):
+    """Wraps a Flask view function to apply the faults of 'profile'."""
+
+    @functools.wraps(view)
+    def faulty_view(*args, **kwargs):
+        delay, status = profile.draw()
+        if delay:
+            time.sleep(delay)
+        if status is not None:
+            return jsonify({"error": "injected fault", "operation": profile.operation}), status
+        if profile.bandwidth is None:
+            return view(*args, **kwargs)
+        response = make_response(view(*args, **kwargs))
+        response.response = throttled(response.response, profile.bandwidth)
+        return response
+
+    return faulty_view
+
+
+def install(app, operation_ids, path=None):
+    """
+    Wraps the views of 'app' whose operations have faults in the fault file
+    at 'path' (default: EMULATOR_FAULTS). Does nothing without a file.
+    """
+    path = path or os.environ.get("EMULATOR_FAULTS")
+    if not path:
+        return
+    seed, profiles, defaults = load(path)
+    known = set(operation_ids.get(endpoint, endpoint) for endpoint in app.view_functions)
+    for operation in profiles.keys() - known:
+        log.warning("Fault file %s: no route for operation %s", path, operation)
+
+    wrapped = 0
+    for endpoint, view in app.view_functions.items():
+        if endpoint == "static":
+            continue
+        operation = operation_ids.get(endpoint, endpoint)
+        profile = profiles.get(operation)
+        if profile is None and defaults is not None:
+            profile = FaultProfile(operation, defaults, seed)
+        if profile is not None:
+            app.view_functions[endpoint] = inject(profile, view)
+            wrapped += 1
+    log.warning("Injecting faults from %s into %d routes (seed %s)", path, wrapped, seed)
@@ -0,0 +1,208 @@
+# slamtec_emulator/fleet.py
+
+import logging
+import threading
+import uuid
+
+from mock_data import RobotState, robot_state as default_robot_state
+
+# Robots addressed by path prefix use URLs of the form /robots/<robot_id>/api/...
+PATH_PREFIX = "/robots/"
+
+# WSGI environ keys used to hand the selected robot over to the handlers
+ENVIRON_ROBOT_ID = "emulator.robot_id"
+ENVIRON_ROBOT_STATE = "emulator.robot_state"
+
+log = logging.getLogger(__name__)
+
+
+class UnknownRobotError(KeyError):
+    """Raised when a request addresses a robot that is not part of the fleet."""
+
+
+class Fleet:
+    """
+    A registry of independent emulated robots hosted by one process.
+
+    Each robot is a separate RobotState with its own locks, so requests for
+    different robots never contend with each other. Robots are created lazily
+    on first access, which keeps large idle fleets cheap.
+
+    A request is matched to a robot by (in order of precedence):
+      1. a path prefix:  /robots/<robot_id>/api/...
+      2. the Host header: <robot_id>.<anything>[:port]
+      3. the local port the request arrived on (base_port + robot index)
+    Anything else is served by the first robot.
+    """
+
+    def __init__(self, size=1, base_port=1448, id_prefix="robot-"):
+        self._lock = threading.Lock()
+        self._robots = {}
+        self.configure(size, base_port, id_prefix)
+
+    def configure(self, size=1, base_port=1448, id_prefix="robot-", shard=0, shards=1):
+        """
+        (Re)defines the fleet. With shards > 1 this process only owns the robots
+        whose index is congruent to shard modulo shards; the others are served
+        by sibling worker processes (see serve.py).
+        """
+        if size < 1:
+            raise ValueError("A fleet needs at least one robot")
+        if not 0 <= shard < shards:
+            raise ValueError(f"Invalid shard {shard} of {shards}")
+
+        with self._lock:
+            self.size = size
+            self.base_port = base_port
+            self.shard = shard
+            self.shards = shards
+            self.robot_ids = [f"{id_prefix}{i}" for i in range(size)]
+            self._index = {robot_id: i for i, robot_id in enumerate(self.robot_ids)}
+            self._owned = [r for i, r in enumerate(self.robot_ids) if i % shards == shard]
+            self._robots = {}
+            if shard == 0:
+                # The first robot is the module-level state from mock_data, so
+                # single-robot setups that tweak mock_data.robot_state keep working.
+                self._robots[self.robot_ids[0]] = default_robot_state
+
+    @property
+    def default(self):
+        return self.get(self._owned[0])
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, robot_id):
+        return robot_id in self._index
+
+    def port_for(self, robot_id):
+        return self.base_port + self._index[robot_id]
+
+    def ports(self):
+        """Returns the ports of the robots owned by this process."""
+        return [self.port_for(robot_id) for robot_id in self._owned]
+
+    def owns(self, robot_id):
+        index = self._index.get(robot_id)
+        return index is not None and index % self.shards == self.shard
+
+    def get(self, robot_id):
+        """Returns the state of a robot, creating it on first access."""
+        state = self._robots.get(robot_id)
+        if state is not None:
+            return state
+
+        if not self.owns(robot_id):
+            raise UnknownRobotError(robot_id)
+
+        with self._lock:
+            state = self._robots.get(robot_id)
+            if state is None:
+                state = RobotState(device_id=self._device_id(robot_id))
+                self._robots[robot_id] = state
+        return state
+
+    def loaded(self):
+        """Returns the ids of the robots that have been instantiated so far."""
+        return list(self._robots)
+
+    def states(self):
+        """Returns the RobotStates that have been instantiated so far."""
+        return list(self._robots.values())
+
+    def select(self, environ):
+        """Works out which robot id a WSGI request is addressed to."""
+        robot_id = environ.get(ENVIRON_ROBOT_ID)
+        if robot_id is not None:
+            return robot_id
+
+        if len(self._owned) == 1:
+            return self._owned[0]
+
+        host = environ.get("HTTP_HOST", "")
+        label = host.split(":", 1)[0].split(".", 1)[0]
+        if label in self._index and self.owns(label):
+            return label
+
+        try:
+            index = int(environ.get("SERVER_PORT", 0)) - self.base_port
+        except ValueError:
+            index = -1
+        if 0 <= index < self.size and index % self.shards == self.shard:
+            return self.robot_ids[index]
+
+        return self._owned[0]
+
+    def resolve(self, environ):
+        """Returns the RobotState a WSGI request is addressed to (cached per request)."""
+        state = environ.get(ENVIRON_ROBOT_STATE)
+        if state is None:
+            state = self.get(self.select(environ))
+            environ[ENVIRON_ROBOT_STATE] = state
+        return state
+
+    def describe(self):
+        return [
+            {
+                "id": robot_id,
+                "port": self.base_port + i,
+                "path_prefix": f"{PATH_PREFIX}{robot_id}",
+                "loaded": robot_id in self._robots,
+                "shard": i % self.shards,
+            }
+            for i, robot_id in enumerate(self.robot_ids)
+        ]
+
+    @staticmethod
+    def _device_id(robot_id):
+        return uuid.uuid5(uuid.NAMESPACE_DNS, f"{robot_id}.slamtec-emulator").hex.upper()
+
+
+class FleetDispatcher:
+    """
+    WSGI middleware that strips the /robots/<robot_id> prefix from the path,
+    so the spec routes match unchanged, and records the addressed robot.
+    """
+
+    def __init__(self, wsgi_app, fleet):
+        self.wsgi_app = wsgi_app
+        self.fleet = fleet
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path.startswith(PATH_PREFIX):
+            robot_id, _, rest = path[len(PATH_PREFIX) :].partition("/")
+            if robot_id not in self.fleet:
+                start_response("404 NOT FOUND", [("Content-Type", "application/json")])
+                return [f'{{"error": "Robot {robot_id} not found"}}'.encode()]
+            if not self.fleet.owns(robot_id):
+                # Served by another worker process; use that robot's own port.
+                port = self.fleet.port_for(robot_id)
+                start_response("421 MISDIRECTED REQUEST", [("Content-Type", "application/json")])
+                return [f'{{"error": "Robot {robot_id} is served on port {port}"}}'.encode()]
+            environ[ENVIRON_ROBOT_ID] = robot_id
+            environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + PATH_PREFIX + robot_id
+            environ["PATH_INFO"] = "/" + rest
+        return self.wsgi_app(environ, start_response)
+
+
+def serve_fleet_ports(app, host, fleet):
+    """
+    Serves the app on one port per robot (base_port + index), all in this
+    process. Each port gets its own threaded server; this function blocks.
+    """
+    from werkzeug.serving import make_server
+
+    servers = [make_server(host, port, app, threaded=True) for port in fleet.ports()]
+    threads = [
+        threading.Thread(target=server.serve_forever, daemon=True) for server in servers
+    ]
+    for thread in threads:
+        thread.start()
+    log.info("Serving %d robots on %s:%d-%d", len(servers), host, fleet.ports()[0], fleet.ports()[-1])
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
@@ -0,0 +1,389 @@
+# slamtec_emulator/kinematics.py
+"""
+Physics-lite motion for every robot of the process: a differential drive
+whose linear and angular speeds are capped by the robot's system_params
+(base.max_moving_speed, base.max_angular_speed) and change no faster than
+MAX_ACCELERATION and MAX_ANGULAR_ACCELERATION.
+
+A robot is given one motion command at a time:
+
+* follow(): along a planned path, heading for the next waypoint, turning
+  on the spot where it has to and slowing down for corners and the goal
+* rotate_to(): turns in place to a yaw, the short way round
+* drive(): constant commanded speeds for a duration (remote control)
+* stop(): brakes to a standstill
+
+FleetKinematics.step() advances every moving robot in a handful of numpy
+operations: its state lives in arrays parallel to the blocks of the pose
+store (see models/Pose.py), so a step reads the poses of a block, integrates
+them and writes them back in one assignment, under the pose lock that
+RobotState.update_pose takes too. Only a robot reaching a waypoint or a
+whole percent of battery costs a Python-level step of its own.
+
+Each robot also keeps wheel odometry, which relocalization does not touch:
+the distance travelled (getOdometry) and a pose integrated from the motion
+alone, starting at the origin (getOdoPose). The battery drains with the
+distance travelled and the turns made, and charges while the robot is on
+its dock.
+"""
+
+import math
+import time
+
+import numpy as np
+
+import event_bus
+import metrics
+from models.Pose import POSE_FIELDS
+
+IDLE, PATH, ROTATE, VELOCITY, BRAKE, CHARGE = range(6)
+
+# Modes of a command that has not completed yet
+COMMANDS = (PATH, ROTATE, VELOCITY)
+
+# Used when a robot's system_params do not say
+DEFAULT_MAX_SPEED = 1.2  # m/s
+DEFAULT_MAX_ANGULAR_SPEED = 2.5  # rad/s
+
+MAX_ACCELERATION = 0.8  # m/s^2
+MAX_ANGULAR_ACCELERATION = 4.0  # rad/s^2
+
+# Angular speed commanded per radian of heading error, 1/s
+HEADING_GAIN = 3.0
+# A waypoint is passed once the robot is this close to it, in meters
+WAYPOINT_RADIUS = 0.1
+# A path or a rotation ends this close to its goal (m, rad)
+GOAL_TOLERANCE = 0.02
+YAW_TOLERANCE = 0.01
+
+# A moving robot publishes POSE_CHANGED this often (and when it stops), in seconds
+POSE_EVENT_INTERVAL = 0.5
+
+BATTERY_PER_METER = 0.02  # percent
+BATTERY_PER_RADIAN = 0.002  # percent
+CHARGE_PER_SECOND = 100 / (3 * 3600)  # percent: empty to full in three hours
+
+STEP_SECONDS = metrics.registry.histogram(
+    "emulator_kinematics_step_seconds", "Time spent stepping the motion of the fleet.", None
+).child(None)
+
+
+def wrap_angle(angle):
+    """The angle(s) in [-pi, pi)."""
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+class _Path:
+    """A path being followed: its waypoints and the speed the robot may pass each of them at."""
+
+    __slots__ = ("points", "limits", "index")
+
+    def __init__(self, points, max_speed):
+        self.points = points
+        self.index = 1
+        # A corner can be taken at full speed if straight, not at all past a right angle
+        limits = [0.0] * len(points)
+        for i in range(1, len(points) - 1):
+            (x0, y0), (x1, y1), (x2, y2) = points[i - 1], points[i], points[i + 1]
+            turn = math.atan2(y2 - y1, x2 - x1) - math.atan2(y1 - y0, x1 - x0)
+            limits[i] = max_speed * max(math.cos(turn), 0.0)
+        # ... and only as fast as the robot can still slow down for the next ones
+        for i in range(len(points) - 2, 0, -1):
+            (x1, y1), (x2, y2) = points[i], points[i + 1]
+            reachable = math.sqrt(limits[i + 1] ** 2 + 2 * MAX_ACCELERATION * math.hypot(x2 - x1, y2 - y1))
+            limits[i] = min(limits[i], reachable)
+        self.limits = limits
+
+    @property
+    def last(self):
+        return self.index == len(self.points) - 1
+
+
+class _Block:
+    """The motion state of the robots of one pose store block, one entry per row."""
+
+    def __init__(self, poses):
+        rows = len(poses)
+        self.poses = poses  # the pose store block: x, y, z, yaw, pitch, roll
+        self.robots = [None] * rows
+        self.paths = {}  # row -> _Path
+        self.mode = np.zeros(rows, dtype=np.int8)
+        self.speed = np.zeros((rows, 2))  # linear, angular
+        self.limits = np.zeros((rows, 2))  # max linear, max angular
+        self.command = np.zeros((rows, 2))  # VELOCITY: linear, angular
+        self.goal = np.zeros((rows, 3))  # PATH: waypoint x, y, speed limit there; ROTATE: yaw
+        self.final = np.zeros(rows, dtype=bool)  # PATH: the waypoint is the goal
+        self.remaining = np.zeros(rows)  # VELOCITY: seconds left
+        self.odometer = np.zeros(rows)  # meters
+        self.odo_pose = np.zeros((rows, 3))  # x, y, yaw
+        self.battery = np.zeros(rows)  # percent used (charged if negative), not yet in power_status
+
+
+class FleetKinematics:
+    """
+    The motion of every robot in the process. Commands come from request
+    threads and action simulations (with the robot's action lock held), steps
+    from the motion loop; both serialize on 'lock', which is also the pose
+    lock of every robot. 'on_command' is called, without the lock, whenever a
+    robot is given something to do, so the loop's timer can start.
+    """
+
+    def __init__(self, on_command=None):
+        self.lock = metrics.lock("pose")
+        self.on_command = on_command
+        self._blocks = {}  # id of a pose store block -> _Block
+        self._steps = 0
+
+    def _locate(self, robot):
+        """(_Block, row) of a robot, added on first use. Call with the lock held."""
+        pose = robot.pose
+        block = self._blocks.get(id(pose.block))
+        if block is None:
+            block = self._blocks[id(pose.block)] = _Block(pose.block)
+        block.robots[pose.row] = robot
+        return block, pose.row
+
+    def _command(self, robot, mode, path=None, **fields):
+        with self.lock:
+            block, row = self._locate(robot)
+            block.paths.pop(row, None)
+            block.mode[row] = mode
+            params = robot.system_params
+            block.limits[row] = (
+                params.get("base.max_moving_speed", DEFAULT_MAX_SPEED),
+                params.get("base.max_angular_speed", DEFAULT_MAX_ANGULAR_SPEED),
+            )
+            for name, value in fields.items():
+                getattr(block, name)[row] = value
+            if path is not None:
+                followed = block.paths[row] = _Path(path, block.limits[row, 0])
+                self._set_waypoint(block, row, followed)
+        if self.on_command is not None:
+            self.on_command()
+
+    def follow(self, robot, path):
+        """Follows a path, a list of at least two [x, y] waypoints starting at the robot."""
+        self._command(robot, PATH, path=path)
+
+    def rotate_to(self, robot, yaw):
+        self._command(robot, ROTATE, goal=(float(wrap_angle(yaw)), 0.0, 0.0))
+
+    def drive(self, robot, linear, angular, duration):
+        """Drives at 'linear' m/s and 'angular' rad/s (within the robot's limits) for 'duration' seconds."""
+        self._command(robot, VELOCITY, command=(linear, angular), remaining=duration)
+
+    def stop(self, robot):
+        """Ends the robot's command; it brakes to a standstill."""
+        with self.lock:
+            block, row = self._locate(robot)
+            if block.mode[row] in COMMANDS:
+                block.paths.pop(row, None)
+                block.mode[row] = BRAKE
+
+    def halt(self, robot):
+        """Stops the robot at once, as if it had never been moving."""
+        with self.lock:
+            block, row = self._locate(robot)
+            block.paths.pop(row, None)
+            block.mode[row] = IDLE
+            block.speed[row] = 0.0
+
+    def charge(self, robot, charging=True):
+        """Starts (or stops) charging a robot that is not moving."""
+        with self.lock:
+            block, row = self._locate(robot)
+            full = robot.power_status["batteryPercentage"] >= 100
+            if charging and not full and block.mode[row] == IDLE:
+                block.mode[row] = CHARGE
+            elif not charging and block.mode[row] == CHARGE:
+                block.mode[row] = IDLE
+        if charging and self.on_command is not None:
+            self.on_command()
+
+    def moving(self, robot):
+        """Whether the robot's last command is still under way."""
+        pose = robot.pose
+        block = self._blocks.get(id(pose.block))
+        return block is not None and block.mode[pose.row] in COMMANDS
+
+    @property
+    def active(self):
+        """Robots moving, braking or charging."""
+        return sum(int(np.count_nonzero(block.mode)) for block in list(self._blocks.values()))
+
+    def speed(self, robot):
+        """(linear m/s, angular rad/s) of a robot."""
+        pose = robot.pose
+        block = self._blocks.get(id(pose.block))
+        if block is None:
+            return 0.0, 0.0
+        linear, angular = block.speed[pose.row].tolist()
+        return linear, angular
+
+    def odometry(self, robot):
+        """The distance a robot has travelled, in meters."""
+        pose = robot.pose
+        block = self._blocks.get(id(pose.block))
+        return 0.0 if block is None else float(block.odometer[pose.row])
+
+    def odo_pose(self, robot):
+        """A robot's pose integrated from its wheel odometry alone, as a spec Pose3D dictionary."""
+        pose = robot.pose
+        block = self._blocks.get(id(pose.block))
+        x, y, yaw = (0.0, 0.0, 0.0) if block is None else block.odo_pose[pose.row].tolist()
+        return {"x": x, "y": y, "z": 0.0, "yaw": yaw, "pitch": 0.0, "roll": 0.0}
+
+    def set_odometry(self, robot, distance, odo_pose):
+        """Restores a robot's odometry (see snapshot.py)."""
+        with self.lock:
+            block, row = self._locate(robot)
+            block.odometer[row] = distance
+            block.odo_pose[row] = (odo_pose.get("x", 0.0), odo_pose.get("y", 0.0), odo_pose.get("yaw", 0.0))
+            block.battery[row] = 0.0
+
+    @staticmethod
+    def _set_waypoint(block, row, path):
+        x, y = path.points[path.index]
+        block.goal[row] = (x, y, path.limits[path.index])
+        block.final[row] = path.last
+
+    def step(self, dt):
+        """
+        Advances every robot with something to do by dt seconds. Returns the
+        robots whose command completed.
+        """
+        start = time.perf_counter()
+        finished, moved, battery = [], [], []
+        with self.lock:
+            self._steps += 1
+            for block in list(self._blocks.values()):
+                self._step_block(block, dt, finished, moved, battery)
+        for robot, pose in moved:
+            robot.events.publish(event_bus.POSE_CHANGED, pose=pose)
+        for robot, percent in battery:
+            self._apply_battery(robot, percent)
+        STEP_SECONDS.observe(time.perf_counter() - start)
+        return finished
+
+    def _step_block(self, block, dt, finished, moved, battery):
+        rows = np.flatnonzero(block.mode)
+        if not len(rows):
+            return
+        mode = block.mode[rows]
+        moving = mode != CHARGE
+        rows, mode = rows[moving], mode[moving]
+        if len(rows):
+            self._move(block, rows, mode, dt, finished, moved)
+
+        # The battery: used by motion, charged on the dock
+        charging = np.flatnonzero(block.mode == CHARGE)
+        block.battery[charging] -= CHARGE_PER_SECOND * dt
+        for row in np.flatnonzero(np.abs(block.battery) >= 1.0).tolist():
+            whole = math.trunc(block.battery[row])
+            block.battery[row] -= whole
+            battery.append((block.robots[row], whole))
+
+    def _move(self, block, rows, mode, dt, finished, moved):
+        poses = block.poses[rows]
+        x, y, yaw = poses[:, 0], poses[:, 1], poses[:, 3]
+
+        # Paths: pass the waypoints the robots have come close to
+        path = mode == PATH
+        if path.any():
+            following = rows[path]
+            gap = np.hypot(block.goal[following, 0] - x[path], block.goal[following, 1] - y[path])
+            for row in following[~block.final[following] & (gap < WAYPOINT_RADIUS)].tolist():
+                followed = block.paths[row]
+                followed.index += 1
+                self._set_waypoint(block, row, followed)
+
+        # What each robot would like to do...
+        max_linear, max_angular = block.limits[rows, 0], block.limits[rows, 1]
+        target = np.zeros((len(rows), 2))
+        goal = block.goal[rows]
+        if path.any():
+            dx, dy = goal[path, 0] - x[path], goal[path, 1] - y[path]
+            error = wrap_angle(np.arctan2(dy, dx) - yaw[path])
+            reachable = np.sqrt(goal[path, 2] ** 2 + 2 * MAX_ACCELERATION * np.hypot(dx, dy))
+            target[path, 0] = np.minimum(max_linear[path], reachable) * np.clip(np.cos(error), 0.0, None) ** 2
+            target[path, 1] = np.clip(HEADING_GAIN * error, -max_angular[path], max_angular[path])
+        rotate = mode == ROTATE
+        if rotate.any():
+            error = wrap_angle(goal[rotate, 0] - yaw[rotate])
+            target[rotate, 1] = np.sign(error) * np.minimum(
+                max_angular[rotate], np.sqrt(2 * MAX_ANGULAR_ACCELERATION * np.abs(error))
+            )
+        velocity = mode == VELOCITY
+        if velocity.any():
+            command = block.command[rows[velocity]]
+            target[velocity, 0] = np.clip(command[:, 0], -max_linear[velocity], max_linear[velocity])
+            target[velocity, 1] = np.clip(command[:, 1], -max_angular[velocity], max_angular[velocity])
+
+        # ... and what it can: speeds change within the acceleration limits
+        speed = block.speed[rows]
+        change = target - speed
+        np.clip(change[:, 0], -MAX_ACCELERATION * dt, MAX_ACCELERATION * dt, out=change[:, 0])
+        np.clip(change[:, 1], -MAX_ANGULAR_ACCELERATION * dt, MAX_ANGULAR_ACCELERATION * dt, out=change[:, 1])
+        speed += change
+        linear, angular = speed[:, 0], speed[:, 1]
+
+        # Integrate along the arc (midpoint heading), in the map and the odometry frame
+        distance, turn = linear * dt, angular * dt
+        heading = yaw + turn / 2
+        x += distance * np.cos(heading)
+        y += distance * np.sin(heading)
+        poses[:, 3] = wrap_angle(yaw + turn)
+        odo = block.odo_pose[rows]
+        heading = odo[:, 2] + turn / 2
+        odo[:, 0] += distance * np.cos(heading)
+        odo[:, 1] += distance * np.sin(heading)
+        odo[:, 2] = wrap_angle(odo[:, 2] + turn)
+        block.odometer[rows] += np.abs(distance)
+        block.battery[rows] += BATTERY_PER_METER * np.abs(distance) + BATTERY_PER_RADIAN * np.abs(turn)
+
+        # Commands that are done: goals reached (snapped to), durations elapsed, robots braked
+        done = np.zeros(len(rows), dtype=bool)
+        if path.any():
+            final = block.final[rows] & path
+            gap = np.hypot(goal[:, 0] - x, goal[:, 1] - y)
+            arrived = final & (gap <= np.maximum(GOAL_TOLERANCE, np.abs(linear) * dt))
+            poses[arrived, 0], poses[arrived, 1] = goal[arrived, 0], goal[arrived, 1]
+            done |= arrived
+        if rotate.any():
+            error = wrap_angle(goal[:, 0] - poses[:, 3])
+            turned = rotate & (np.abs(error) <= np.maximum(YAW_TOLERANCE, np.abs(angular) * dt))
+            poses[turned, 3] = goal[turned, 0]
+            done |= turned
+        if velocity.any():
+            block.remaining[rows[velocity]] -= dt
+            elapsed = velocity & (block.remaining[rows] <= 1e-9)
+            mode[elapsed] = BRAKE
+            for row in rows[elapsed].tolist():
+                finished.append(block.robots[row])
+        speed[done] = 0.0
+        mode[done] = IDLE
+        mode[(mode == BRAKE) & ~speed.any(axis=1)] = IDLE
+
+        block.poses[rows] = poses
+        block.odo_pose[rows] = odo
+        block.speed[rows] = speed
+        block.mode[rows] = mode
+        for row in rows[done].tolist():
+            block.paths.pop(row, None)
+            finished.append(block.robots[row])
+        # Pose events every few steps, spread over the steps by row, and on stopping
+        every = max(round(POSE_EVENT_INTERVAL / dt), 1)
+        publish = ((rows + self._steps) % every == 0) | (mode == IDLE)
+        robots = block.robots
+        for row, pose in zip(rows[publish].tolist(), poses[publish].tolist()):
+            moved.append((robots[row], dict(zip(POSE_FIELDS, pose))))
+
+    def _apply_battery(self, robot, used):
+        """Takes whole percents of battery used (charged if negative) into the robot's power status."""
+        status = robot.power_status
+        percent = min(max(status["batteryPercentage"] - used, 0), 100)
+        if percent != status["batteryPercentage"]:
+            status["batteryPercentage"] = percent
+        if percent == 100:
+            self.charge(robot, False)
+
@@ -0,0 +1,116 @@
+# slamtec_emulator/laser_scan.py
+
+import collections
+import json
+import math
+import threading
+
+import numpy as np
+
+# A 2D lidar in the middle of the robot, sweeping a full turn
+BEAM_COUNT = 720
+MIN_RANGE = 0.15  # meters; returns closer than this are the robot's own body
+MAX_RANGE = 25.0  # meters
+
+# Scans kept per process; pollers of an idle robot always hit the cache
+SCAN_CACHE_SIZE = 1024
+
+# Distances are sampled every half cell, a block of samples per beam at a
+# time; the block grows so short and long beams both take few numpy calls.
+FIRST_BLOCK = 64
+
+
+class LaserScanner:
+    """
+    Simulates laser scans by casting every beam against an OccupancyMap at
+    once with numpy. Scans are cached per (map version, pose), so any number
+    of clients polling the same robot share one computation.
+    """
+
+    def __init__(self, beams=BEAM_COUNT, min_range=MIN_RANGE, max_range=MAX_RANGE, cache_size=SCAN_CACHE_SIZE):
+        self.beams = beams
+        self.min_range = min_range
+        self.max_range = max_range
+        # Beam angles relative to the robot's heading, in [-pi, pi)
+        self.angles = np.linspace(-math.pi, math.pi, beams, endpoint=False).round(6)
+        # The constant start of every point's JSON; scans only fill in the rest
+        self._point_heads = [f'{{"angle":{a!r},"distance":' for a in self.angles.tolist()]
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()  # (map version, x, y, yaw) -> JSON body
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def ranges(self, occupancy_map, x, y, yaw):
+        """
+        Returns (distances, valid) arrays, one entry per beam. A beam is valid
+        when it hits an occupied cell within range; otherwise its distance is 0.
+        """
+        height, width = occupancy_map.grid.shape
+        cells = occupancy_map.grid.reshape(-1)
+        step = occupancy_map.resolution / 2
+        # Beam directions and the robot position, in cells
+        dx = np.cos(self.angles + yaw) * (step / occupancy_map.resolution)
+        dy = np.sin(self.angles + yaw) * (step / occupancy_map.resolution)
+        fx = (x - occupancy_map.origin_x) / occupancy_map.resolution
+        fy = (y - occupancy_map.origin_y) / occupancy_map.resolution
+
+        distances = np.zeros(self.beams)
+        valid = np.zeros(self.beams, dtype=bool)
+        active = np.arange(self.beams)  # beams still travelling
+        start = int(math.ceil(self.min_range / step))
+        last = int(self.max_range / step)
+        block = FIRST_BLOCK
+        while active.size and start <= last:
+            samples = np.arange(start, min(start + block, last + 1))
+            cols = np.floor(fx + dx[active, None] * samples).astype(np.intp)
+            rows = np.floor(fy + dy[active, None] * samples).astype(np.intp)
+            # Negative indices wrap to huge unsigned values, so one compare per axis
+            inside = (rows.view(np.uintp) < height) & (cols.view(np.uintp) < width)
+            values = cells[np.where(inside, rows * width + cols, 0)]
+            # Occupied cells hold 1..127 (see occupancy_map.py)
+            hit = inside & ((values - np.uint8(1)) < 127)
+            stopped = hit | ~inside
+            done = stopped.any(axis=1)
+            if done.any():
+                first = stopped[done].argmax(axis=1)
+                beams = active[done]
+                hits = hit[done, first]
+                distances[beams[hits]] = samples[first[hits]] * step
+                valid[beams[hits]] = True
+                active = active[~done]
+            start += block
+            block *= 2
+        return distances, valid
+
+    def scan(self, occupancy_map, pose):
+        """The LaserScan of the spec for a robot at 'pose', as a JSON body (bytes)."""
+        pose = pose.to_dict()  # read once, the robot may be moving
+        key = (occupancy_map.version, pose["x"], pose["y"], pose["yaw"])
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+
+        distances, valid = self.ranges(occupancy_map, *key[1:])
+        points = ",".join(
+            [
+                head + repr(d) + (',"valid":true}' if v else ',"valid":false}')
+                for head, d, v in zip(self._point_heads, distances.round(4).tolist(), valid.tolist())
+            ]
+        )
+        pose_json = json.dumps(pose, separators=(",", ":"))
+        body = f'{{"pose":{pose_json},"laser_points":[{points}]}}'.encode()
+
+        with self._lock:
+            self._cache[key] = body
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return body
+
+
+# Shared by every robot in the process
+scanner = LaserScanner()
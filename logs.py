@@ -0,0 +1,64 @@
+# slamtec_emulator/logs.py
+"""
+Logging setup of the emulator's entry points (app.py, serve.py workers).
+
+Modules log through logging.getLogger(__name__) with lazy %-formatting, so
+a disabled level costs a single comparison. Records are handed to a queue
+and written to stderr by a background thread, so request threads never wait
+on the terminal. Level "off" disables logging entirely.
+
+Without configure() (benchmarks, library use) Python's defaults apply:
+warnings and errors only.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LEVELS = ("debug", "info", "warning", "error", "critical", "off")
+
+FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_listener = None
+_handler = None
+
+
+def configure(level=None):
+    """
+    Sets the emulator's log level ("debug" ... "critical", or "off"; default:
+    the EMULATOR_LOG_LEVEL environment variable, else "info"). Idempotent.
+    """
+    global _listener, _handler
+    level = (level or os.environ.get("EMULATOR_LOG_LEVEL") or "info").lower()
+    if level not in LEVELS:
+        raise ValueError(f"Unknown log level {level!r}, expected one of {', '.join(LEVELS)}")
+
+    root = logging.getLogger()
+    if level == "off":
+        logging.disable(logging.CRITICAL)
+        return
+    logging.disable(logging.NOTSET)
+    root.setLevel(level.upper())
+
+    if _listener is None:
+        records = queue.SimpleQueue()
+        output = logging.StreamHandler()
+        output.setFormatter(logging.Formatter(FORMAT))
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        _handler = logging.handlers.QueueHandler(records)
+        root.addHandler(_handler)
+
+
+def _after_fork():
+    """A forked child (serve.py workers) inherits the queue but not the writer thread."""
+    global _listener, _handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_handler)
+        _listener = _handler = None
+
+
+os.register_at_fork(after_in_child=_after_fork)
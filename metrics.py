@@ -0,0 +1,210 @@
+# slamtec_emulator/metrics.py
+"""
+In-process metrics, served in the Prometheus text format on GET /metrics:
+handler latency per operationId, lock wait times, counters of started
+actions and box operations, and gauges read from the emulator at scrape time.
+
+Metrics are per process: with serve.py --workers N, scrape every worker.
+Set EMULATOR_METRICS=0 to turn them off; handlers and locks are then not
+wrapped at all.
+"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("EMULATOR_METRICS", "1").lower() not in ("0", "false", "off")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0
+)
+LOCK_WAIT_BUCKETS = (0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0)
+
+
+def _labels(label, value, *extra):
+    """The {label="value",...} part of a sample line ('' without labels)."""
+    pairs = list(extra)
+    if label is not None:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.insert(0, f'{label}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Observations counted into fixed buckets, plus their sum."""
+
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class HistogramFamily:
+    """Histograms of one metric, one per value of a label."""
+
+    def __init__(self, name, help, label, buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label, self.buckets = name, help, label, buckets
+        self._children = {}
+
+    def child(self, value):
+        histogram = self._children.get(value)
+        if histogram is None:
+            histogram = self._children.setdefault(value, Histogram(self.buckets))
+        return histogram
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for value, histogram in sorted(self._children.items()):
+            with histogram._lock:
+                counts, total = list(histogram.counts), histogram.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.label, value, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label, value)} {total}"
+            yield f"{self.name}_count{_labels(self.label, value)} {cumulative}"
+
+
+class CounterFamily:
+    """Monotonic counters of one metric, one per value of a label."""
+
+    def __init__(self, name, help, label):
+        self.name, self.help, self.label = name, help, label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=None, amount=1):
+        with self._lock:
+            self._values[value] = self._values.get(value, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items(), key=lambda item: str(item[0]))
+        for value, count in values:
+            yield f"{self.name}{_labels(self.label, value)} {count}"
+
+
+class GaugeFamily:
+    """A gauge computed at scrape time: callback() returns {label value: number}."""
+
+    def __init__(self, name, help, label, callback):
+        self.name, self.help, self.label, self.callback = name, help, label, callback
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for value, number in sorted(self.callback().items(), key=lambda item: str(item[0])):
+            yield f"{self.name}{_labels(self.label, value)} {number}"
+
+
+class Registry:
+    def __init__(self):
+        self._families = {}
+
+    def _register(self, family):
+        return self._families.setdefault(family.name, family)
+
+    def histogram(self, name, help, label, buckets=LATENCY_BUCKETS):
+        return self._register(HistogramFamily(name, help, label, buckets))
+
+    def counter(self, name, help, label=None):
+        return self._register(CounterFamily(name, help, label))
+
+    def gauge(self, name, help, label, callback):
+        """Registers (or replaces) a gauge read through callback() at every scrape."""
+        self._families[name] = GaugeFamily(name, help, label, callback)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = [line for family in self._families.values() for line in family.render()]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "emulator_request_duration_seconds", "Time spent in the request handler.", "operation"
+)
+REQUEST_EXCEPTIONS = registry.counter(
+    "emulator_request_exceptions_total", "Requests whose handler raised.", "operation"
+)
+LOCK_WAIT_SECONDS = registry.histogram(
+    "emulator_lock_wait_seconds", "Time spent waiting to acquire a state lock.", "lock", LOCK_WAIT_BUCKETS
+)
+ACTIONS_STARTED = registry.counter("emulator_actions_started_total", "Actions started.", "action")
+BOX_OPERATIONS_STARTED = registry.counter(
+    "emulator_box_operations_started_total", "Box door operations started.", "operation"
+)
+
+
+def timed(operation, view):
+    """Wraps a Flask view function to record its duration (and exceptions) under 'operation'."""
+    histogram = REQUEST_SECONDS.child(operation)
+
+    @functools.wraps(view)
+    def timed_view(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return view(*args, **kwargs)
+        except Exception:
+            REQUEST_EXCEPTIONS.inc(operation)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return timed_view
+
+
+class TimedLock:
+    """A threading.Lock that records how long every acquisition waited."""
+
+    __slots__ = ("_lock", "_wait")
+
+    def __init__(self, name):
+        self._lock = threading.Lock()
+        self._wait = LOCK_WAIT_SECONDS.child(name)
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            self._wait.observe(0.0)
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        self._wait.observe(time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def lock(name):
+    """A lock whose wait times are recorded under 'name' (a plain Lock when metrics are off)."""
+    return TimedLock(name) if ENABLED else threading.Lock()
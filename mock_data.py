@@ -1,91 +1,173 @@
 # slamtec_emulator/mock_data.py
 
+import logging
 import uuid
-import time
-import threading
 import math
-import random
-from models.Pose import Pose3D
+from collections import namedtuple
+from dataclasses import replace
+import actions
+import event_bus
+import metrics
+from action_history import ActionHistory, spill_path_for
+from actions import ActionQueue, motion
+from event_bus import EventBus
+from models.Pose import Pose3D, pose_store
 from models.Cargo import Cargo, DoorStatus
 from models.Action import (
     ActionInfo,
     ActionState,
+    SlamtecActionName,
     SlamtecActionResult,
     SlamtecActionStatus,
 )
+from occupancy_map import OccupancyMap
+from planner import planning_grid_for
+from poi_index import PoiIndex
+from response_cache import ResponseCache, VersionedDict
+from scheduler import scheduler
+import snapshot
+from task_engine import TaskEngine
+from world import get_world
+
+log = logging.getLogger(__name__)
+
+# Metric label values: unknown action names are counted as "other"
+KNOWN_ACTIONS = frozenset(SlamtecActionName)
+
+# The POIs of a floor the world does not give any (the single floor by default)
+INITIAL_POIS = (
+    {
+        "id": "e8d7f6c8-a1b2-c3d4-e5f6-a7b8c9d0e1f2",
+        "pose": {"x": 5.0, "y": 3.0, "yaw": 0.0},
+        "metadata": {"display_name": "Charging Station"},
+    },
+    {
+        "id": "b1c2d3e4-f5a6-b7c8-d9e0-f1a2b3c4d5e6",
+        "pose": {"x": -2.0, "y": 4.5, "yaw": 3.14},
+        "metadata": {"display_name": "yes"},
+    },
+)
+
+# What a robot keeps of a floor it has left, until it comes back
+FloorState = namedtuple("FloorState", "map pois virtual_walls virtual_tracks rectangle_areas")
+
+
+def _artifact_stores(artifacts):
+    """(walls, tracks, areas) stores from lists of virtual lines and rectangle areas, as in a composite map."""
+    walls = {line["id"]: line for line in artifacts.get("virtual_walls", [])}
+    tracks = {line["id"]: line for line in artifacts.get("virtual_tracks", [])}
+    areas = {}
+    for area in artifacts.get("rectangle_areas", []):
+        areas.setdefault(area.get("usage"), {})[area["id"]] = area
+    return walls, tracks, areas
 
 
 class RobotState:
     """
     A class to hold the emulated state of the Slamtec robot.
     This acts as our simple in-memory database.
+
+    Concurrency: request threads and the scheduler thread share this object.
+    Readers never take a lock. Writers of each subsystem (action, pose,
+    artifacts; the POI index, cargos, history and event bus have their own)
+    serialize on that subsystem's lock and publish changes copy-on-write:
+    the current action, the line and area stores and the POI index are
+    replaced by changed copies, never changed in place, so a reader keeps a
+    consistent object for as long as it holds it. Poses are written a whole
+    row at a time (see PoseView); the pose lock is shared by the fleet, as the
+    kinematics step writes the poses of every moving robot at once.
     """
 
-    def __init__(self):
-        self.device_id = "DE55F0684397409280D8625264CD921B"  # str(uuid.uuid4()).upper().replace("-", "")
+    def __init__(self, device_id="DE55F0684397409280D8625264CD921B"):
+        self.device_id = device_id  # str(uuid.uuid4()).upper().replace("-", "")
 
         # --- System State ---
-        self.power_status = {
-            "batteryPercentage": 95,
-            "isCharging": False,
-            "isDCConnected": False,
-            "dockingStatus": "not_on_dock",
-            "powerStage": "running",
-            "sleepMode": "awake",
-        }
-
-        self.robot_info = {
-            "manufacturerId": 255,
-            "manufacturerName": "Slamtec (Emulated)",
-            "modelId": 43792,
-            "modelName": "H2 (Emulated)",
-            "deviceID": self.device_id,
-            "hardwareVersion": "1.0.0",
-            "softwareVersion": "1.1.0-emulated",
-        }
-
-        self.robot_health = {
-            "hasWarning": False,
-            "hasError": False,
-            "hasFatal": False,
-            "baseError": [],
-        }
+        self.power_status = VersionedDict(
+            {
+                "batteryPercentage": 95,
+                "isCharging": False,
+                "isDCConnected": False,
+                "dockingStatus": "not_on_dock",
+                "powerStage": "running",
+                "sleepMode": "awake",
+            }
+        )
+
+        self.robot_info = VersionedDict(
+            {
+                "manufacturerId": 255,
+                "manufacturerName": "Slamtec (Emulated)",
+                "modelId": 43792,
+                "modelName": "H2 (Emulated)",
+                "deviceID": self.device_id,
+                "hardwareVersion": "1.0.0",
+                "softwareVersion": "1.1.0-emulated",
+            }
+        )
+
+        self.robot_health = VersionedDict(
+            {
+                "hasWarning": False,
+                "hasError": False,
+                "hasFatal": False,
+                "baseError": [],
+            }
+        )
 
         self.system_params = {
             "base.max_moving_speed": 1.2,  # m/s
             "base.max_angular_speed": 2.5,  # rad/s
         }
 
+        # Encoded bodies of the read endpoints, reused until the state changes
+        self.responses = ResponseCache()
+
+        # Recent state changes, read through GET /api/platform/v1/events
+        self.events = EventBus(clock=scheduler.now)
+
         # --- SLAM and Motion State ---
-        self.pose = Pose3D(x=1.0, y=2.5, z=0.0, yaw=1.57, pitch=0.0, roll=0.0)
+        # A live view on this robot's row of the fleet-wide pose store
+        self._pose = pose_store.allocate(
+            Pose3D(x=1.0, y=2.5, z=0.0, yaw=1.57, pitch=0.0, roll=0.0)
+        )
 
         self.localization_quality = 78
 
+        # Where GoHomeAction docks: the charging station (see set_home_dock)
+        self.home_pose = {"x": 5.0, "y": 3.0, "z": 0.0, "yaw": 0.0, "pitch": 0.0, "roll": 0.0}
+
         self.current_action = None
-        self.action_history = {}
+        self.action_queue = ActionQueue()  # actions waiting for the current one
+        self.action_history = ActionHistory(spill_path=spill_path_for(device_id))
         self.action_id_counter = -1
 
         # --- Artifacts State ---
-        self.pois = {
-            str(uuid.uuid4()): {
-                "id": "e8d7f6c8-a1b2-c3d4-e5f6-a7b8c9d0e1f2",
-                "pose": {"x": 5.0, "y": 3.0, "yaw": 0.0},
-                "metadata": {"display_name": "Charging Station"},
-            },
-            str(uuid.uuid4()): {
-                "id": "b1c2d3e4-f5a6-b7c8-d9e0-f1a2b3c4d5e6",
-                "pose": {"x": -2.0, "y": 4.5, "yaw": 3.14},
-                "metadata": {"display_name": "yes"},
-            },
-        }
+        # The building (see world.py); the attributes below are those of the
+        # current floor, the other floors' are kept in _floors
+        self.world = get_world()
+        self.floor = self.world.default_floor
+        self._floors = {}  # floor name -> FloorState
+        self.pois = self._seed_pois(self.floor)
+        self._map = None  # None: the floor's map, shared by the fleet (see the map property)
         self.virtual_walls = {}
         self.virtual_tracks = {}
-        self.curr_floor = {
-            "building": "PDD",
-            "floor": "0402",
-            "elevator": "",
-            "map_id": "3fa85f64-5717-4562-b3fc-2c963f66afa6",
-        }
+        self.rectangle_areas = {}  # usage -> {id: area}
+        self.artifacts_version = 0  # bumped whenever lines or areas change
+        self._artifact_id_counter = 0
+        self._planning_grid = None
+        self.curr_floor = VersionedDict(
+            {
+                "building": self.floor.building,
+                "floor": self.floor.name,
+                "elevator": "",
+                "map_id": self.floor.map_id,
+            }
+        )
+        docks = self.floor.homedocks
+        self.home_dock = docks[0] if docks else None  # MultiFloorDockInfo
+        if docks:
+            self.home_pose = {**self.home_pose, **docks[0]["pose"]}
+        self._wakeups = 0  # elevator notifications, see wake_action()
         self.cargos = [
             Cargo.from_dict(
                 {
@@ -105,7 +187,8 @@ class RobotState:
                             "errors": [],
                         }
                     ],
-                }
+                },
+                events=self.events,
             ),
             Cargo.from_dict(
                 {
@@ -125,32 +208,54 @@ class RobotState:
                             "errors": [],
                         }
                     ],
-                }
+                },
+                events=self.events,
             ),
         ]
-        self._action_lock = threading.Lock()  # To prevent race conditions with actions
-        self.action_cancel_event = None
+        # Delivery tasks, run one at a time as MoveTo actions and box operations
+        self.tasks = TaskEngine(self)
+
+        # Lock wait times are exported on /metrics (see metrics.py)
+        self._action_lock = metrics.lock("action")  # To prevent race conditions with actions
+        self._running = None  # QueuedAction of current_action
+        self._pose_lock = motion.kinematics.lock  # serializes (partial) pose updates and motion
+        self._artifacts_lock = metrics.lock("artifacts")  # lines and rectangle areas
+
+        # A scenario every robot starts from (EMULATOR_SNAPSHOT, see snapshot.py)
+        startup = snapshot.startup_state()
+        if startup is not None:
+            self.restore(startup)
 
     def get_new_action_id(self):
         self.action_id_counter += 1
         return self.action_id_counter
 
-    def start_new_action(self, action_name, options):
-        """Creates and starts a new action, running the simulation in a background thread."""
+    def start_new_action(self, action_name, options, priority=None):
+        """
+        Submits an action: it starts at once if the robot is idle or if it
+        preempts the running action, else it waits in the action queue (see
+        actions.py). Returns its ActionInfo, or None if the queue is full.
+        """
+        if priority is None:
+            priority = actions.default_priority(action_name)
+        simulation = actions.simulation_for(action_name, options)
+        if self.current_action is None and not self.action_queue:
+            # Plan in the request thread, so a long search never holds up the
+            # scheduler that every robot's simulation runs on.
+            simulation.prepare(self)
+
         with self._action_lock:
-            print(f"Running new action: {action_name}")
-            if self.current_action:
-                # A real robot might queue actions, but for this emulator,
-                # we'll only allow one at a time.
-                print(
-                    f"Failed to run new action: {action_name}, already running an action"
+            running = self._running
+            action = actions.QueuedAction(None, priority, simulation)
+            preempt = running is not None and running.preempted_by(action)
+            if running is not None and not preempt and len(self.action_queue) >= actions.MAX_QUEUED:
+                log.info(
+                    "Failed to run new action: %s, %d actions queued", action_name, len(self.action_queue)
                 )
                 return None  # Indicate failure to create action
 
             action_id = self.get_new_action_id()
-
-            # This is the ActionInfo object that gets returned immediately
-            self.current_action = ActionInfo(
+            action.info = ActionInfo(
                 action_id=action_id,
                 action_name=action_name,
                 stage="New",
@@ -160,134 +265,567 @@ class RobotState:
                     reason="",
                 ),
             )
-
-            self.action_cancel_event = threading.Event()
-            # Start the appropriate simulation in the background
-            # Here we only simulate 'MoveToAction' as an example
-            if action_name == "slamtec.agent.actions.MoveToAction":
-                thread = threading.Thread(
-                    target=self._simulate_move_to_action,
-                    args=(action_id, options, self.action_cancel_event),
+            if running is None:
+                self._start_action(action)
+            elif preempt:
+                log.info("[Action %s] Preempted by action %s", running.info.action_id, action_id)
+                self._complete_action(
+                    "Aborted", SlamtecActionResult.ABORTED, f"Preempted by action {action_id}"
                 )
-                thread.start()
+                self._start_action(action)
             else:
-                # For other actions, we can just mark them as instantly complete
-                print(
-                    f"Warning: Action '{action_name}' is not simulated. Completing immediately."
+                action.info = replace(action.info, stage="Queued")
+                self.action_queue.push(action)
+                log.info(
+                    "Queued new action %s: %s (%d waiting)", action_id, action_name, len(self.action_queue)
                 )
-                self.current_action.state.status = SlamtecActionStatus.DONE  # Done
-                self.action_history.update({action_id: self.current_action})
-                self.current_action = None
-
-            return self.action_history.get(action_id) or self.current_action
-
-    def _simulate_move_to_action(self, action_id, options, cancel_event):
-        """The background worker function that simulates robot movement."""
-        print(f"[Action {action_id}] Started: Moving to {options.get('target')}")
-        if self.current_action is None:
-            return
-        # --- Update action state to 'Working' ---
-        with self._action_lock:
-            self.current_action.stage = "MOVING_TO_TARGET"
-            self.current_action.state.status = SlamtecActionStatus.WORKING  # Working
-
-        target = options.get("target", {})
-        target_x = target.get("x", self.pose.x)
-        target_y = target.get("y", self.pose.y)
-
-        # --- Simple simulation logic ---
-        start_x, start_y = self.pose.x, self.pose.y
-        distance = math.sqrt((target_x - start_x) ** 2 + (target_y - start_y) ** 2)
-
-        speed = 0.5  # meters per second
-        duration = distance / speed
-        steps = int(duration * 10)  # 10 steps per second
-
-        if steps == 0:
-            steps = 1
+            return self.find_action(action_id)
+
+    def find_action(self, action_id):
+        """The running, queued or finished action (ActionInfo or spilled dict), or None."""
+        current = self.current_action  # read once, the simulation replaces it
+        if current is not None and current.action_id == action_id:
+            return current
+        queued = self.action_queue.get(action_id)
+        if queued is not None:
+            return queued.info
+        return self.action_history.get(action_id)
+
+    def _start_action(self, action):
+        """
+        Starts 'action', then the next queued ones for as long as they end as
+        soon as they start. Call with _action_lock held.
+        """
+        while action is not None:
+            info = action.info
+            if info.stage != "New":
+                info = replace(info, stage="New")
+            self._running = action
+            self.current_action = info
+            log.info("Running new action: %s", info.action_name)
+            self.events.publish(
+                event_bus.ACTION_STARTED, action_id=info.action_id, action_name=info.action_name
+            )
+            metrics.ACTIONS_STARTED.inc(
+                info.action_name if info.action_name in KNOWN_ACTIONS else "other"
+            )
+            if action.simulation.moves:
+                self.undock()
 
-        for i in range(steps):
-            # check for cancel action signal
-            if cancel_event.is_set():
-                print(
-                    f"[Action {action_id}] Received abort signal. Stopping simulation."
-                )
-                return  # Exit the thread
-            time.sleep(0.1)
-            progress = (i + 1) / steps
-            # Linearly interpolate the position
-            with self._action_lock:
-                self.pose.x = start_x + (target_x - start_x) * progress
-                self.pose.y = start_y + (target_y - start_y) * progress
-                # print(f"[Action {action_id}] Progress: {int(progress*100)}%, Pose: ({self.pose['x']:.2f}, {self.pose['y']:.2f})")
-
-        # --- Finalize the action ---
+            wakeups = self._wakeups
+            ended = action.simulation.start(self)
+            if ended is None:
+                motion.add(self)
+                return
+            if ended is actions.SUSPEND:
+                self._suspend(wakeups)
+                return
+            if type(action.simulation) is actions.Simulation:
+                log.info("Action '%s' is not simulated. Completing immediately.", info.action_name)
+            self._complete_action(*ended)
+            action = self.action_queue.pop()
+        motion.discard(self)
+
+    def _update_action(self, stage=None, **state):
+        """
+        Replaces the current action with a copy carrying the new stage and
+        state fields; readers keep the consistent copy they already hold.
+        Call with _action_lock held.
+        """
+        action = self.current_action
+        self.current_action = replace(
+            action,
+            stage=action.stage if stage is None else stage,
+            state=replace(action.state, **state),
+        )
+
+    def _complete_action(self, stage, result, reason=""):
+        """Ends the running action and moves it to the history. Call with _action_lock held."""
+        if result == SlamtecActionResult.ABORTED:
+            self._running.simulation.abort(self)
+        self._update_action(stage, status=SlamtecActionStatus.DONE, result=result, reason=reason)
+        self._finish_action()
+
+    def _finish_action(self):
+        """Moves the current action to the history. Call with _action_lock held."""
+        action = self.current_action
+        self.current_action = None
+        self._running = None
+        self._record_action(action)
+
+    def _record_action(self, action):
+        """Adds a finished action to the history. Call with _action_lock held."""
+        self.action_history.add(action)
+        self.events.publish(
+            event_bus.ACTION_FINISHED,
+            action_id=action.action_id,
+            action_name=action.action_name,
+            stage=action.stage,
+            result=int(action.state.result),
+            reason=action.state.reason,
+        )
+
+    def tick_action(self):
+        """One simulation step of the running action, run by the motion loop every SIMULATION_TICK."""
         with self._action_lock:
-            if cancel_event.is_set():
+            action = self._running
+            if action is None:
+                motion.discard(self)
                 return
-            self.pose.x = target_x
-            self.pose.y = target_y
-            self.current_action.stage = "Arrived"
-            self.current_action.state.status = SlamtecActionStatus.DONE  # Done
-            self.current_action.state.result = SlamtecActionResult.SUCCESS  # Success
-
-            # Move from current to history
-            self.action_history.update({action_id: self.current_action})
-            self.current_action = None
-            print(
-                f"[Action {action_id}] Finished. Final pose: ({self.pose.x:.2f}, {self.pose.y:.2f})"
-            )
+            wakeups = self._wakeups
+            ended = action.simulation.tick(self)
+            if ended is actions.SUSPEND:
+                self._suspend(wakeups)
+            elif ended is not None:
+                self._complete_action(*ended)
+                self._start_action(self.action_queue.pop())
+
+    def _suspend(self, wakeups):
+        """
+        Leaves the motion loop until wake_action(), unless the robot was woken
+        since the simulation step that read 'wakeups'. Call with _action_lock held.
+        """
+        motion.discard(self)
+        if self._wakeups != wakeups:
+            motion.add(self)
+
+    def wake_action(self):
+        """Resumes a suspended simulation (see actions.SUSPEND). Safe without the action lock."""
+        self._wakeups += 1
+        motion.add(self)
 
     def abort_current_action(self):
-        """Aborts the currently running action."""
+        """Aborts the currently running action; the queued ones carry on."""
         with self._action_lock:
             if not self.current_action:
                 return False  # No action to abort
 
             action_id = self.current_action.action_id
-            print(f"[Action {action_id}] Aborting action...")
+            log.info("[Action %s] Aborting action...", action_id)
+            self._complete_action("Aborted", SlamtecActionResult.ABORTED, "Aborted by user")
+            log.info("[Action %s] Moved to history with 'Aborted' status.", action_id)
+            self._start_action(self.action_queue.pop())
+            return True
 
-            # 1. Signal the background thread to stop
-            if self.action_cancel_event:
-                self.action_cancel_event.set()
+    def cancel_action(self, action_id, reason="Aborted by user"):
+        """Aborts an action whether it is running or queued. Returns False if it is neither."""
+        with self._action_lock:
+            current = self.current_action
+            if current is not None and current.action_id == action_id:
+                self._complete_action("Aborted", SlamtecActionResult.ABORTED, reason)
+                self._start_action(self.action_queue.pop())
+                return True
+            action = self.action_queue.remove(action_id)
+            if action is None:
+                return False
+            self._drop_queued([action], reason)
+            return True
 
-            # 2. Update the state as requested
-            self.current_action.state.status = SlamtecActionStatus.DONE  # Done
-            self.current_action.state.result = SlamtecActionResult.ABORTED  # Aborted
-            self.current_action.state.reason = "Aborted by user"
-            self.current_action.stage = "Aborted"
+    def clear_action_queue(self, reason="Removed from the queue"):
+        """Aborts every queued action (not the running one). Returns how many."""
+        with self._action_lock:
+            removed = self.action_queue.clear()
+            self._drop_queued(removed, reason)
+        return len(removed)
+
+    def _drop_queued(self, removed, reason):
+        """Records queued actions as aborted without running them. Call with _action_lock held."""
+        for action in removed:
+            info = action.info
+            self._record_action(
+                replace(
+                    info,
+                    stage="Aborted",
+                    state=replace(
+                        info.state,
+                        status=SlamtecActionStatus.DONE,
+                        result=SlamtecActionResult.ABORTED,
+                        reason=reason,
+                    ),
+                )
+            )
 
-            # 3. Move it to the history
-            self.action_history.update({action_id: self.current_action})
+    # --- Docking ---
 
-            # 4. Clear the current action
-            self.current_action = None
-            self.action_cancel_event = None
+    def dock(self):
+        self.power_status.update(
+            {"dockingStatus": "on_dock", "isCharging": True, "isDCConnected": True}
+        )
+        motion.kinematics.charge(self)
 
-            print(f"[Action {action_id}] Moved to history with 'Aborted' status.")
-            return True
+    def undock(self):
+        if self.power_status["dockingStatus"] != "not_on_dock":
+            self.power_status.update(
+                {"dockingStatus": "not_on_dock", "isCharging": False, "isDCConnected": False}
+            )
+            motion.kinematics.charge(self, False)
+
+    # --- Odometry (see kinematics.py) ---
+
+    def odometry(self):
+        """The distance travelled, in meters."""
+        return motion.kinematics.odometry(self)
+
+    def odo_pose(self):
+        """The pose integrated from wheel odometry alone, which relocalization does not change."""
+        return motion.kinematics.odo_pose(self)
+
+    # --- Path planning ---
+
+    def planning_grid(self):
+        """The planning grid for the current map, virtual walls and forbidden areas."""
+        # Version first: the stores read after it are at least that recent
+        artifacts_version = self.artifacts_version
+        self._planning_grid = planning_grid_for(
+            self.map,
+            self.virtual_walls.values(),
+            self.rectangle_areas.get("forbidden_area", {}).values(),
+            current=self._planning_grid,
+            artifacts_version=artifacts_version,
+        )
+        return self._planning_grid
+
+    def search_path(self, target):
+        """Plans a path from the current pose to target {x, y}; None if there is none."""
+        pose = self.pose.snapshot()
+        goal = (target.get("x", pose.x), target.get("y", pose.y))
+        return self.planning_grid().plan((pose.x, pose.y), goal)
+
+    # --- Virtual lines and rectangle areas ---
+    # Stores are replaced by changed copies under _artifacts_lock, so readers
+    # (handlers, the planner) can iterate the store they got without a lock.
+
+    def _new_artifact_id(self):
+        self._artifact_id_counter += 1
+        return self._artifact_id_counter
+
+    def lines(self, usage):
+        """The store of virtual lines for a usage ('walls' or 'tracks'), or None."""
+        return {"walls": self.virtual_walls, "tracks": self.virtual_tracks}.get(usage)
+
+    def _replace_lines(self, usage, store):
+        """Publishes a new line store. Call with _artifacts_lock held."""
+        if usage == "walls":
+            self.virtual_walls = store
+        else:
+            self.virtual_tracks = store
+        self.artifacts_version += 1
+
+    def _replace_areas(self, usage, store):
+        """Publishes a new area store for a usage (None removes it). Call with _artifacts_lock held."""
+        areas = dict(self.rectangle_areas)
+        if store is None:
+            areas.pop(usage, None)
+        else:
+            areas[usage] = store
+        self.rectangle_areas = areas
+        self.artifacts_version += 1
+
+    def add_lines(self, usage, lines):
+        with self._artifacts_lock:
+            store = dict(self.lines(usage))
+            for line in lines:
+                line = dict(line, id=self._new_artifact_id())
+                store[line["id"]] = line
+            self._replace_lines(usage, store)
+
+    def modify_lines(self, usage, lines):
+        with self._artifacts_lock:
+            store = dict(self.lines(usage))
+            for line in lines:
+                if line.get("id") in store:
+                    store[line["id"]] = dict(line)
+            self._replace_lines(usage, store)
+
+    def remove_line(self, usage, line_id):
+        with self._artifacts_lock:
+            store = dict(self.lines(usage))
+            removed = store.pop(line_id, None) is not None
+            self._replace_lines(usage, store)
+        return removed
+
+    def clear_lines(self, usage):
+        with self._artifacts_lock:
+            self._replace_lines(usage, {})
+
+    def add_rectangle_area(self, usage, area):
+        with self._artifacts_lock:
+            area = dict(area, id=self._new_artifact_id(), usage=usage)
+            store = dict(self.rectangle_areas.get(usage, {}))
+            store[area["id"]] = area
+            self._replace_areas(usage, store)
+        return area
+
+    def edit_rectangle_area(self, usage, area_id, area):
+        with self._artifacts_lock:
+            store = dict(self.rectangle_areas.get(usage, {}))
+            if area_id not in store:
+                return False
+            store[area_id] = dict(store[area_id], **area, id=area_id, usage=usage)
+            self._replace_areas(usage, store)
+        return True
+
+    def remove_rectangle_area(self, usage, area_id):
+        with self._artifacts_lock:
+            store = dict(self.rectangle_areas.get(usage, {}))
+            removed = store.pop(area_id, None) is not None
+            self._replace_areas(usage, store)
+        return removed
+
+    def clear_rectangle_areas(self, usage):
+        with self._artifacts_lock:
+            self._replace_areas(usage, None)
+
+    # --- Map ---
+
+    @property
+    def map(self):
+        """The robot's OccupancyMap: its floor's map (shared by the fleet) until one is loaded."""
+        return self._map if self._map is not None else self.floor.map
+
+    @map.setter
+    def map(self, occupancy_map):
+        self._map = occupancy_map
+
+    def map_artifacts(self):
+        """The virtual lines and rectangle areas saved alongside the map in a composite map."""
+        return {
+            "virtual_walls": list(self.virtual_walls.values()),
+            "virtual_tracks": list(self.virtual_tracks.values()),
+            "rectangle_areas": [
+                area for areas in self.rectangle_areas.values() for area in areas.values()
+            ],
+        }
+
+    def set_map(self, occupancy_map, artifacts=None):
+        """
+        Replaces the map (and, when given, the lines and rectangle areas), as
+        setCompositeMap does. The robot is put back at the origin.
+        """
+        self.map = occupancy_map
+        if artifacts is not None:
+            walls, tracks, areas = _artifact_stores(artifacts)
+            ids = [*walls, *tracks, *(i for store in areas.values() for i in store)]
+            with self._artifacts_lock:
+                self.virtual_walls, self.virtual_tracks, self.rectangle_areas = walls, tracks, areas
+                self._artifact_id_counter = max(ids, default=0)
+                self.artifacts_version += 1
+        self.events.publish(event_bus.SET_MAP_DONE)
+        self.update_pose(Pose3D(x=0.0, y=0.0, z=0.0, yaw=0.0, pitch=0.0, roll=0.0))
+
+    def clear_map(self):
+        """Forgets every explored cell, keeping the map's geometry."""
+        self.map = OccupancyMap.unknown_like(self.map)
+
+    @property
+    def pose(self):
+        """The robot's pose, a PoseView (reads and writes go to the pose store)."""
+        return self._pose
+
+    @pose.setter
+    def pose(self, pose):
+        self._pose.set(pose)
 
     def update_pose(self, new_pose):
-        self.pose = new_pose
+        """Sets the pose from a Pose3D or a (partial) spec Pose3D dictionary."""
+        with self._pose_lock:
+            self.pose = new_pose
+            pose = self.pose.to_dict()
+        self.events.publish(event_bus.POSE_CHANGED, pose=pose)
 
     def add_poi(self, poi_data):
         # In a real scenario, we'd validate the schema
-        poi_id = poi_data.get("id", str(uuid.uuid4()))
+        poi_data.setdefault("id", str(uuid.uuid4()))
         if "pose" not in poi_data:
             # If no pose provided, use the robot's current pose
-            poi_data["pose"] = {
-                "x": self.pose.x,
-                "y": self.pose.y,
-                "yaw": self.pose.yaw,
-            }
-        self.pois[poi_id] = poi_data
-        return poi_data
+            pose = self.pose.snapshot()
+            poi_data["pose"] = {"x": pose.x, "y": pose.y, "yaw": pose.yaw}
+        return self.pois.add(poi_data)
 
     def delete_poi(self, poi_id):
-        if poi_id in self.pois:
-            del self.pois[poi_id]
-            return True
-        return False
+        return self.pois.remove(poi_id)
+
+    def modify_poi(self, poi_id, pose=None, metadata=None):
+        return self.pois.update(poi_id, pose=pose, metadata=metadata)
+
+    def search_nearby_poi(self, max_distance=None):
+        """Finds the POI closest to the robot, with its pose relative to the robot."""
+        if self.power_status.get("dockingStatus") == "on_dock":
+            return {"name": "ON_DOCK"}
+        if self.curr_floor["elevator"]:
+            return {"name": "IN_ELEVATOR"}
+
+        pose = self.pose.snapshot()
+        poi, _ = self.pois.nearest(pose.x, pose.y, max_distance)
+        if poi is None:
+            return {"name": "UNKNOWN"}
+
+        # Robot frame: X axis points forward, Y axis to the left
+        dx = poi["pose"].get("x", 0.0) - pose.x
+        dy = poi["pose"].get("y", 0.0) - pose.y
+        cos_yaw, sin_yaw = math.cos(pose.yaw), math.sin(pose.yaw)
+        return {
+            "id": poi["id"],
+            "name": poi.get("metadata", {}).get("display_name", poi["id"]),
+            "relative_pose": {
+                "x": dx * cos_yaw + dy * sin_yaw,
+                "y": -dx * sin_yaw + dy * cos_yaw,
+            },
+        }
+
+    # --- Floors and elevators ---
+
+    @staticmethod
+    def _seed_pois(floor):
+        return PoiIndex(floor.pois if floor.pois is not None else INITIAL_POIS)
+
+    def change_floor(self, floor, pose=None, elevator=""):
+        """
+        Moves the robot to a Floor of its world, as setCurrentFloor does: the
+        map, POIs, lines and areas of the floor it leaves are kept for when it
+        comes back, those of a floor it has never been on start from the world's.
+        """
+        with self._artifacts_lock:
+            if floor is not self.floor:
+                self._floors[self.floor.name] = FloorState(
+                    self._map, self.pois, self.virtual_walls, self.virtual_tracks, self.rectangle_areas
+                )
+                state = self._floors.pop(floor.name, None)
+                if state is None:
+                    state = FloorState(None, self._seed_pois(floor), {}, {}, {})
+                self._map, self.pois, self.virtual_walls, self.virtual_tracks, self.rectangle_areas = state
+                self.floor = floor
+                self.artifacts_version += 1
+            self.curr_floor.update(
+                {
+                    "building": floor.building,
+                    "floor": floor.name,
+                    "elevator": elevator,
+                    "map_id": floor.map_id,
+                }
+            )
+        if pose is not None:
+            self.update_pose(pose)
+
+    def floor_pois(self, floor):
+        """The POIs of a Floor: the robot's own once it has been there, else the world's."""
+        if floor is self.floor:
+            return list(self.pois.values())
+        state = self._floors.get(floor.name)
+        if state is not None:
+            return list(state.pois.values())
+        return list(floor.pois if floor.pois is not None else INITIAL_POIS)
+
+    def find_poi(self, name):
+        """(Floor, POI) of the POI with this id or display name, current floor first, or (None, None)."""
+        floors = [self.floor, *(floor for floor in self.world.floors.values() if floor is not self.floor)]
+        for floor in floors:
+            for poi in self.floor_pois(floor):
+                if poi["id"] == name or poi.get("metadata", {}).get("display_name") == name:
+                    return floor, poi
+        return None, None
+
+    def enter_world(self, world):
+        """Puts the robot on the default floor of another World, dropping what it kept of the old one."""
+        self.world = world
+        self._floors = {}
+        self.change_floor(world.default_floor)
+        self._floors = {}
+        docks = self.floor.homedocks
+        self.home_dock = None
+        if docks:
+            self.set_home_dock(docks[0])
+
+    def reload_map(self, pose=None):
+        """Drops a map loaded with setCompositeMap and goes back to the floor's, as reloadStcm does."""
+        self.map = None
+        self.events.publish(event_bus.SET_MAP_DONE)
+        if pose is not None:
+            self.update_pose(pose)
+
+    def set_home_dock(self, dock):
+        """Makes a MultiFloorDockInfo of the world the dock GoHomeAction returns to."""
+        self.home_dock = dock
+        self.home_pose = {**self.home_pose, **dock["pose"]}
+
+    def elevator_boarded(self, elevator):
+        """Called by an Elevator, with its lock held, when the robot gets in."""
+        self.curr_floor.update({"elevator": elevator.id})
+        self.update_pose(elevator.pose)
+        self.wake_action()
+
+    def elevator_arrived(self, elevator, floor):
+        """Called by an Elevator, with its lock held, when the robot reaches its floor (still in the car)."""
+        self.change_floor(self.world.floors[floor], elevator=elevator.id)
+        self.wake_action()
+
+    # --- Snapshots (see snapshot.py) ---
+
+    def floor_states(self):
+        """The FloorState of every floor the robot has been on, the current one included."""
+        current = FloorState(self._map, self.pois, self.virtual_walls, self.virtual_tracks, self.rectangle_areas)
+        return {**self._floors, self.floor.name: current}
+
+    def restore(self, state):
+        """
+        Replaces the robot's state with a decoded snapshot. Running and queued
+        actions and delivery tasks are aborted; the device id stays.
+        """
+        building = state.get("building")
+        for name in state["floors"]:
+            if self.world.floor(name, building) is None:
+                raise snapshot.SnapshotError(f"Floor {name} of the snapshot is not in this world")
+        reason = "Snapshot restored"
+
+        self.tasks.cancel_all(reason=reason)
+        for elevator in self.world.elevators.values():
+            elevator.remove(self)
+        with self._action_lock:
+            self._drop_queued(self.action_queue.clear(), reason)
+            if self._running is not None:
+                self._complete_action("Aborted", SlamtecActionResult.ABORTED, reason)
+            motion.discard(self)
+            motion.kinematics.halt(self)
+            odometry = state.get("odometry") or {}
+            motion.kinematics.set_odometry(self, odometry.get("distance", 0.0), odometry.get("pose") or {})
+            history = ActionHistory(self.action_history.retention, self.action_history.spill_path)
+            # In the order they finished, which the history keeps whatever their ids
+            for action in state["action_history"]:
+                history.add(action)
+            self.action_history = history
+            self.action_id_counter = state["action_id_counter"]
+
+        floors = {}
+        for name, floor in state["floors"].items():
+            floors[name] = FloorState(floor["map"], PoiIndex(floor["pois"]), *_artifact_stores(floor))
+        current = self.world.floor(state["floor"], building)
+        with self._artifacts_lock:
+            self._map, self.pois, self.virtual_walls, self.virtual_tracks, self.rectangle_areas = floors.pop(
+                current.name
+            )
+            self._floors = floors
+            self.floor = current
+            self._artifact_id_counter = state["artifact_id_counter"]
+            self.artifacts_version += 1
+            self.curr_floor.update(
+                {
+                    "building": current.building,
+                    "floor": current.name,
+                    "elevator": "",
+                    "map_id": current.map_id,
+                }
+            )
+
+        self.localization_quality = state["localization_quality"]
+        self.power_status.update(state["power_status"])
+        self.robot_health.update(state["robot_health"])
+        self.system_params = dict(state["system_params"])
+        self.home_pose = dict(state["home_pose"])
+        self.home_dock = self.world.homedock(state["home_dock"])[1]
+        self.cargos = [Cargo.from_dict(cargo, events=self.events) for cargo in state["cargos"]]
+        self.events.publish(event_bus.SET_MAP_DONE)
+        self.update_pose(state["pose"])
+        motion.kinematics.charge(self, self.power_status["isCharging"])
 
 
 # Create a single instance of the robot's state to be shared across the app
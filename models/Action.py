@@ -42,14 +42,14 @@ class SlamtecActionResult(IntEnum):
     ABORTED = -2
 
 
-@dataclass
+@dataclass(slots=True)
 class ActionState:
     status: SlamtecActionStatus = SlamtecActionStatus.NEWBORN
     result: SlamtecActionResult = SlamtecActionResult.SUCCESS
     reason: str = str()
 
 
-@dataclass
+@dataclass(slots=True)
 class ActionInfo:
     action_id: int = -1
     action_name: SlamtecActionName = SlamtecActionName.NONE
@@ -1,11 +1,20 @@
+import logging
 import uuid
 import threading
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import List, Dict, Any, Optional
 
+import event_bus
+import metrics
+from event_bus import EventBus
+from response_cache import new_version
+from scheduler import scheduler, TimerHandle
+
 OPERATION_TIMER = 3.0
 
+log = logging.getLogger(__name__)
+
 # --- Enumerations for Status Fields ---
 # Using Enums makes the code safer and more readable than using plain strings.
 
@@ -49,7 +58,7 @@ class CargoType(Enum):
 # --- Box Class ---
 
 
-@dataclass
+@dataclass(slots=True)
 class Box:
     """Represents a single box within a cargo bay."""
 
@@ -87,7 +96,7 @@ class Box:
 # --- Cargo Class ---
 
 
-@dataclass
+@dataclass(slots=True)
 class Cargo:
     """Represents a cargo bay, which contains multiple boxes."""
 
@@ -98,15 +107,21 @@ class Cargo:
     type: CargoType
     errors: List[str] = field(default_factory=list)
     boxes: List[Box] = field(default_factory=list)
+    # changes whenever a box does, see response_cache.py
+    version: int = field(default_factory=new_version, repr=False, compare=False)
 
     # hidden variables for emulating the behavior
-    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
-    _active_thread: Optional[threading.Thread] = field(default=None, repr=False)
-    _cancel_event: Optional[threading.Event] = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=lambda: metrics.lock("cargo"), repr=False)
+    _timer: Optional[TimerHandle] = field(default=None, repr=False)
+    _operation_seq: int = field(default=0, repr=False)
+    _events: Optional[EventBus] = field(default=None, repr=False)
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "Cargo":
-        """Creates a Cargo instance from a dictionary, including nested Boxes."""
+    def from_dict(cls, data: Dict[str, Any], events: Optional[EventBus] = None) -> "Cargo":
+        """
+        Creates a Cargo instance from a dictionary, including nested Boxes.
+        Door status changes are published to 'events', if given.
+        """
         # Convert the list of box dictionaries into a list of Box objects
         box_objects = [Box.from_dict(box_data) for box_data in data.get("boxes", [])]
 
@@ -118,6 +133,7 @@ class Cargo:
             type=CargoType(data["type"]),
             errors=data.get("errors", []),
             boxes=box_objects,
+            _events=events,
         )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -135,20 +151,21 @@ class Cargo:
 
     def operation(self, door_action: DoorStatus, box: int):
         if door_action not in (DoorStatus.OPEN, DoorStatus.CLOSED):
-            print(f"Bad door action encouentered: {door_action}")
+            log.warning("Bad door action encountered: %s", door_action)
             return
 
         with self._lock:
             # --- 1. Cancel any existing operation ---
-            if self._active_thread and self._active_thread.is_alive():
-                print(f"Box {self.id}: Cancelling previous operation...")
-                self._cancel_event.set()  # Signal the old thread to stop
-                self._active_thread.join(timeout=1.0)  # Wait briefly for it to exit
+            # Cancelling a timer is O(1) and never waits for the scheduler thread.
+            if self._timer is not None:
+                log.debug("Box %s: Cancelling previous operation...", self.id)
+                self._timer.cancel()
+                self._timer = None
 
             # --- 2. Set the initial state ---
             if door_action == DoorStatus.OPEN:
                 if self.boxes[box].door_status in [DoorStatus.OPEN, DoorStatus.OPENING]:
-                    print(f"Box {self.id}: Already open or opening. No action taken.")
+                    log.debug("Box %s: Already open or opening. No action taken.", self.id)
                     return
                 self.boxes[box].door_status = DoorStatus.OPENING
             elif door_action == DoorStatus.CLOSED:
@@ -156,39 +173,48 @@ class Cargo:
                     DoorStatus.CLOSED,
                     DoorStatus.CLOSING,
                 ]:
-                    print(f"Box {self.id}: Already closed or closing. No action taken.")
+                    log.debug("Box %s: Already closed or closing. No action taken.", self.id)
                     return
                 self.boxes[box].door_status = DoorStatus.CLOSING
+            self._door_status_changed(box)
+
+            # --- 3. Schedule the completion on the shared scheduler ---
+            self._operation_seq += 1
+            log.info(
+                "Box %s: Starting %ss operation to set status to %s...",
+                self.id,
+                OPERATION_TIMER,
+                door_action.value,
+            )
+            metrics.BOX_OPERATIONS_STARTED.inc(door_action.value)
+            self._timer = scheduler.call_later(
+                OPERATION_TIMER,
+                self._complete_operation,
+                self._operation_seq,
+                box,
+                door_action,
+            )
 
-            # --- 3. Start the new operation in a background thread ---
-            self._cancel_event = threading.Event()
-
-            # The worker function now needs the cancel event
-            def _delayed_action(cancel_event: threading.Event):
-                print(
-                    f"Box {self.id}: Starting {OPERATION_TIMER}s operation to set status to {door_action.value}..."
-                )
-
-                # Instead of time.sleep(), we wait on the event.
-                # It returns False if it times out (completes), True if set (cancelled).
-                was_cancelled = cancel_event.wait(timeout=OPERATION_TIMER)
-
-                # The 'with self._lock' ensures we don't change the state
-                # while another command is trying to cancel us.
-                with self._lock:
-                    if was_cancelled:
-                        print(f"Box {self.id}: Operation was cancelled.")
-                    else:
-                        self.boxes[box].door_status = door_action
-                        print(
-                            f"Box {self.id}: Status updated to {self.boxes[box].door_status.value}."
-                        )
-
-                    # Clear the active thread since this one is now finished
-                    self._active_thread = None
-                    self._cancel_event = None
-
-            self._active_thread = threading.Thread(
-                target=_delayed_action, args=(self._cancel_event,)
+    def _complete_operation(self, seq: int, box: int, door_action: DoorStatus):
+        """Scheduler callback finishing a door operation, unless it was superseded."""
+        # The 'with self._lock' ensures we don't change the state
+        # while another command is trying to cancel us.
+        with self._lock:
+            if seq != self._operation_seq or self._timer is None:
+                log.debug("Box %s: Operation was cancelled.", self.id)
+                return
+
+            self.boxes[box].door_status = door_action
+            log.info("Box %s: Status updated to %s.", self.id, door_action.value)
+            self._timer = None
+            self._door_status_changed(box)
+
+    def _door_status_changed(self, box: int):
+        self.version = new_version()
+        if self._events is not None:
+            self._events.publish(
+                event_bus.BOX_DOOR_STATUS_CHANGED,
+                cargo_id=self.id,
+                box_id=self.boxes[box].id,
+                door_status=self.boxes[box].door_status.value,
             )
-            self._active_thread.start()
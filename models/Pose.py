@@ -1,14 +1,18 @@
+import threading
 from dataclasses import dataclass
+from typing import Any, Dict
 
+import numpy as np
 
-@dataclass
+
+@dataclass(slots=True)
 class Pose2D:
     x: float = 0.0
     y: float = 0.0
     yaw: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class Pose3D:
     x: float = 0.0
     y: float = 0.0
@@ -16,3 +20,112 @@ class Pose3D:
     yaw: float = 0.0
     pitch: float = 0.0
     roll: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Pose3D":
+        """Creates a Pose3D from a spec Pose3D dictionary; missing fields are 0."""
+        return cls(**{name: float(data.get(name, 0.0)) for name in POSE_FIELDS})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in POSE_FIELDS}
+
+
+POSE_FIELDS = ("x", "y", "z", "yaw", "pitch", "roll")
+
+# Rows per block of a PoseStore; blocks are never reallocated
+POSE_BLOCK_ROWS = 1024
+
+
+class PoseStore:
+    """
+    Struct-of-arrays storage for the poses of a whole fleet: one float64 row
+    (x, y, z, yaw, pitch, roll) per robot, in fixed-size numpy blocks. A robot
+    holds a PoseView on its row; fleet-wide code can work on the blocks
+    directly, e.g. to step every robot's pose in one numpy operation.
+    """
+
+    def __init__(self, block_rows=POSE_BLOCK_ROWS):
+        self.block_rows = block_rows
+        self.blocks = []
+        self.size = 0  # rows in use
+        self._lock = threading.Lock()
+
+    def allocate(self, pose=None) -> "PoseView":
+        """Returns a view on a new row, initialised from a Pose3D or dict."""
+        with self._lock:
+            block, row = divmod(self.size, self.block_rows)
+            if block == len(self.blocks):
+                self.blocks.append(np.zeros((self.block_rows, len(POSE_FIELDS))))
+            self.size += 1
+        view = PoseView(self.blocks[block], row)
+        if pose is not None:
+            view.set(pose)
+        return view
+
+
+def _pose_field(index):
+    def get(self):
+        return float(self._block[self._row, index])
+
+    def set(self, value):
+        self._block[self._row, index] = value
+
+    return property(get, set)
+
+
+class PoseView:
+    """
+    A live Pose3D stored in a PoseStore row; reads and writes go to the store.
+    Single fields may change between two reads: use snapshot() or to_dict()
+    for a consistent pose.
+    """
+
+    __slots__ = ("_block", "_row")
+
+    x = _pose_field(0)
+    y = _pose_field(1)
+    z = _pose_field(2)
+    yaw = _pose_field(3)
+    pitch = _pose_field(4)
+    roll = _pose_field(5)
+
+    def __init__(self, block, row):
+        self._block = block
+        self._row = row
+
+    @property
+    def block(self):
+        """The PoseStore block holding the pose."""
+        return self._block
+
+    @property
+    def row(self):
+        return self._row
+
+    def set(self, pose):
+        """
+        Copies a Pose3D, PoseView or (partial) pose dictionary into the row.
+        The row is written in one assignment, so readers never see half a pose;
+        concurrent partial updates need a lock of their own (RobotState has one).
+        """
+        if isinstance(pose, dict):
+            row = self._block[self._row].tolist()
+            for index, name in enumerate(POSE_FIELDS):
+                if name in pose:
+                    row[index] = float(pose[name])
+        else:
+            row = [getattr(pose, name) for name in POSE_FIELDS]
+        self._block[self._row] = row
+
+    def snapshot(self) -> Pose3D:
+        return Pose3D(*self._block[self._row].tolist())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(POSE_FIELDS, self._block[self._row].tolist()))
+
+    def __repr__(self):
+        return f"PoseView({', '.join(f'{k}={v!r}' for k, v in self.to_dict().items())})"
+
+
+# Poses of every robot in the process
+pose_store = PoseStore()
@@ -0,0 +1,89 @@
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import Any, Dict, List, Optional
+
+
+class DeliveryTaskType(StrEnum):
+    TAKEOUT = "TAKEOUT"
+    GUIDE = "GUIDE"
+    FOOD_DELIVERY = "FOOD_DELIVERY"
+    RETURN = "RETURN"
+    RECYCLE = "RECYCLE"
+    TAKEOUT_DISTRIBUTE = "TAKEOUT_DISTRIBUTE"
+
+
+class DeliveryTaskStatus(StrEnum):
+    READY = "READY"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    CANCELING = "CANCELING"
+    CANCELED = "CANCELED"
+
+
+# Statuses of tasks that will not change any more
+FINAL_STATUSES = frozenset(
+    (DeliveryTaskStatus.SUCCEEDED, DeliveryTaskStatus.FAILED, DeliveryTaskStatus.CANCELED)
+)
+
+
+class DeliveryTaskStage(StrEnum):  # the spec's DeliveryTaskEventStage values used here
+    ON_DELIVERING = "ON_DELIVERING"
+    ARRIVED_AT_DELIVERY_POSE = "ARRIVED_AT_DELIVERY_POSE"
+    USER_OPERATE_ROBOT = "USER_OPERATE_ROBOT"
+    ROBOT_OPERATE_CABINET = "ROBOT_OPERATE_CABINET"
+    GOING_TO_TASK_POINT = "GOING_TO_TASK_POINT"
+    ARRIVED_AT_TASK_POINT = "ARRIVED_AT_TASK_POINT"
+
+
+@dataclass(slots=True)
+class TaskCargo:
+    """The boxes of one cargo used by a task (box ids as in Box.id)."""
+
+    cargo_id: str
+    boxes: List[int] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        # The spec's CargoEntry carries box ids as strings, e.g. "000"
+        return {"cargo_id": self.cargo_id, "boxes": [f"{box:03d}" for box in self.boxes]}
+
+
+@dataclass(slots=True)
+class DeliveryTask:
+    """
+    A delivery task: go through the task points to the target POI, open the
+    task's boxes for pickup and close them again.
+
+    Published tasks are replaced by changed copies (dataclasses.replace), never
+    changed in place, like ActionInfo.
+    """
+
+    id: str
+    order_id: str
+    type: DeliveryTaskType
+    target: str
+    task_points: List[str] = field(default_factory=list)
+    cargos: List[TaskCargo] = field(default_factory=list)
+    no_pickup_wait: bool = False
+    status: DeliveryTaskStatus = DeliveryTaskStatus.READY
+    stage: Optional[DeliveryTaskStage] = None
+    reason: str = ""
+    timestamp: str = "0"  # of the last status or stage change, ms of simulated time
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The spec's DeliveryTask."""
+        result = {"reason": self.reason, "timestamp": self.timestamp}
+        if self.stage is not None:
+            result["stage"] = self.stage.value
+        return {
+            "id": self.id,
+            "task": {
+                "target": self.target,
+                "type": self.type.value,
+                "order_id": self.order_id,
+                "no_pickup_wait": self.no_pickup_wait,
+                "cargos": [cargo.to_dict() for cargo in self.cargos],
+            },
+            "status": self.status.value,
+            "result": result,
+        }
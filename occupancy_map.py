@@ -0,0 +1,232 @@
+# slamtec_emulator/occupancy_map.py
+
+import itertools
+import os
+import struct
+import threading
+
+import numpy as np
+
+# Cell values, as in the Slamtec explore map (one signed byte per cell):
+# 0 is unknown, positive values are occupied, negative values are free.
+CELL_UNKNOWN = 0
+CELL_OCCUPIED = 127
+CELL_FREE = 0x81  # -127 as a signed byte
+
+# Every map gets a process-wide unique version, bumped on each modification,
+# so caches keyed by (map version, ...) can never confuse two maps.
+_versions = itertools.count(1)
+
+# Header of a GET /api/core/slam/v1/maps/explore response (little endian):
+# origin x, origin y (float), cells along x, cells along y (uint32),
+# resolution (float), 12 reserved bytes, byte count of the cell data (uint32)
+EXPLORE_HEADER = struct.Struct("<ffIIf12xI")
+
+
+class OccupancyMap:
+    """
+    A 2D occupancy grid: grid[row, col] covers the square whose lower-left
+    corner is (origin_x + col * resolution, origin_y + row * resolution).
+    """
+
+    def __init__(self, grid, resolution=0.05, origin=(0.0, 0.0)):
+        self.grid = grid
+        self.resolution = float(resolution)
+        self.origin_x, self.origin_y = (float(v) for v in origin)
+        self.version = next(_versions)
+        # Slot for the planner's grid shared by all robots on this map (see planner.py)
+        self.shared_planning_grid = None
+        self._known_bounds = None  # (version, bounds) cache of known_bounds()
+
+    @classmethod
+    def unknown_like(cls, other):
+        """An all-unknown map with the same geometry, as left by clearMap."""
+        return cls(
+            np.zeros_like(other.grid, dtype=np.uint8),
+            other.resolution,
+            (other.origin_x, other.origin_y),
+        )
+
+    @property
+    def height(self):
+        return self.grid.shape[0]
+
+    @property
+    def width(self):
+        return self.grid.shape[1]
+
+    def world_to_cell(self, x, y):
+        """Returns (row, col) of the cell containing (x, y); may lie outside the grid."""
+        return (
+            int((y - self.origin_y) // self.resolution),
+            int((x - self.origin_x) // self.resolution),
+        )
+
+    def cell_to_world(self, row, col):
+        """Returns the world coordinates of the centre of a cell."""
+        return (
+            self.origin_x + (col + 0.5) * self.resolution,
+            self.origin_y + (row + 0.5) * self.resolution,
+        )
+
+    def known_bounds(self):
+        """
+        (row0, row1, col0, col1) of the smallest window holding every known
+        cell, or None for an empty map. Computed once per map version.
+        """
+        cached = self._known_bounds
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        known = self.grid != CELL_UNKNOWN
+        rows = np.flatnonzero(known.any(axis=1))
+        cols = np.flatnonzero(known.any(axis=0))
+        bounds = None
+        if rows.size:
+            bounds = (int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1)
+        self._known_bounds = (self.version, bounds)
+        return bounds
+
+    def known_area(self):
+        """The extent of the known cells as a spec Rectangle."""
+        bounds = self.known_bounds()
+        if bounds is None:
+            return {"x": 0.0, "y": 0.0, "width": 0.0, "height": 0.0}
+        row0, row1, col0, col1 = bounds
+        return {
+            "x": self.origin_x + col0 * self.resolution,
+            "y": self.origin_y + row0 * self.resolution,
+            "width": (col1 - col0) * self.resolution,
+            "height": (row1 - row0) * self.resolution,
+        }
+
+    def window(self, min_x=None, min_y=None, max_x=None, max_y=None):
+        """
+        (row0, row1, col0, col1) of the cells overlapping a world-frame box,
+        clipped to the grid. Missing bounds extend to the edge of the map.
+        """
+        res = self.resolution
+        col0 = 0 if min_x is None else int((min_x - self.origin_x) // res)
+        row0 = 0 if min_y is None else int((min_y - self.origin_y) // res)
+        col1 = self.width if max_x is None else int((max_x - self.origin_x) // res) + 1
+        row1 = self.height if max_y is None else int((max_y - self.origin_y) // res) + 1
+        row0, row1 = min(max(row0, 0), self.height), min(max(row1, 0), self.height)
+        col0, col1 = min(max(col0, 0), self.width), min(max(col1, 0), self.width)
+        return row0, max(row0, row1), col0, max(col0, col1)
+
+    def explore_segments(self, row0=0, row1=None, col0=0, col1=None):
+        """
+        The explore-map encoding of a window as a list of bytes-like segments:
+        the 36-byte header followed by views of the grid rows. No cell data
+        is copied, so crops of memory-mapped maps stay cheap.
+        """
+        row1 = self.height if row1 is None else row1
+        col1 = self.width if col1 is None else col1
+        crop = self.grid[row0:row1, col0:col1]
+        header = EXPLORE_HEADER.pack(
+            self.origin_x + col0 * self.resolution,
+            self.origin_y + row0 * self.resolution,
+            crop.shape[1],
+            crop.shape[0],
+            self.resolution,
+            crop.size,
+        )
+        if crop.size == 0:
+            return [header]
+        if crop.flags.c_contiguous:
+            return [header, memoryview(crop).cast("B")]
+        return [header] + [memoryview(row) for row in crop]
+
+    def occupied_mask(self):
+        """Cells a robot cannot enter: occupied or unknown."""
+        return self.grid.view(np.int8) >= 0
+
+    def touch(self):
+        """Marks the map as modified after the grid was changed in place."""
+        self.version = next(_versions)
+
+
+def generate_office_map(width=40.0, height=40.0, resolution=0.05, origin=(-20.0, -20.0)):
+    """
+    Generates a synthetic office floor: outer walls, a grid of rooms with
+    doorways onto a central corridor. Every cell is known (free or occupied).
+    """
+    cols = int(round(width / resolution))
+    rows = int(round(height / resolution))
+    grid = np.full((rows, cols), CELL_FREE, dtype=np.uint8)
+
+    wall = max(int(round(0.1 / resolution)), 1)
+    door = int(round(1.2 / resolution))
+    room = int(round(8.0 / resolution))
+
+    # Outer walls
+    grid[:wall, :] = CELL_OCCUPIED
+    grid[-wall:, :] = CELL_OCCUPIED
+    grid[:, :wall] = CELL_OCCUPIED
+    grid[:, -wall:] = CELL_OCCUPIED
+
+    # Two rows of rooms separated by a 4m corridor across the middle
+    corridor = int(round(2.0 / resolution))
+    mid = rows // 2
+    room_walls = list(range(room, cols - wall, room))
+    for row in (mid - corridor, mid + corridor):
+        grid[row : row + wall, :] = CELL_OCCUPIED
+        # A doorway in the middle of every room on both sides
+        for left, right in zip([0] + room_walls, room_walls + [cols]):
+            start = (left + right - door) // 2
+            grid[row : row + wall, start : start + door] = CELL_FREE
+
+    # Walls between rooms, away from the corridor
+    for col in room_walls:
+        grid[: mid - corridor, col : col + wall] = CELL_OCCUPIED
+        grid[mid + corridor + wall :, col : col + wall] = CELL_OCCUPIED
+
+    return OccupancyMap(grid, resolution, origin)
+
+
+def load_map(source, resolution=0.05, origin=None):
+    """
+    Loads or generates a map:
+      - "office" or "office:<size in meters>" generates a synthetic office floor
+      - a .stcm file written by this emulator (cells memory-mapped, see stcm.py)
+      - a .npy array of cell values (memory-mapped, read-only); 'origin'
+        defaults to centring the map on (0, 0)
+    """
+    if source == "office" or source.startswith("office:"):
+        size = float(source.partition(":")[2] or 40.0)
+        return generate_office_map(size, size, resolution, origin=(-size / 2, -size / 2))
+    if source.endswith(".stcm"):
+        import stcm
+
+        return stcm.read_file(source)[0]
+
+    grid = np.load(source, mmap_mode="r")
+    if grid.ndim != 2 or grid.dtype.itemsize != 1:
+        raise ValueError(f"{source}: expected a 2D array of one-byte cells")
+    grid = grid.view(np.uint8)
+    if origin is None:
+        origin = (-grid.shape[1] * resolution / 2, -grid.shape[0] * resolution / 2)
+    return OccupancyMap(grid, resolution, origin)
+
+
+_default_map = None
+_default_map_lock = threading.Lock()
+
+
+def get_default_map():
+    """
+    The map robots start with, loaded once and shared by the whole fleet.
+    Set EMULATOR_MAP to a load_map() source to replace the 40m office floor.
+    """
+    global _default_map
+    if _default_map is None:
+        with _default_map_lock:
+            if _default_map is None:
+                _default_map = load_map(os.environ.get("EMULATOR_MAP", "office"))
+    return _default_map
+
+
+def set_default_map(occupancy_map):
+    """Replaces the map of every robot that has not loaded its own."""
+    global _default_map
+    with _default_map_lock:
+        _default_map = occupancy_map
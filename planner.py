@@ -0,0 +1,394 @@
+# slamtec_emulator/planner.py
+
+import heapq
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Robots are planned as discs of this radius: obstacles are grown by it
+ROBOT_RADIUS = 0.25  # m
+# Cell size of the planning grid; finer maps are coarsened (conservatively) to it
+PLANNING_RESOLUTION = 0.1  # m
+# Planned paths cached per planning grid
+PATH_CACHE_SIZE = 4096
+
+SQRT2 = math.sqrt(2.0)
+
+
+class PlanningGrid:
+    """
+    The inflated obstacle grid for one map version plus one set of virtual
+    walls and forbidden areas, with an A* planner and a path cache.
+
+    A new PlanningGrid is built whenever the map or the artifacts change, so
+    the cache key (start cell, goal cell) is implicitly scoped to that version.
+    """
+
+    def __init__(self, occupancy_map, walls=(), forbidden_areas=(), key=None):
+        self.key = key
+        self.map_version = occupancy_map.version
+        blocked, self.resolution = _coarsen(occupancy_map, PLANNING_RESOLUTION)
+        self.origin_x = occupancy_map.origin_x
+        self.origin_y = occupancy_map.origin_y
+
+        # Stored artifacts are checked on write, but one bad entry must not
+        # stop every robot on the map from planning: skip anything malformed
+        for line in walls:
+            try:
+                start, end, _ = parse_segment(line)
+            except ValueError:
+                continue
+            _stamp_segment(blocked, self, start, end, self.resolution / 2)
+        for area in forbidden_areas:
+            try:
+                start, end, half_width = parse_segment(area.get("area"))
+            except ValueError:
+                continue
+            _stamp_segment(blocked, self, start, end, half_width)
+
+        blocked = _inflate(blocked, int(math.ceil(ROBOT_RADIUS / self.resolution)))
+
+        # Pad with a blocked border so neighbour lookups never leave the grid
+        self.rows, self.cols = blocked.shape[0] + 2, blocked.shape[1] + 2
+        padded = np.ones((self.rows, self.cols), dtype=bool)
+        padded[1:-1, 1:-1] = blocked
+        self.blocked = padded.tobytes()  # one byte per cell: fast scalar indexing
+
+        self._paths = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # --- coordinates (cells are indices into the padded grid) ---
+
+    def cell_of(self, x, y):
+        row = int((y - self.origin_y) // self.resolution) + 1
+        col = int((x - self.origin_x) // self.resolution) + 1
+        if 0 < row < self.rows - 1 and 0 < col < self.cols - 1:
+            return row * self.cols + col
+        return None
+
+    def center_of(self, cell):
+        row, col = divmod(cell, self.cols)
+        return (
+            self.origin_x + (col - 0.5) * self.resolution,
+            self.origin_y + (row - 0.5) * self.resolution,
+        )
+
+    # --- planning ---
+
+    def plan(self, start, goal):
+        """
+        Plans a collision-free path from start (x, y) to goal (x, y).
+        Returns a list of [x, y] waypoints including both ends, or None.
+        """
+        start_cell = self.cell_of(*start)
+        goal_cell = self.cell_of(*goal)
+        if start_cell is None or goal_cell is None or self.blocked[goal_cell]:
+            return None
+
+        key = (start_cell, goal_cell)
+        with self._lock:
+            cells = self._paths.get(key)
+            if cells is not None:
+                self._paths.move_to_end(key)
+                self.hits += 1
+        if cells is None:
+            cells = self._search(start_cell, goal_cell)
+            with self._lock:
+                self.misses += 1
+                self._paths[key] = cells
+                if len(self._paths) > PATH_CACHE_SIZE:
+                    self._paths.popitem(last=False)
+
+        if cells is False:
+            return None
+        middle = [list(self.center_of(cell)) for cell in cells[1:-1]]
+        return [[float(start[0]), float(start[1])]] + middle + [[float(goal[0]), float(goal[1])]]
+
+    def _search(self, start, goal):
+        """
+        Jump point search (A* that skips over cells on straight runs) on the
+        8-connected grid, never cutting corners. Returns the smoothed cell
+        path or False.
+        """
+        if start == goal:
+            return [start, goal]
+
+        blocked = self.blocked
+        cols = self.cols
+        goal_row, goal_col = divmod(goal, cols)
+        diag_extra = SQRT2 - 2.0
+
+        def octile(a, b):
+            ra, ca = divmod(a, cols)
+            rb, cb = divmod(b, cols)
+            dr = ra - rb if ra > rb else rb - ra
+            dc = ca - cb if ca > cb else cb - ca
+            return dr + dc + diag_extra * (dr if dr < dc else dc)
+
+        def jump_horizontal(cell, dx):
+            while True:
+                cell += dx
+                if blocked[cell]:
+                    return None
+                if cell == goal:
+                    return cell
+                up, down = cell - cols, cell + cols
+                if (not blocked[up] and blocked[up - dx]) or (
+                    not blocked[down] and blocked[down - dx]
+                ):
+                    return cell
+
+        def jump_vertical(cell, dy):
+            while True:
+                cell += dy
+                if blocked[cell]:
+                    return None
+                if cell == goal:
+                    return cell
+                left, right = cell - 1, cell + 1
+                if (not blocked[left] and blocked[left - dy]) or (
+                    not blocked[right] and blocked[right - dy]
+                ):
+                    return cell
+
+        def jump_diagonal(cell, dx, dy):
+            while True:
+                if blocked[cell + dx] or blocked[cell + dy]:
+                    return None  # would cut a corner
+                cell += dx + dy
+                if blocked[cell]:
+                    return None
+                if cell == goal:
+                    return cell
+                if jump_horizontal(cell, dx) is not None or jump_vertical(cell, dy) is not None:
+                    return cell
+
+        def jump(cell, dx, dy):
+            if dx and dy:
+                return jump_diagonal(cell, dx, dy)
+            if dx:
+                return jump_horizontal(cell, dx)
+            return jump_vertical(cell, dy)
+
+        def directions(cell, dx, dy):
+            """Pruned successor directions (dx in cells, dy in rows * cols)."""
+            if dx is None:
+                result = [(1, 0), (-1, 0), (0, cols), (0, -cols)]
+                for ddx in (1, -1):
+                    for ddy in (cols, -cols):
+                        if not blocked[cell + ddx] and not blocked[cell + ddy]:
+                            result.append((ddx, ddy))
+                return result
+            if dx and dy:
+                result = []
+                free_y, free_x = not blocked[cell + dy], not blocked[cell + dx]
+                if free_y:
+                    result.append((0, dy))
+                if free_x:
+                    result.append((dx, 0))
+                if free_x and free_y:
+                    result.append((dx, dy))
+                return result
+            if dx:
+                side_a, side_b = cols, -cols
+            else:
+                side_a, side_b = 1, -1
+            result = []
+            free_a, free_b = not blocked[cell + side_a], not blocked[cell + side_b]
+            straight = dx or dy
+            if not blocked[cell + straight]:
+                result.append((dx, dy))
+                if free_a:
+                    result.append((dx or side_a, dy or side_a))
+                if free_b:
+                    result.append((dx or side_b, dy or side_b))
+            if free_a:
+                result.append((side_a if dy else 0, side_a if dx else 0))
+            if free_b:
+                result.append((side_b if dy else 0, side_b if dx else 0))
+            return result
+
+        g = {start: 0.0}
+        came_from = {start: None}
+        heading = {start: (None, None)}
+        closed = set()
+        open_heap = [(0.0, 0.0, start)]
+        heappush, heappop = heapq.heappush, heapq.heappop
+        while open_heap:
+            _, neg_cost, cell = heappop(open_heap)
+            if cell == goal:
+                return self._smooth(self._unwind(came_from, goal))
+            if cell in closed:
+                continue
+            closed.add(cell)
+            cost = -neg_cost
+
+            for dx, dy in directions(cell, *heading[cell]):
+                point = jump(cell, dx, dy)
+                if point is None or point in closed:
+                    continue
+                new_cost = cost + octile(cell, point)
+                if new_cost < g.get(point, math.inf):
+                    g[point] = new_cost
+                    came_from[point] = cell
+                    heading[point] = (dx, dy)
+                    # Ties on f go to the deeper node
+                    heappush(open_heap, (new_cost + octile(point, goal), -new_cost, point))
+        return False
+
+    @staticmethod
+    def _unwind(came_from, goal):
+        path = []
+        cell = goal
+        while cell is not None:
+            path.append(cell)
+            cell = came_from[cell]
+        path.reverse()
+        return path
+
+    def _smooth(self, path):
+        """Drops waypoints that are in direct line of sight of an earlier one."""
+        smoothed = [path[0]]
+        anchor = 0
+        for i in range(2, len(path)):
+            if not self._line_of_sight(path[anchor], path[i]):
+                smoothed.append(path[i - 1])
+                anchor = i - 1
+        smoothed.append(path[-1])
+        return smoothed
+
+    def _line_of_sight(self, a, b):
+        """Bresenham walk between two cells, checking every cell on the way."""
+        blocked = self.blocked
+        cols = self.cols
+        r0, c0 = divmod(a, cols)
+        r1, c1 = divmod(b, cols)
+        dr, dc = abs(r1 - r0), abs(c1 - c0)
+        sr = 1 if r1 > r0 else -1
+        sc = 1 if c1 > c0 else -1
+        err = dc - dr
+        while True:
+            if blocked[r0 * cols + c0]:
+                return False
+            if r0 == r1 and c0 == c1:
+                return True
+            e2 = 2 * err
+            if e2 > -dr and e2 < dc:
+                # Diagonal step: both side cells must be free as well
+                if blocked[r0 * cols + c0 + sc] or blocked[(r0 + sr) * cols + c0]:
+                    return False
+            if e2 > -dr:
+                err -= dr
+                c0 += sc
+            if e2 < dc:
+                err += dc
+                r0 += sr
+
+
+def parse_segment(shape):
+    """
+    ((x0, y0), (x1, y1), half width) of a line or rectangle-area shape: a
+    dict with 'start' and 'end' points and an optional 'half_width'.
+    Raises ValueError for anything else.
+    """
+    if not isinstance(shape, dict) or not all(
+        isinstance(shape.get(point), dict) for point in ("start", "end")
+    ):
+        raise ValueError("start and end points are required")
+    try:
+        values = [
+            float(shape[point].get(axis, 0.0)) for point in ("start", "end") for axis in ("x", "y")
+        ]
+        half_width = float(shape.get("half_width", 0.0))
+    except (TypeError, ValueError):
+        raise ValueError("coordinates and half_width must be numbers") from None
+    if not all(map(math.isfinite, values)) or not 0 <= half_width < math.inf:
+        raise ValueError("coordinates and half_width must be finite, half_width not negative")
+    x0, y0, x1, y1 = values
+    return (x0, y0), (x1, y1), half_width
+
+
+def _coarsen(occupancy_map, resolution):
+    """Returns (blocked mask, resolution); a cell is blocked if any source cell in it is."""
+    mask = occupancy_map.occupied_mask()
+    factor = max(int(round(resolution / occupancy_map.resolution)), 1)
+    if factor == 1:
+        return mask.copy(), occupancy_map.resolution
+    rows = -(-mask.shape[0] // factor) * factor
+    cols = -(-mask.shape[1] // factor) * factor
+    padded = np.ones((rows, cols), dtype=bool)
+    padded[: mask.shape[0], : mask.shape[1]] = mask
+    coarse = padded.reshape(rows // factor, factor, cols // factor, factor).any(axis=(1, 3))
+    return coarse, occupancy_map.resolution * factor
+
+
+def _inflate(blocked, radius):
+    """Grows obstacles by a disc of the given radius (in cells)."""
+    if radius <= 0:
+        return blocked
+    rows, cols = blocked.shape
+    padded = np.zeros((rows + 2 * radius, cols + 2 * radius), dtype=bool)
+    padded[radius:-radius, radius:-radius] = blocked
+    inflated = blocked.copy()
+    for dr in range(-radius, radius + 1):
+        for dc in range(-radius, radius + 1):
+            if (dr or dc) and dr * dr + dc * dc <= radius * radius:
+                inflated |= padded[radius + dr : radius + dr + rows, radius + dc : radius + dc + cols]
+    return inflated
+
+
+def _stamp_segment(blocked, grid, start, end, half_width):
+    """Marks every cell within half_width of the segment start-end as blocked."""
+    res = grid.resolution
+    (x0, y0), (x1, y1) = start, end
+    reach = half_width + res
+
+    col_lo = max(int((min(x0, x1) - reach - grid.origin_x) // res), 0)
+    col_hi = min(int((max(x0, x1) + reach - grid.origin_x) // res) + 1, blocked.shape[1])
+    row_lo = max(int((min(y0, y1) - reach - grid.origin_y) // res), 0)
+    row_hi = min(int((max(y0, y1) + reach - grid.origin_y) // res) + 1, blocked.shape[0])
+    if col_lo >= col_hi or row_lo >= row_hi:
+        return
+
+    xs = grid.origin_x + (np.arange(col_lo, col_hi) + 0.5) * res
+    ys = grid.origin_y + (np.arange(row_lo, row_hi) + 0.5) * res
+    px, py = np.meshgrid(xs, ys)
+    dx, dy = x1 - x0, y1 - y0
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        t = np.zeros_like(px)
+    else:
+        t = np.clip(((px - x0) * dx + (py - y0) * dy) / length2, 0.0, 1.0)
+    dist2 = (px - (x0 + t * dx)) ** 2 + (py - (y0 + t * dy)) ** 2
+    # Cells touched by the segment count even when their centre is slightly off it
+    limit = half_width + res / SQRT2
+    blocked[row_lo:row_hi, col_lo:col_hi] |= dist2 <= limit * limit
+
+
+_shared_grid_lock = threading.Lock()
+
+
+def planning_grid_for(occupancy_map, walls=(), forbidden_areas=(), current=None, artifacts_version=0):
+    """
+    Returns the PlanningGrid for a map and a robot's artifacts, reusing
+    'current' when nothing changed since it was built. Robots without any
+    virtual walls or forbidden areas share one grid (and path cache) per map.
+    """
+    walls, forbidden_areas = list(walls), list(forbidden_areas)
+    key = (occupancy_map.version, artifacts_version if walls or forbidden_areas else None)
+    if current is not None and current.key == key:
+        return current
+
+    if key[1] is not None:
+        return PlanningGrid(occupancy_map, walls, forbidden_areas, key=key)
+
+    with _shared_grid_lock:
+        grid = occupancy_map.shared_planning_grid
+        if grid is None or grid.key != key:
+            grid = PlanningGrid(occupancy_map, key=key)
+            occupancy_map.shared_planning_grid = grid
+        return grid
@@ -0,0 +1,316 @@
+# slamtec_emulator/poi_index.py
+
+import math
+import threading
+
+# Edge length of a grid cell of the spatial index, in meters
+DEFAULT_CELL_SIZE = 2.0
+
+
+class _Version:
+    """
+    The contents of a PoiIndex. Writers change it in place, under the
+    index's lock; clear() publishes a new, empty one (see PoiIndex).
+    """
+
+    __slots__ = ("pois", "coords", "cells", "bounds")
+
+    def __init__(self):
+        self.pois = {}  # id -> POI dict, in insertion order
+        self.coords = {}  # id -> (x, y)
+        self.cells = {}  # (cx, cy) -> {id: (x, y, POI dict)}
+        self.bounds = None  # (min cx, min cy, max cx, max cy) of all cells ever used
+
+
+class PoiIndex:
+    """
+    The POI store of a robot: POIs indexed by their own id, plus a uniform
+    grid over their (x, y) position for nearest-neighbour and region queries.
+
+    Behaves like a dict of id -> POI for the read paths the handlers use
+    (values(), get(), len(), in, clear()).
+
+    Readers never lock. Writers take a lock and change the index in place,
+    each in O(1): a single dict operation on the id maps, and a replaced
+    grid cell, never a changed one. A bucket a reader holds therefore stays
+    consistent, and carries its POIs along so a query never looks up one
+    that has since been removed. Reads that walk a whole map iterate a
+    copy taken in one step. POI dicts are replaced, never changed, once
+    published.
+
+    'pois' may also be a callable returning them, called on first use: a
+    restored snapshot (see snapshot.py) only builds the index if it is read.
+    """
+
+    def __init__(self, pois=(), cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._lock = threading.Lock()  # taken by writers only
+        self._build_lock = threading.Lock()
+        self._pending = pois if callable(pois) else None
+        self._current = None if callable(pois) else self._build(pois)
+
+    @property
+    def _version(self):
+        version = self._current
+        if version is None:
+            with self._build_lock:
+                if self._current is None:
+                    self._current = self._build(self._pending())
+                    self._pending = None
+                version = self._current
+        return version
+
+    @_version.setter
+    def _version(self, version):
+        self._current = version
+        self._pending = None
+
+    # --- dict-like access ---
+
+    def __len__(self):
+        return len(self._version.pois)
+
+    def __contains__(self, poi_id):
+        return poi_id in self._version.pois
+
+    def __iter__(self):
+        return iter(tuple(self._version.pois))
+
+    def get(self, poi_id, default=None):
+        return self._version.pois.get(poi_id, default)
+
+    def values(self):
+        return list(self._version.pois.values())
+
+    def clear(self):
+        with self._lock:
+            self._version = _Version()
+
+    # --- mutation ---
+
+    def add(self, poi):
+        """Adds (or replaces) a POI. The POI must carry an 'id' and a 'pose'."""
+        with self._lock:
+            self._add(self._version, poi)
+        return poi
+
+    def remove(self, poi_id):
+        with self._lock:
+            version = self._version
+            if poi_id not in version.pois:
+                return False
+            self._unlink(version, poi_id)
+            del version.pois[poi_id]
+        return True
+
+    def update(self, poi_id, pose=None, metadata=None):
+        """Changes the pose and/or metadata of a POI, keeping the grid in sync."""
+        with self._lock:
+            version = self._version
+            poi = version.pois.get(poi_id)
+            if poi is None:
+                return None
+            poi = dict(poi)
+            if pose is not None:
+                poi["pose"] = dict(poi.get("pose", {}), **pose)
+            if metadata is not None:
+                poi["metadata"] = metadata
+            self._unlink(version, poi_id)
+            self._link(version, poi_id, poi)
+            version.pois[poi_id] = poi
+        return poi
+
+    # --- spatial queries ---
+
+    def nearest(self, x, y, max_distance=None):
+        """
+        Returns (poi, distance) of the POI closest to (x, y), or (None, None).
+        Searches rings of cells around (x, y), clipped to the occupied part of
+        the grid, falling back to a scan of the occupied cells when the rings
+        would visit more cells than exist.
+        """
+        version = self._version
+        if not version.pois:
+            return None, None
+
+        cx, cy = self._cell(x, y)
+        bounds = version.bounds
+        min_cx, min_cy, max_cx, max_cy = bounds
+        best, best_d2 = None, math.inf
+        max_ring = None
+        if max_distance is not None:
+            max_ring = int(max_distance // self.cell_size) + 1
+
+        # Rings closer than the occupied area are empty, rings beyond it too
+        ring = max(0, min_cx - cx, cx - max_cx, min_cy - cy, cy - max_cy)
+        last_ring = max(cx - min_cx, max_cx - cx, cy - min_cy, max_cy - cy)
+        visited = 0
+        while ring <= last_ring and (max_ring is None or ring <= max_ring):
+            for cell in self._ring_cells(cx, cy, ring, bounds):
+                visited += 1
+                bucket = version.cells.get(cell)
+                if bucket:
+                    best, best_d2 = self._closest_in(bucket, x, y, best, best_d2)
+
+            if best is not None and best_d2 <= self._unsearched_distance2(
+                bounds, x, y, cx, cy, ring
+            ):
+                break
+            if visited >= len(version.cells):
+                for bucket in tuple(version.cells.values()):
+                    best, best_d2 = self._closest_in(bucket, x, y, best, best_d2)
+                break
+            ring += 1
+
+        if best is None:
+            return None, None
+        distance = math.sqrt(best_d2)
+        if max_distance is not None and distance > max_distance:
+            return None, None
+        return best, distance
+
+    def within(self, min_x=-math.inf, min_y=-math.inf, max_x=math.inf, max_y=math.inf):
+        """Returns the POIs whose position lies inside the bounding box (in grid order)."""
+        version = self._version
+        if not version.cells:
+            return []
+
+        if all(map(math.isfinite, (min_x, min_y, max_x, max_y))):
+            cmin_x, cmin_y = self._cell(min_x, min_y)
+            cmax_x, cmax_y = self._cell(max_x, max_y)
+            span = (cmax_x - cmin_x + 1) * (cmax_y - cmin_y + 1)
+        else:
+            span = math.inf
+
+        if span <= len(version.cells):
+            buckets = (
+                version.cells.get((i, j))
+                for i in range(cmin_x, cmax_x + 1)
+                for j in range(cmin_y, cmax_y + 1)
+            )
+        else:
+            buckets = tuple(version.cells.values())
+
+        return [
+            poi
+            for bucket in buckets
+            if bucket
+            for px, py, poi in bucket.values()
+            if min_x <= px <= max_x and min_y <= py <= max_y
+        ]
+
+    # --- internals ---
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _build(self, pois):
+        """A version holding 'pois'. Nothing is published yet, so buckets are filled in place."""
+        version = _Version()
+        cells, coords, by_id = version.cells, version.coords, version.pois
+        size = self.cell_size
+        for poi in pois:
+            poi_id = poi["id"]
+            if poi_id in by_id:
+                self._unlink(version, poi_id)
+            pose = poi.get("pose") or {}
+            xy = (float(pose.get("x", 0.0)), float(pose.get("y", 0.0)))
+            by_id[poi_id] = poi
+            coords[poi_id] = xy
+            cell = (math.floor(xy[0] / size), math.floor(xy[1] / size))
+            bucket = cells.get(cell)
+            if bucket is None:
+                bucket = cells[cell] = {}
+            bucket[poi_id] = xy + (poi,)
+        if cells:
+            xs = [cx for cx, _ in cells]
+            ys = [cy for _, cy in cells]
+            version.bounds = (min(xs), min(ys), max(xs), max(ys))
+        return version
+
+    def _add(self, version, poi):
+        # Grid first: a reader that finds the POI by id finds the bounds set
+        poi_id = poi["id"]
+        if poi_id in version.pois:
+            self._unlink(version, poi_id)
+        self._link(version, poi_id, poi)
+        version.pois[poi_id] = poi
+
+    def _link(self, version, poi_id, poi):
+        pose = poi.get("pose") or {}
+        xy = (float(pose.get("x", 0.0)), float(pose.get("y", 0.0)))
+        version.coords[poi_id] = xy
+        cell = self._cell(*xy)
+        # Readers may be iterating the bucket: replace, don't change
+        bucket = dict(version.cells.get(cell, ()))
+        bucket[poi_id] = xy + (poi,)
+        version.cells[cell] = bucket
+        if version.bounds is None:
+            version.bounds = cell + cell
+        else:
+            min_cx, min_cy, max_cx, max_cy = version.bounds
+            version.bounds = (
+                min(min_cx, cell[0]),
+                min(min_cy, cell[1]),
+                max(max_cx, cell[0]),
+                max(max_cy, cell[1]),
+            )
+
+    def _unlink(self, version, poi_id):
+        xy = version.coords.pop(poi_id)
+        cell = self._cell(*xy)
+        bucket = {i: c for i, c in version.cells[cell].items() if i != poi_id}
+        if bucket:
+            version.cells[cell] = bucket
+        else:
+            del version.cells[cell]
+
+    def _unsearched_distance2(self, bounds, x, y, cx, cy, ring):
+        """
+        Squared distance from (x, y) to the nearest occupied-area cell outside
+        the square of rings already searched (inf if nothing is left).
+        """
+        min_cx, min_cy, max_cx, max_cy = bounds
+        lo_x, hi_x = max(cx - ring, min_cx), min(cx + ring, max_cx)
+        # The parts of the bounding box outside the searched square, as cell rectangles
+        strips = (
+            (min_cx, min_cy, cx - ring - 1, max_cy),  # left
+            (cx + ring + 1, min_cy, max_cx, max_cy),  # right
+            (lo_x, min_cy, hi_x, cy - ring - 1),  # below
+            (lo_x, cy + ring + 1, hi_x, max_cy),  # above
+        )
+        size = self.cell_size
+        best = math.inf
+        for i0, j0, i1, j1 in strips:
+            if i0 > i1 or j0 > j1:
+                continue
+            dx = max(i0 * size - x, 0.0, x - (i1 + 1) * size)
+            dy = max(j0 * size - y, 0.0, y - (j1 + 1) * size)
+            best = min(best, dx * dx + dy * dy)
+        return best
+
+    @staticmethod
+    def _ring_cells(cx, cy, ring, bounds):
+        """Yields the cells at Chebyshev distance 'ring' from (cx, cy) that lie within bounds."""
+        min_cx, min_cy, max_cx, max_cy = bounds
+        if ring == 0:
+            yield (cx, cy)
+            return
+        lo_x, hi_x = max(cx - ring, min_cx), min(cx + ring, max_cx)
+        for j in (cy - ring, cy + ring):
+            if min_cy <= j <= max_cy:
+                for i in range(lo_x, hi_x + 1):
+                    yield (i, j)
+        lo_y, hi_y = max(cy - ring + 1, min_cy), min(cy + ring - 1, max_cy)
+        for i in (cx - ring, cx + ring):
+            if min_cx <= i <= max_cx:
+                for j in range(lo_y, hi_y + 1):
+                    yield (i, j)
+
+    @staticmethod
+    def _closest_in(bucket, x, y, best, best_d2):
+        for px, py, poi in bucket.values():
+            d2 = (px - x) * (px - x) + (py - y) * (py - y)
+            if d2 < best_d2:
+                best, best_d2 = poi, d2
+        return best, best_d2
@@ -0,0 +1,356 @@
+# slamtec_emulator/recorder.py
+"""
+Traffic recording: every request the emulator serves, with its response,
+appended to a JSON lines log that replay.py plays back (and bench_load.py
+--log accepts). Enabled with --record FILE or EMULATOR_RECORD.
+
+One line per request:
+
+    {"t": 1760000000.123456, "sim": 42.5, "client": "10.0.0.7:51234",
+     "method": "POST", "path": "/robots/robot-3/api/core/motion/v1/actions",
+     "headers": {"Content-Type": "application/json"}, "body": {...},
+     "status": 200, "ms": 0.412, "response": {...}}
+
+* t, sim: wall-clock (epoch) and simulated time when the request arrived
+* client: the address and port of the connection it came on
+* path: as received, with the /robots/<robot_id> prefix and query string
+* headers: the request headers that matter for replay (not Host,
+  Content-Length, User-Agent or connection handling)
+* body, response: JSON bodies as JSON; other bodies as body_b64 /
+  response_b64; bodies over BODY_LIMIT only as body_size / response_size
+* ms: time until the handler returned its response, as timed here
+
+Request threads only append the raw request and response to a queue; a
+writer thread encodes them and writes them through a large buffer every
+FLUSH_INTERVAL, so recording costs a request a few microseconds. JSON
+responses go into the log as the emulator sent them, not re-encoded. The log
+rotates like logging's RotatingFileHandler: at MAX_BYTES, FILE becomes
+FILE.1, FILE.1 becomes FILE.2 and so on, keeping BACKUPS old files. If the
+writer falls MAX_PENDING requests behind, further requests are dropped from
+the log (counted in emulator_recorded_requests_total{outcome="dropped"}).
+"""
+
+import atexit
+import base64
+import collections
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import metrics
+from response_cache import dumps
+from scheduler import scheduler
+
+log = logging.getLogger(__name__)
+
+MAX_BYTES = 256 * 1024 * 1024
+BACKUPS = 5
+BODY_LIMIT = 1024 * 1024
+FLUSH_INTERVAL = 0.25
+WRITE_BUFFER = 1024 * 1024
+MAX_PENDING = 100000
+
+# Scraped, not client traffic
+UNRECORDED_PATHS = ("/metrics",)
+
+# Request headers that do not change what the emulator answers
+SKIPPED_HEADERS = frozenset(
+    ("HTTP_HOST", "HTTP_CONNECTION", "HTTP_KEEP_ALIVE", "HTTP_USER_AGENT", "HTTP_ACCEPT_ENCODING")
+)
+
+RECORDED_REQUESTS = metrics.registry.counter(
+    "emulator_recorded_requests_total", "Requests written to (or dropped from) the traffic log.", "outcome"
+)
+
+
+# WSGI environ keys of request headers, by header name
+_header_names = {}
+
+
+def _header_name(key):
+    name = _header_names.get(key)
+    if name is None:
+        name = _header_names[key] = "-".join(part.capitalize() for part in key[5:].split("_"))
+    return name
+
+
+def _request_headers(environ):
+    headers = {}
+    for key, value in environ.items():
+        if key[:5] == "HTTP_" and key not in SKIPPED_HEADERS:
+            headers[_header_name(key)] = value
+    if environ.get("CONTENT_TYPE"):
+        headers["Content-Type"] = environ["CONTENT_TYPE"]
+    return headers
+
+
+def _read_body(environ):
+    """Reads the request body and puts it back for the app."""
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    if length <= 0:
+        return b""
+    body = environ["wsgi.input"].read(length)
+    environ["wsgi.input"] = io.BytesIO(body)
+    return body
+
+
+def _is_json(content_type):
+    return content_type is not None and content_type.split(";", 1)[0].strip().endswith("json")
+
+
+def _put_body(entry, key, body, content_type):
+    """Stores a body in a log entry: parsed if it is JSON, else base64."""
+    if len(body) > BODY_LIMIT:
+        entry[f"{key}_size"] = len(body)
+        return
+    if _is_json(content_type):
+        try:
+            entry[key] = json.loads(body)
+            return
+        except ValueError:
+            pass
+    entry[f"{key}_b64"] = base64.b64encode(body).decode("ascii")
+
+
+def encode_entry(recorded):
+    """The JSON line of a recorded request (a _RecordedResponse)."""
+    environ = recorded.environ
+    headers = _request_headers(environ)
+    entry = {
+        "t": round(recorded.started, 6),
+        "sim": round(recorded.sim, 6),
+        "client": f"{environ.get('REMOTE_ADDR', '')}:{environ.get('REMOTE_PORT', '')}",
+        "method": environ["REQUEST_METHOD"],
+        "path": recorded.path,
+    }
+    if headers:
+        entry["headers"] = headers
+    if recorded.body:
+        _put_body(entry, "body", recorded.body, headers.get("Content-Type"))
+    entry["status"] = int((recorded.status or "500").split(" ", 1)[0])
+    entry["ms"] = round(recorded.seconds * 1000, 3)
+
+    response = b""
+    if recorded.size > BODY_LIMIT:
+        entry["response_size"] = recorded.size
+    elif recorded.size:
+        body = b"".join(recorded.chunks)
+        content_type = None
+        for name, value in recorded.headers or ():
+            if name.lower() == "content-type":
+                content_type = value
+                break
+        raw = body.strip()
+        if _is_json(content_type) and b"\n" not in raw:
+            # The emulator's own compact JSON goes into the line as it is
+            response = b',"response":' + raw
+        else:
+            _put_body(entry, "response", body, content_type)
+    line = dumps(entry)
+    if response:
+        line = line[:-1] + response + b"}"
+    return line + b"\n"
+
+
+class LogWriter:
+    """The writer thread of a traffic log, with size-based rotation."""
+
+    def __init__(self, path, max_bytes=MAX_BYTES, backups=BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.pending = collections.deque()
+        self.written = 0
+        self.dropped = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "ab", buffering=WRITE_BUFFER)
+        self._size = self._file.tell()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="emulator-recorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, record):
+        """Queues a request for the log; called by request threads."""
+        if len(self.pending) >= MAX_PENDING:
+            self.dropped += 1
+            RECORDED_REQUESTS.inc("dropped")
+            return
+        self.pending.append(record)
+
+    def _run(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        written = 0
+        while self.pending:
+            line = encode_entry(self.pending.popleft())
+            if self._size and self._size + len(line) > self.max_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._size += len(line)
+            written += 1
+        if written:
+            self._file.flush()
+            self.written += written
+            RECORDED_REQUESTS.inc("written", written)
+
+    def _rotate(self):
+        self._file.close()
+        if self.backups:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab", buffering=WRITE_BUFFER)
+        self._size = 0
+
+    def close(self):
+        """Writes what is queued and closes the log. Idempotent."""
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            self._file.close()
+
+
+class _RecordedResponse:
+    """
+    Passes a response through to the server, keeping its chunks; handed to
+    the writer once the body is sent (or on close() if it never was entirely).
+    """
+
+    __slots__ = (
+        "writer",
+        "environ",
+        "path",
+        "body",
+        "started",
+        "sim",
+        "seconds",
+        "start_response",
+        "status",
+        "headers",
+        "iterable",
+        "chunks",
+        "size",
+    )
+
+    def __init__(self, writer, environ, path, body, start_response):
+        self.writer = writer
+        self.environ = environ
+        self.path = path
+        self.body = body
+        self.start_response = start_response
+        self.status = self.headers = None
+        self.chunks = []
+        self.size = 0
+
+    def start(self, status, headers, exc_info=None):
+        self.status, self.headers = status, headers
+        return self.start_response(status, headers, exc_info)
+
+    def __iter__(self):
+        for chunk in self.iterable:
+            self.size += len(chunk)
+            if self.size <= BODY_LIMIT:
+                self.chunks.append(chunk)
+            yield chunk
+        self._finish()
+
+    def _finish(self):
+        writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.put(self)
+
+    def close(self):
+        try:
+            if hasattr(self.iterable, "close"):
+                self.iterable.close()
+        finally:
+            self._finish()
+
+
+class TrafficRecorder:
+    """
+    WSGI middleware that records each request and its response. Wraps the
+    whole app (outside FleetDispatcher), so paths keep their robot prefix.
+    """
+
+    def __init__(self, wsgi_app, writer):
+        self.wsgi_app = wsgi_app
+        self.writer = writer
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path in UNRECORDED_PATHS:
+            return self.wsgi_app(environ, start_response)
+
+        started, sim, start = time.time(), scheduler.now(), time.perf_counter()
+        query = environ.get("QUERY_STRING")
+        recorded = _RecordedResponse(
+            self.writer, environ, f"{path}?{query}" if query else path, _read_body(environ), start_response
+        )
+        recorded.started, recorded.sim = started, sim
+        recorded.iterable = self.wsgi_app(environ, recorded.start)
+        recorded.seconds = time.perf_counter() - start
+        return recorded
+
+
+def install(app, path=None, shard=None):
+    """
+    Records the traffic of 'app' to the log at 'path' (default:
+    EMULATOR_RECORD). Each shard of a multi-process fleet writes its own
+    log, FILE with "-<shard>" before the extension. Returns the LogWriter,
+    or None without a log.
+    """
+    path = path or os.environ.get("EMULATOR_RECORD")
+    if not path:
+        return None
+    if shard is not None:
+        root, extension = os.path.splitext(path)
+        path = f"{root}-{shard}{extension}"
+    writer = LogWriter(path)
+    app.wsgi_app = TrafficRecorder(app.wsgi_app, writer)
+    log.warning("Recording traffic to %s", path)
+    return writer
+
+
+def log_files(path):
+    """A log and its rotated files that exist, oldest first."""
+    files = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        files.append(f"{path}.{i}")
+        i += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_log(path):
+    """The entries of a traffic log and its rotated files, oldest first."""
+    entries = []
+    for name in log_files(path) or [path]:
+        with open(name) as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{name}:{number}: {e}") from None
+                if "method" not in entry or "path" not in entry:
+                    raise ValueError(f"{name}:{number}: a log entry needs 'method' and 'path'")
+                entries.append(entry)
+    return entries
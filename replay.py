@@ -0,0 +1,523 @@
+# slamtec_emulator/replay.py
+"""
+Replays traffic logs recorded by recorder.py against the emulator, compares
+every response with the recorded one and reports latency per operationId,
+compared with a saved run (--compare). The recorded handler times ("ms")
+are not comparable: they leave out sending the body and everything on the
+client's side, which the replay's round trips include.
+
+Pacing (--speed):
+    1 (default)   requests are sent at their recorded times
+    <factor>      the recorded gaps shortened by that factor
+    max           every request as soon as the one before it answered
+
+Requests are sent in recorded order by --lanes concurrent senders, each
+one only once every request answered before it arrived in the recording
+has been answered again. Clients thus see the effects of their earlier
+requests, and requests that overlapped in the recording overlap again.
+
+The emulator's clock runs at the recorded simulation speed times --speed
+(just the recorded speed with max, so the simulation does not compete with
+the requests), unless --time-factor says otherwise.
+
+--deterministic sends the requests one by one in recorded order with the
+emulator's clock in manual mode, stepped to each request's recorded
+simulated time first, so actions, tasks and elevators have progressed as
+far as when the request arrived in the recording. Two deterministic replays
+of a log give the same responses. They only match the recording if its
+clock stood still while each request was handled: a manual clock, or
+nearly so a realtime one. Under --time-factor max timers fire between a
+request's arrival and its response, so box doors, poses and actions can
+differ. Start from the recorded state with --snapshot (see snapshot.py):
+save one with PUT /emulator/v1/snapshots/<name> before recording.
+
+Responses are compared as JSON, numbers within --float-tolerance; keys
+named with --ignore are skipped. A recorded 304 matches any 200 or 304.
+Ids the emulator generates (action ids, and UUIDs such as POI and task
+ids) are matched up, and later requests use the ones of the replay.
+
+Targets:
+    in-process (default)   a fresh app through the Flask test client
+    --url http://host:port a running emulator (python app.py / serve.py)
+
+Usage:
+    python replay.py traffic.jsonl
+    python replay.py traffic.jsonl --speed max --save run.json
+    python replay.py traffic.jsonl --speed max --compare run.json      # exit 1 on p50 regressions
+    python replay.py traffic.jsonl --deterministic --snapshot start.snap --strict
+    python replay.py traffic-0.jsonl traffic-1.jsonl --speed 10 --url http://127.0.0.1:1448
+"""
+
+import argparse
+import base64
+import collections
+import http.client
+import json
+import logging
+import re
+import sys
+import threading
+import time
+import urllib.parse
+
+from werkzeug.exceptions import HTTPException
+
+import recorder
+from fleet import PATH_PREFIX
+
+UUID = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+ROBOT_PATH = re.compile(r"^/robots/robot-(\d+)/")
+ACTION_PATH = re.compile(r"(?<=/actions/)\d+\b")
+CLOCK_CONTROL = re.compile(r"^(PUT|POST) /emulator/v1/clock")
+
+# Differences kept per request
+MAX_DIFFS = 5
+
+
+# --- Targets ---
+
+
+class InProcessTarget:
+    """The app's test client: measures the WSGI stack and handlers only."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, path, headers, data):
+        response = self.client.open(path, method=method, headers=headers, data=data)
+        return response.status_code, response.headers.get("Content-Type"), response.get_data()
+
+
+class HttpTarget:
+    """One keep-alive HTTP/1.1 connection to a running emulator."""
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.base = parts.path.rstrip("/")
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def send(self, method, path, headers, data):
+        try:
+            self.conn.request(method, self.base + path, body=data, headers=headers or {})
+            response = self.conn.getresponse()
+            return response.status, response.getheader("Content-Type"), response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            return None, None, b""
+
+
+def call(target, method, path, body=None):
+    """A JSON request for the replay's own use (clock, snapshots); returns the parsed answer."""
+    headers = {"Content-Type": "application/json"}
+    status, _, data = target.send(method, path, headers, json.dumps(body or {}).encode())
+    if status != 200:
+        raise SystemExit(f"{method} {path} failed (HTTP {status}): {data[:200]!r}")
+    return json.loads(data)
+
+
+# --- Comparing responses ---
+
+
+class Differ:
+    """Compares replayed responses with recorded ones and maps recorded UUIDs to replayed ones."""
+
+    def __init__(self, ignore=(), tolerance=1e-6):
+        self.ignore = frozenset(ignore)
+        self.tolerance = tolerance
+        self.ids = {}
+        self.action_ids = {}
+
+    def translate(self, value):
+        """A request path or body with recorded ids replaced by their replayed counterparts."""
+        if isinstance(value, str):
+            if self.ids:
+                value = UUID.sub(lambda match: self.ids.get(match.group(0), match.group(0)), value)
+            if self.action_ids:
+                value = ACTION_PATH.sub(self._action_id, value)
+            return value
+        if not self.ids:
+            return value
+        if isinstance(value, dict):
+            return {key: self.translate(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.translate(item) for item in value]
+        return value
+
+    def _action_id(self, match):
+        return str(self.action_ids.get(int(match.group(0)), match.group(0)))
+
+    def compare(self, entry, status, content_type, data):
+        """The differences (at most MAX_DIFFS) between a recorded entry and a replayed response."""
+        recorded = entry.get("status")
+        if recorded is None:
+            return []  # a plain request log (bench_load.py), nothing to compare
+        if recorded == 304 and status in (200, 304):
+            return []
+        if status != recorded:
+            return [f"status {recorded} != {status}"]
+        diffs = []
+        if "response" in entry:
+            try:
+                replayed = json.loads(data) if recorder._is_json(content_type) else data.decode()
+            except ValueError:
+                return ["body: not JSON"]
+            self._diff(entry["response"], replayed, "body", diffs)
+        elif "response_b64" in entry:
+            expected = base64.b64decode(entry["response_b64"])
+            if data != expected:
+                diffs.append(f"body: {len(data)} bytes differ from the recorded {len(expected)}")
+        elif "response_size" in entry:
+            if len(data) != entry["response_size"]:
+                diffs.append(f"body: {len(data)} bytes != the recorded {entry['response_size']}")
+        elif data:
+            diffs.append(f"body: {len(data)} bytes, none recorded")
+        return diffs
+
+    def _diff(self, recorded, replayed, path, diffs):
+        if len(diffs) >= MAX_DIFFS:
+            return
+        if isinstance(recorded, dict) and isinstance(replayed, dict):
+            for key in sorted(recorded.keys() | replayed.keys()):
+                if key in self.ignore:
+                    continue
+                if key not in replayed:
+                    diffs.append(f"{path}.{key}: missing")
+                elif key not in recorded:
+                    diffs.append(f"{path}.{key}: not recorded")
+                else:
+                    self._diff(recorded[key], replayed[key], f"{path}.{key}", diffs)
+        elif isinstance(recorded, list) and isinstance(replayed, list):
+            if len(recorded) != len(replayed):
+                diffs.append(f"{path}: {len(recorded)} items != {len(replayed)}")
+            for i, (before, after) in enumerate(zip(recorded, replayed)):
+                self._diff(before, after, f"{path}[{i}]", diffs)
+        elif _is_number(recorded) and _is_number(replayed):
+            if path.endswith(".action_id") and self.action_ids.setdefault(recorded, replayed) == replayed:
+                return
+            if abs(recorded - replayed) > self.tolerance:
+                diffs.append(f"{path}: {recorded!r} != {replayed!r}")
+        elif isinstance(recorded, str) and isinstance(replayed, str) and UUID.fullmatch(recorded):
+            if UUID.fullmatch(replayed) and self.ids.setdefault(recorded, replayed) == replayed:
+                return
+            diffs.append(f"{path}: {recorded!r} != {replayed!r}")
+        elif recorded != replayed:
+            diffs.append(f"{path}: {recorded!r} != {replayed!r}")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# --- Replay ---
+
+
+Result = collections.namedtuple("Result", "entry operation seconds lag status diffs")
+
+
+class Classifier:
+    """Maps request paths to the operationId of the route that serves them."""
+
+    def __init__(self, app, operation_ids):
+        self.adapter = app.url_map.bind("localhost")
+        self.operation_ids = operation_ids
+        self._cache = {}
+
+    def __call__(self, method, path):
+        path = urllib.parse.urlsplit(path).path
+        if path.startswith(PATH_PREFIX):
+            path = "/" + path.split("/", 3)[3] if path.count("/") >= 3 else "/"
+        key = (method, path)
+        operation = self._cache.get(key)
+        if operation is None:
+            try:
+                endpoint, _ = self.adapter.match(path, method=method)
+                operation = self.operation_ids.get(endpoint, endpoint)
+            except HTTPException:
+                operation = f"{method} {path} (no route)"
+            self._cache[key] = operation
+        return operation
+
+
+def request_of(entry, differ):
+    """(method, path, headers, body bytes) to send for a log entry."""
+    headers = dict(entry.get("headers") or {})
+    data = None
+    if "body" in entry:
+        data = json.dumps(differ.translate(entry["body"])).encode()
+        headers.setdefault("Content-Type", "application/json")
+    elif "body_b64" in entry:
+        data = base64.b64decode(entry["body_b64"])
+    return entry["method"], differ.translate(entry["path"]), headers, data
+
+
+def waits_for(entries):
+    """
+    For each entry (in arrival order), the index of the last entry that must
+    have been answered before it is sent: every request that had been
+    answered when it arrived was sent before it, so a client sees the effects
+    of its earlier requests. Without recorded times, entries go one by one.
+    """
+    if not all("t" in entry for entry in entries):
+        return list(range(-1, len(entries) - 1))
+    ends = sorted((entry["t"] + entry.get("ms", 0.0) / 1000, i) for i, entry in enumerate(entries))
+    result, k, last = [], 0, -1
+    for i, entry in enumerate(entries):
+        while k < len(ends) and ends[k][0] <= entry["t"]:
+            last = max(last, ends[k][1])
+            k += 1
+        result.append(min(last, i - 1))
+    return result
+
+
+class Replay:
+    """
+    Sends the entries of a log to targets made by 'make_target' (one per
+    lane) at 'speed' times their recorded pace (None: as fast as possible).
+    """
+
+    def __init__(self, entries, make_target, classify, differ, speed=1.0, lanes=16):
+        self.entries = entries
+        self.make_target = make_target
+        self.classify = classify
+        self.differ = differ
+        self.speed = speed
+        self.lanes = lanes
+        self.waits_for = waits_for(entries)
+        self.results = []
+        self._lock = threading.Lock()
+        self._done = threading.Condition()
+
+    def _send(self, target, entry, lag):
+        method, path, headers, data = request_of(entry, self.differ)
+        start = time.perf_counter()
+        status, content_type, body = target.send(method, path, headers, data)
+        seconds = time.perf_counter() - start
+        diffs = self.differ.compare(entry, status, content_type, body)
+        result = Result(entry, self.classify(method, path), seconds, lag, status, diffs)
+        with self._lock:
+            self.results.append(result)
+
+    def _lane(self, start, first):
+        target = self.make_target()
+        while True:
+            with self._done:
+                i = self._next
+                if i == len(self.entries):
+                    return
+                self._next += 1
+                # Whatever had been answered before this request arrived is answered again first
+                while self._answered < self.waits_for[i]:
+                    self._done.wait()
+            entry = self.entries[i]
+            lag = 0.0
+            if self.speed is not None and "t" in entry:
+                due = start + (entry["t"] - first) / self.speed
+                lag = time.perf_counter() - due
+                if lag < 0:
+                    time.sleep(-lag)
+                    lag = 0.0
+            self._send(target, entry, lag)
+            with self._done:
+                self._finished[i] = True
+                while self._answered + 1 < len(self.entries) and self._finished[self._answered + 1]:
+                    self._answered += 1
+                self._done.notify_all()
+
+    def run(self):
+        """Replays the log over concurrent lanes; returns the elapsed seconds."""
+        self._next, self._answered = 0, -1
+        self._finished = [False] * len(self.entries)
+        first = min((entry["t"] for entry in self.entries if "t" in entry), default=0.0)
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._lane, args=(start, first)) for _ in range(self.lanes)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def run_deterministic(self):
+        """
+        Replays the log in recorded order on one target, stepping the
+        emulator's manual clock to each request's recorded simulated time.
+        """
+        target = self.make_target()
+        call(target, "PUT", "/emulator/v1/clock", {"speed": "manual"})
+        now = call(target, "GET", "/emulator/v1/clock")["now"]
+        timed = [entry["sim"] for entry in self.entries if "sim" in entry]
+        # A clock already past the recording keeps its lead
+        offset = max(now - min(timed), 0.0) if timed else 0.0
+        start = time.perf_counter()
+        for entry in self.entries:
+            if "sim" in entry and entry["sim"] + offset > now:
+                step = {"seconds": entry["sim"] + offset - now}
+                now = call(target, "POST", "/emulator/v1/clock/:step", step)["now"]
+            self._send(target, entry, 0.0)
+        return time.perf_counter() - start
+
+
+# --- Reporting ---
+
+
+def percentile(ordered, q):
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def summarize(results):
+    by_operation = collections.defaultdict(list)
+    for result in results:
+        by_operation[result.operation].append(result)
+    rows = {}
+    for operation, group in by_operation.items():
+        replayed = sorted(result.seconds for result in group)
+        rows[operation] = {
+            "requests": len(group),
+            "p50_ms": percentile(replayed, 0.50) * 1000,
+            "p99_ms": percentile(replayed, 0.99) * 1000,
+            "mismatches": sum(bool(result.diffs) for result in group),
+        }
+    return rows
+
+
+def print_report(rows, baseline=None):
+    """The results per operation; with a baseline (a saved run), the change of each p50."""
+    print(f"{'operationId':<34} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'change':>7} {'diffs':>6}")
+    for operation, row in sorted(rows.items(), key=lambda item: -item[1]["requests"]):
+        before = baseline[operation]["p50_ms"] if baseline is not None and operation in baseline else None
+        change = f"{100 * (row['p50_ms'] - before) / before:+.0f}%" if before else ""
+        print(
+            f"{operation:<34} {row['requests']:>9,} {row['p50_ms']:>8.2f} "
+            f"{row['p99_ms']:>8.2f} {change:>7} {row['mismatches']:>6}"
+        )
+
+
+def regressions(rows, baseline, tolerance, min_requests=20):
+    """Operations whose p50 latency grew by more than 'tolerance' (a fraction) over the baseline."""
+    return [
+        operation
+        for operation, row in rows.items()
+        if operation in baseline
+        and row["requests"] >= min_requests
+        and row["p50_ms"] > baseline[operation]["p50_ms"] * (1 + tolerance)
+    ]
+
+
+def recorded_speed(entries):
+    """Simulated seconds per wall-clock second during the recording, or None."""
+    timed = [entry for entry in entries if "t" in entry and "sim" in entry]
+    if len(timed) < 2 or timed[-1]["t"] <= timed[0]["t"]:
+        return None
+    return (timed[-1]["sim"] - timed[0]["sim"]) / (timed[-1]["t"] - timed[0]["t"])
+
+
+def parse_speed(value):
+    if value.lower() in ("max", "inf"):
+        return None
+    speed = float(value.lower().rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("the speed must be positive")
+    return speed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("logs", nargs="+", help="traffic logs (rotated files are included)")
+    parser.add_argument("--url", help="base URL of a running emulator; default: in-process")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help='pace factor, or "max"')
+    parser.add_argument("--deterministic", action="store_true", help="one by one on a stepped manual clock")
+    parser.add_argument("--lanes", type=int, default=16, help="concurrent senders")
+    parser.add_argument("--time-factor", help="simulation speed during the replay (default: see above)")
+    parser.add_argument("--snapshot", help="snapshot every robot of the log is restored to first")
+    parser.add_argument("--ignore", action="append", default=[], help="JSON key not to compare (repeatable)")
+    parser.add_argument("--float-tolerance", type=float, default=1e-6)
+    parser.add_argument("--show", type=int, default=10, help="mismatching requests to print")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run; exit 1 on p50 regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 growth for --compare")
+    parser.add_argument("--strict", action="store_true", help="exit 1 if any response differs")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    try:
+        entries = [entry for path in args.logs for entry in recorder.read_log(path)]
+    except (OSError, ValueError) as e:
+        raise SystemExit(e)
+    entries.sort(key=lambda entry: entry.get("t", 0.0))
+    # The replay sets the clock itself
+    entries = [entry for entry in entries if not CLOCK_CONTROL.match(entry["method"] + " " + entry["path"])]
+    if not entries:
+        raise SystemExit("nothing to replay")
+    matches = (ROBOT_PATH.match(entry["path"]) for entry in entries)
+    robots = {int(match.group(1)) for match in matches if match}
+
+    # The app is built in both modes: its URL map names the operation of each request
+    import app as emulator
+
+    app = emulator.create_app(robots=max(robots) + 1 if robots else 1)
+    classify = Classifier(app, emulator.operation_ids)
+    if args.url:
+        def make_target():
+            return HttpTarget(args.url)
+    else:
+        def make_target():
+            return InProcessTarget(app)
+
+    setup = make_target()
+    if args.snapshot:
+        with open(args.snapshot, "rb") as f:
+            data = f.read()
+        for prefix in [f"/robots/robot-{robot}" for robot in sorted(robots)] or [""]:
+            status, _, answer = setup.send("PUT", f"{prefix}/emulator/v1/snapshot", {}, data)
+            if status != 200:
+                raise SystemExit(f"could not restore {args.snapshot} (HTTP {status}): {answer[:200]!r}")
+    if not args.deterministic:
+        speed = args.time_factor
+        if speed is None:
+            factor = recorded_speed(entries)
+            speed = round(factor * (args.speed or 1.0), 3) if factor else 1.0
+        call(setup, "PUT", "/emulator/v1/clock", {"speed": speed})
+
+    differ = Differ(args.ignore, args.float_tolerance)
+    replay = Replay(entries, make_target, classify, differ, args.speed, args.lanes)
+    elapsed = replay.run_deterministic() if args.deterministic else replay.run()
+
+    results = replay.results
+    timed = [entry["t"] for entry in entries if "t" in entry]
+    span = max(timed) - min(timed) if timed else 0.0
+    lags = sorted(result.lag for result in results)
+    mismatches = [result for result in results if result.diffs]
+    pace = "deterministic" if args.deterministic else "max" if args.speed is None else f"{args.speed:g}x"
+    print(f"{len(entries):,} requests from {len(args.logs)} log(s), {pace}, {args.url or 'in-process'}")
+    lag = percentile(lags, 0.99) * 1000
+    print(
+        f"replayed in {elapsed:.1f} s (recorded over {span:.1f} s), p99 send lag {lag:.1f} ms, "
+        f"{len(mismatches):,} responses differ"
+    )
+    for result in mismatches[: args.show]:
+        print(f"  {result.entry['method']} {result.entry['path']}: {'; '.join(result.diffs)}")
+
+    rows = summarize(results)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["operations"]
+    print_report(rows, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"args": vars(args), "elapsed": elapsed, "operations": rows}, f, indent=2)
+
+    failed = False
+    if baseline:
+        slower = regressions(rows, baseline, args.tolerance)
+        if slower:
+            print(f"p50 regressions over {args.tolerance:.0%}: {', '.join(sorted(slower))}")
+            failed = True
+    if args.strict and mismatches:
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# slamtec_emulator/response_cache.py
+"""
+Pre-serialized JSON bodies for the hot read endpoints. State objects carry a
+version that changes whenever they do; a body is encoded once per version and
+served as-is (or as a 304 to clients whose ETag still matches) until then.
+"""
+
+import dataclasses
+import enum
+import itertools
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+from streaming import BOOT_ID
+
+# Versions are unique across the process, so a replaced state object never
+# shares a version (and so a cached body) with the one it replaced.
+_versions = itertools.count(1)
+
+
+def new_version():
+    return next(_versions)
+
+
+def _default(obj):
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), default=_default)
+
+
+def dumps(obj):
+    """Encodes obj as compact JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return _encoder.encode(obj).encode()
+
+
+class VersionedDict(dict):
+    """
+    A dict whose 'version' changes on every top-level change (assignment,
+    removal, update). Nested values are not watched: replace them instead
+    of mutating them in place.
+    """
+
+    __slots__ = ("version",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = new_version()
+
+    def _changed(self):
+        self.version = new_version()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._changed()
+        return super().setdefault(key, default)
+
+    def pop(self, key, *default):
+        self._changed()
+        return super().pop(key, *default)
+
+    def popitem(self):
+        self._changed()
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+
+class ResponseCache:
+    """
+    A robot's encoded response bodies, by name. get() re-encodes a body only
+    when the version it is asked for differs from the cached one; any value
+    that compares equal when nothing changed (a number, a tuple of versions)
+    will do.
+    """
+
+    def __init__(self):
+        self._entries = {}  # name -> (version, body, etag)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, version, build):
+        """
+        Returns (body, etag) for 'name' at 'version', calling build() for the
+        object to encode on a miss. Read the version before building, so a
+        change made meanwhile is never cached under the old version.
+        """
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1], entry[2]
+        self.misses += 1
+        body = dumps(build())
+        etag = f"{BOOT_ID}-{name}-{new_version()}"
+        self._entries[name] = (version, body, etag)
+        return body, etag
@@ -0,0 +1,147 @@
+# slamtec_emulator/scheduler.py
+
+import heapq
+import itertools
+import logging
+import threading
+
+from sim_clock import MANUAL, clock as sim_clock
+
+log = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """A scheduled callback. Cancelling only sets a flag, so it is O(1) and never blocks."""
+
+    __slots__ = ("when", "interval", "callback", "args", "cancelled")
+
+    def __init__(self, when, interval, callback, args):
+        self.when = when
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    A single background thread that runs every timed simulation in the process
+    (actions, box doors, ...) from a heap of timers.
+
+    Timers are expressed in simulated time (see sim_clock.py), so the speed-up
+    factor of the clock applies to every simulation at once. In manual mode
+    the background thread stays idle and timers only fire from advance().
+
+    Callbacks run on the scheduler thread and must return quickly. A repeating
+    callback (call_every) keeps running until it returns False or is cancelled.
+    Cancelled timers are dropped lazily when they reach the top of the heap.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._heap = []
+        self._counter = itertools.count()  # tie-breaker for timers due at the same time
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def now(self):
+        return self.clock.now()
+
+    def call_later(self, delay, callback, *args):
+        """Runs callback(*args) once, delay simulated seconds from now."""
+        return self._push(TimerHandle(self.clock.now() + delay, None, callback, args))
+
+    def call_every(self, interval, callback, *args, delay=None):
+        """Runs callback(*args) every interval seconds (first run after delay, default interval)."""
+        first = interval if delay is None else delay
+        return self._push(TimerHandle(self.clock.now() + first, interval, callback, args))
+
+    def pending(self):
+        """Returns the number of live (not cancelled) timers."""
+        with self._cond:
+            return sum(1 for _, _, handle in self._heap if not handle.cancelled)
+
+    def set_speed(self, speed):
+        """Changes the clock speed (factor, "max" or "manual") and wakes the loop."""
+        with self._cond:
+            self.clock.set_speed(speed)
+            self._cond.notify()
+
+    def advance(self, seconds):
+        """
+        Moves a manual clock forward, firing every timer that falls due on the
+        way in order, in the calling thread. Returns the number of callbacks run.
+        """
+        if self.clock.mode != MANUAL:
+            raise RuntimeError("advance() needs the clock in manual mode")
+
+        target = self.clock.now() + seconds
+        fired = 0
+        while True:
+            with self._cond:
+                self._drop_cancelled()
+                if not self._heap or self._heap[0][0] > target:
+                    break
+                _, _, handle = heapq.heappop(self._heap)
+                self.clock.jump_to(handle.when)
+            self._fire(handle)
+            fired += 1
+        self.clock.jump_to(target)
+        return fired
+
+    def _push(self, handle):
+        with self._cond:
+            heapq.heappush(self._heap, (handle.when, next(self._counter), handle))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="emulator-scheduler", daemon=True
+                )
+                self._thread.start()
+            # Only wake the loop if the new timer is now the earliest one
+            if self._heap[0][2] is handle:
+                self._cond.notify()
+        return handle
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    self._drop_cancelled()
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    timeout = self.clock.real_delay(self._heap[0][0])
+                    if timeout is None:
+                        # Manual clock: only advance() fires timers
+                        self._cond.wait()
+                        continue
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                _, _, handle = heapq.heappop(self._heap)
+                self.clock.jump_to(handle.when)
+
+            self._fire(handle)
+
+    def _fire(self, handle):
+        try:
+            keep_going = handle.callback(*handle.args)
+        except Exception:
+            log.exception("Timer callback %r failed", handle.callback)
+            keep_going = False
+
+        if handle.interval is not None and keep_going is not False and not handle.cancelled:
+            handle.when += handle.interval
+            with self._cond:
+                heapq.heappush(self._heap, (handle.when, next(self._counter), handle))
+
+
+# The one scheduler shared by every robot in the process
+scheduler = Scheduler(sim_clock)
@@ -0,0 +1,205 @@
+# slamtec_emulator/serve.py
+"""
+Production entry point for the emulator.
+
+Runs the app under gunicorn with the debugger and reloader off. Routes are
+created once per worker by the create_app() factory.
+
+Robot state lives in process memory, so every robot must be owned by exactly
+one process for its state to stay consistent:
+
+* --workers 1 (default): one worker process handles every robot, using
+  --threads request threads.
+* --workers N: the fleet is split into N shards. Each shard runs in its own
+  process and listens on the ports of the robots it owns (base port + robot
+  index), so a request always reaches the process holding that robot.
+
+Examples:
+    python serve.py --threads 16
+    python serve.py --robots 400 --workers 8 --threads 8
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+
+from gunicorn.app.base import BaseApplication
+
+import logs
+
+log = logging.getLogger(__name__)
+
+
+class EmulatorApplication(BaseApplication):
+    """A gunicorn application that builds the Flask app through create_app()."""
+
+    def __init__(self, options, app_kwargs):
+        self.options = options
+        self.app_kwargs = app_kwargs
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Imported here so the routes are built inside the worker process
+        from app import create_app
+
+        logs.configure()
+        return create_app(**self.app_kwargs)
+
+
+def shard_ports(base_port, robots, shard, shards):
+    return [base_port + i for i in range(robots) if i % shards == shard]
+
+
+def run_shard(args, shard, shards, bind_robot_ports):
+    ports = (
+        shard_ports(args.port, args.robots, shard, shards)
+        if bind_robot_ports
+        else [args.port]
+    )
+    options = {
+        "bind": [f"{args.host}:{port}" for port in ports],
+        "workers": 1,
+        "worker_class": "gthread",
+        "threads": args.threads,
+        "backlog": args.backlog,
+        "keepalive": 5,
+        # gunicorn has no "off" level
+        "loglevel": "critical" if args.log_level == "off" else args.log_level,
+        "proc_name": f"slamtec-emulator-{shard}",
+    }
+    app_kwargs = {
+        "spec_file": args.spec,
+        "robots": args.robots,
+        "base_port": args.port,
+        "shard": shard,
+        "shards": shards,
+    }
+    EmulatorApplication(options, app_kwargs).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slamtec emulator production server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=1448)
+    parser.add_argument("--spec", default="swagger-conf.json")
+    parser.add_argument("--robots", type=int, default=1)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes (one fleet shard each)"
+    )
+    parser.add_argument("--threads", type=int, default=8, help="request threads per worker")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument(
+        "--port-per-robot",
+        action="store_true",
+        help="listen on port+i for robot i (implied by --workers > 1)",
+    )
+    parser.add_argument(
+        "--time-factor",
+        default=None,
+        help='simulation speed: a factor such as 10, "max" or "manual"',
+    )
+    parser.add_argument(
+        "--map",
+        default=None,
+        help='initial map: a .stcm or .npy file, or "office:<size in meters>"',
+    )
+    parser.add_argument(
+        "--world",
+        default=None,
+        help='floors and elevators: a JSON file or "building:<floors>[:<elevators>[:<capacity>]]"',
+    )
+    parser.add_argument(
+        "--snapshot", default=None, help="snapshot file every robot starts from (see snapshot.py)"
+    )
+    parser.add_argument(
+        "--faults", default=None, help="fault injection file (see faults.py)"
+    )
+    parser.add_argument(
+        "--record",
+        default=None,
+        help="traffic log to record to (see recorder.py); with --workers N, one per worker",
+    )
+    parser.add_argument(
+        "--validation",
+        default=None,
+        choices=("strict", "warn", "off"),
+        help="request validation against the spec (see validation.py)",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="warning",
+        choices=logs.LEVELS,
+        help='emulator and gunicorn log level; "off" disables the emulator\'s logging',
+    )
+    args = parser.parse_args()
+
+    # Read by logs.configure() in every worker
+    os.environ["EMULATOR_LOG_LEVEL"] = args.log_level
+    logs.configure()
+
+    if args.time_factor is not None:
+        # Read by sim_clock.py when each worker imports it
+        os.environ["EMULATOR_TIME_FACTOR"] = args.time_factor
+    if args.map is not None:
+        # Read by occupancy_map.py when a worker first needs the map
+        os.environ["EMULATOR_MAP"] = args.map
+    if args.world is not None:
+        # Read by world.py when a worker creates its first robot
+        os.environ["EMULATOR_WORLD"] = args.world
+    if args.snapshot is not None:
+        # Read by every robot a worker creates (see snapshot.py)
+        os.environ["EMULATOR_SNAPSHOT"] = args.snapshot
+    if args.faults is not None:
+        # Read by faults.install() when each worker builds its app
+        os.environ["EMULATOR_FAULTS"] = args.faults
+    if args.record is not None:
+        # Read by recorder.install() when each worker builds its app
+        os.environ["EMULATOR_RECORD"] = args.record
+    if args.validation is not None:
+        # Read by validation.install() when each worker builds its app
+        os.environ["EMULATOR_VALIDATION"] = args.validation
+
+    if args.workers > args.robots:
+        parser.error("--workers cannot exceed --robots: each worker owns a shard of the fleet")
+
+    if args.workers == 1:
+        run_shard(args, 0, 1, args.port_per_robot)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_shard, args=(args, shard, args.workers, True))
+        for shard in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    log.info(
+        "Serving %d robots from %d workers on %s:%d-%d",
+        args.robots,
+        args.workers,
+        args.host,
+        args.port,
+        args.port + args.robots - 1,
+    )
+
+    def _stop(signum, frame):
+        for process in processes:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        _stop(None, None)
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# slamtec_emulator/sim_clock.py
+
+import math
+import os
+import threading
+import time
+
+# Speed settings accepted by SimClock.set_speed()
+REALTIME = "realtime"
+FAST = "max"  # as fast as possible
+MANUAL = "manual"  # only moves when stepped explicitly
+
+
+class SimClock:
+    """
+    The emulator's notion of time, in seconds.
+
+    * realtime (factor f): simulated time runs f times faster than the wall clock.
+    * max: simulated time jumps straight to the next pending timer, so every
+      simulation completes as fast as the CPU allows.
+    * manual: simulated time stands still until advanced explicitly, which
+      makes test scenarios fully deterministic.
+
+    The scheduler is the only component that moves time forward in the max
+    and manual modes; everything else just reads now().
+    """
+
+    def __init__(self, speed=1.0):
+        self._lock = threading.Lock()
+        self._sim_base = 0.0
+        self._real_base = time.monotonic()
+        self.mode = REALTIME
+        self.factor = 1.0
+        self.set_speed(speed)
+
+    def now(self):
+        if self.mode == REALTIME:
+            return self._sim_base + (time.monotonic() - self._real_base) * self.factor
+        return self._sim_base
+
+    def set_speed(self, speed):
+        """Accepts a speed-up factor (number), "max" or "manual"."""
+        mode, factor = parse_speed(speed)
+        with self._lock:
+            # Rebase so simulated time stays continuous across changes
+            self._sim_base = self.now()
+            self._real_base = time.monotonic()
+            self.mode = mode
+            self.factor = factor
+
+    def real_delay(self, when):
+        """Wall-clock seconds until simulated time reaches 'when' (None: never by itself)."""
+        if self.mode == MANUAL:
+            return None
+        if self.mode == FAST:
+            return 0.0
+        return (when - self.now()) / self.factor
+
+    def jump_to(self, when):
+        """Moves a non-realtime clock forward to 'when' (never backwards)."""
+        with self._lock:
+            if self.mode != REALTIME and when > self._sim_base:
+                self._sim_base = when
+
+    def describe(self):
+        return {"mode": self.mode, "factor": self.factor, "now": self.now()}
+
+
+def parse_speed(speed):
+    """(mode, factor) of a speed: a positive number or a mode name. Raises ValueError for anything else."""
+    if isinstance(speed, str):
+        value = speed.strip().lower()
+        if value in (FAST, "fast", "inf"):
+            return FAST, 1.0
+        if value in (MANUAL, "step"):
+            return MANUAL, 1.0
+        if value in (REALTIME, ""):
+            return REALTIME, 1.0
+        try:
+            speed = float(value.rstrip("x"))
+        except ValueError:
+            raise ValueError(f"Invalid clock speed: {speed!r}") from None
+    elif isinstance(speed, bool) or not isinstance(speed, (int, float)):
+        raise ValueError(f"Invalid clock speed: {speed!r}")
+    if not 0 < speed < math.inf:
+        raise ValueError(f"Invalid clock speed: {speed}")
+    return REALTIME, float(speed)
+
+
+# The one clock shared by every simulation in the process.
+# EMULATOR_TIME_FACTOR accepts e.g. "10", "100x", "max" or "manual".
+clock = SimClock(os.environ.get("EMULATOR_TIME_FACTOR", "1"))
@@ -0,0 +1,290 @@
+# slamtec_emulator/snapshot.py
+"""
+Snapshots of a robot's state, to save a test scenario once and restore it in
+one request instead of rebuilding it call by call:
+
+    preamble   magic b"EMSN", format version (uint32), metadata length (uint32)
+    metadata   UTF-8 JSON: the robot's state, arrays replaced by block references
+    padding    up to a multiple of 8 bytes
+    blocks     the arrays (map cells, POI poses), each 8-byte aligned, at the
+               offset of its reference, relative to the end of the padding
+
+A snapshot holds the pose and odometry, power and health state, home pose
+and dock, every floor the robot has been on (its own map if it loaded one,
+POIs, virtual lines and rectangle areas), the cargos and boxes and the
+recent action history. Running and queued actions and delivery tasks are not saved; a
+restore aborts them. The floors must exist in the robot's world.
+
+POIs are stored as columns (ids and names in the metadata, poses as one
+float64 block); only POIs with fields beyond an id, an x/y/yaw pose and a
+display name are stored whole. Files are memory-mapped on load, and a
+restored floor's POI index is only built when it is first read, so restoring
+even 100k POIs takes milliseconds.
+"""
+
+import dataclasses
+import json
+import os
+import re
+import struct
+
+import numpy as np
+
+from models.Action import ActionInfo, ActionState, SlamtecActionResult, SlamtecActionStatus
+from occupancy_map import OccupancyMap
+
+MAGIC = b"EMSN"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<4sII")
+ALIGNMENT = 8
+
+# Where the admin endpoints keep named snapshots
+SNAPSHOT_DIR = os.environ.get("EMULATOR_SNAPSHOT_DIR", ".emulator-snapshots")
+SNAPSHOT_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,100}$")
+
+POSE_KEYS = ("x", "y", "yaw")
+
+
+class SnapshotError(ValueError):
+    """Raised for data that is not a snapshot written by this emulator, or does not fit the robot."""
+
+
+class _Blocks:
+    """Collects the arrays of a snapshot being encoded and hands out their references."""
+
+    def __init__(self):
+        self.segments = []
+        self.size = 0
+
+    def add(self, array):
+        array = np.ascontiguousarray(array)
+        ref = {"offset": self.size, "dtype": array.dtype.str, "shape": list(array.shape)}
+        self.segments.append(memoryview(array).cast("B"))
+        self.size += array.nbytes
+        padding = -self.size % ALIGNMENT
+        if padding:
+            self.segments.append(bytes(padding))
+            self.size += padding
+        return ref
+
+
+def _encode_pois(pois, blocks):
+    ids, names, poses, full = [], [], [], {}
+    for i, poi in enumerate(pois):
+        pose = poi.get("pose") or {}
+        metadata = poi.get("metadata") or {}
+        ids.append(poi["id"])
+        names.append(metadata.get("display_name"))
+        poses.append([float(pose.get(key, 0.0)) for key in POSE_KEYS])
+        regular = poi.keys() <= {"id", "pose", "metadata"} and pose.keys() <= set(POSE_KEYS)
+        if not regular or not metadata.keys() <= {"display_name"}:
+            full[i] = poi  # stored whole, so nothing is lost
+    return {
+        "ids": ids,
+        "names": names,
+        "poses": blocks.add(np.array(poses, dtype=np.float64).reshape(-1, len(POSE_KEYS))),
+        "full": full,
+    }
+
+
+def _encode_map(occupancy_map, blocks):
+    if occupancy_map is None:
+        return None  # the floor's shared map
+    return {
+        "resolution": occupancy_map.resolution,
+        "origin": [occupancy_map.origin_x, occupancy_map.origin_y],
+        "cells": blocks.add(np.asarray(occupancy_map.grid, dtype=np.uint8)),
+    }
+
+
+def encode(robot):
+    """
+    Encodes the snapshot of a robot as a list of bytes-like segments; map
+    cells are not copied.
+    """
+    blocks = _Blocks()
+    floors = {}
+    for name, floor in robot.floor_states().items():
+        floors[name] = {
+            "map": _encode_map(floor.map, blocks),
+            "pois": _encode_pois(floor.pois.values(), blocks),
+            "virtual_walls": list(floor.virtual_walls.values()),
+            "virtual_tracks": list(floor.virtual_tracks.values()),
+            "rectangle_areas": [area for areas in floor.rectangle_areas.values() for area in areas.values()],
+        }
+    history, _ = robot.action_history.query(0, robot.action_history.retention)
+    state = {
+        "device_id": robot.device_id,
+        "pose": robot.pose.to_dict(),
+        "odometry": {"distance": robot.odometry(), "pose": robot.odo_pose()},
+        "localization_quality": robot.localization_quality,
+        "power_status": dict(robot.power_status),
+        "robot_health": dict(robot.robot_health),
+        "system_params": robot.system_params,
+        "home_pose": robot.home_pose,
+        "home_dock": robot.home_dock["id"] if robot.home_dock else None,
+        "building": robot.floor.building,
+        "floor": robot.floor.name,
+        "floors": floors,
+        "artifact_id_counter": robot._artifact_id_counter,
+        "cargos": [cargo.to_dict() for cargo in robot.cargos],
+        "action_id_counter": robot.action_id_counter,
+        "action_history": [
+            action if isinstance(action, dict) else dataclasses.asdict(action) for action in reversed(history)
+        ],
+    }
+    metadata = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    preamble = PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(metadata))
+    padding = bytes(-(len(preamble) + len(metadata)) % ALIGNMENT)
+    return [preamble, metadata, padding] + blocks.segments
+
+
+def _parse_head(head):
+    """Returns (state, offset of the blocks) from the start of a snapshot."""
+    if len(head) < PREAMBLE.size:
+        raise SnapshotError("truncated snapshot")
+    magic, version, metadata_length = PREAMBLE.unpack_from(head)
+    if magic != MAGIC:
+        raise SnapshotError("not a snapshot written by the emulator")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+    end = PREAMBLE.size + metadata_length
+    if len(head) < end:
+        raise SnapshotError("truncated snapshot")
+    try:
+        state = json.loads(bytes(head[PREAMBLE.size : end]).decode("utf-8"))
+    except ValueError as e:
+        raise SnapshotError(f"invalid snapshot metadata: {e}") from e
+    return state, end + (-end % ALIGNMENT)
+
+
+def _resolve(state, get_block):
+    """Replaces the block references of a decoded state by arrays, maps, POI loaders and models."""
+    for floor in state["floors"].values():
+        if floor["map"] is not None:
+            geometry = floor["map"]
+            floor["map"] = OccupancyMap(get_block(geometry["cells"]), geometry["resolution"], geometry["origin"])
+        floor["pois"] = _poi_loader(floor["pois"], get_block(floor["pois"]["poses"]))
+    state["action_history"] = [_action_info(action) for action in state["action_history"]]
+    return state
+
+
+def _poi_loader(columns, poses):
+    """A callable building a floor's POI dicts, for PoiIndex to call on first use."""
+    full = {int(i): poi for i, poi in columns["full"].items()}
+
+    def load():
+        xs, ys, yaws = (poses[:, i].tolist() for i in range(len(POSE_KEYS)))
+        for i, (poi_id, name, x, y, yaw) in enumerate(zip(columns["ids"], columns["names"], xs, ys, yaws)):
+            poi = full.get(i)
+            if poi is None:
+                poi = {"id": poi_id, "pose": {"x": x, "y": y, "yaw": yaw}, "metadata": {}}
+                if name is not None:
+                    poi["metadata"]["display_name"] = name
+            yield poi
+
+    return load
+
+
+def _action_info(action):
+    state = action["state"]
+    return ActionInfo(
+        action_id=action["action_id"],
+        action_name=action["action_name"],
+        stage=action["stage"],
+        state=ActionState(
+            status=SlamtecActionStatus(state["status"]),
+            result=SlamtecActionResult(state["result"]),
+            reason=state["reason"],
+        ),
+    )
+
+
+def _check(state):
+    try:
+        state["floors"][state["floor"]]
+        for key in ("pose", "power_status", "cargos", "action_history", "action_id_counter"):
+            state[key]
+    except (KeyError, TypeError) as e:
+        raise SnapshotError(f"incomplete snapshot: missing {e}") from None
+
+
+def decode(data):
+    """
+    Decodes a snapshot from a bytes-like object, ready for RobotState.restore();
+    arrays are read-only views into 'data'.
+    """
+    state, offset = _parse_head(data)
+    _check(state)
+
+    def get_block(ref):
+        count = int(np.prod(ref["shape"]))
+        dtype = np.dtype(ref["dtype"])
+        if len(data) < offset + ref["offset"] + count * dtype.itemsize:
+            raise SnapshotError("truncated snapshot data")
+        return np.frombuffer(data, dtype=dtype, count=count, offset=offset + ref["offset"]).reshape(ref["shape"])
+
+    return _resolve(state, get_block)
+
+
+def read_file(path):
+    """Like decode(), with the arrays of the file memory-mapped rather than read."""
+    with open(path, "rb") as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) < PREAMBLE.size:
+            raise SnapshotError(f"{path}: truncated snapshot")
+        head = preamble + f.read(PREAMBLE.unpack(preamble)[2])
+        size = os.fstat(f.fileno()).st_size
+    state, offset = _parse_head(head)
+    _check(state)
+
+    def get_block(ref):
+        count = int(np.prod(ref["shape"]))
+        dtype = np.dtype(ref["dtype"])
+        if size < offset + ref["offset"] + count * dtype.itemsize:
+            raise SnapshotError(f"{path}: truncated snapshot data")
+        if count == 0:
+            return np.empty(ref["shape"], dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset + ref["offset"], shape=tuple(ref["shape"]))
+
+    return _resolve(state, get_block)
+
+
+def write_file(path, robot):
+    """Writes the snapshot of a robot to 'path', atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f"{path}.tmp-{os.getpid()}"
+    with open(temporary, "wb") as f:
+        for segment in encode(robot):
+            f.write(segment)
+    os.replace(temporary, path)
+
+
+_startup = None
+
+
+def startup_state():
+    """The decoded EMULATOR_SNAPSHOT file every new robot restores, or None; read once per process."""
+    global _startup
+    path = os.environ.get("EMULATOR_SNAPSHOT")
+    if not path:
+        return None
+    if _startup is None or _startup[0] != path:
+        _startup = (path, read_file(path))
+    return _startup[1]
+
+
+def path_for(name):
+    """The file of a named snapshot in SNAPSHOT_DIR; raises SnapshotError for an invalid name."""
+    if not SNAPSHOT_NAME.match(name) or name.startswith("."):
+        raise SnapshotError(f"invalid snapshot name {name!r}")
+    return os.path.join(SNAPSHOT_DIR, f"{name}.snap")
+
+
+def list_names():
+    """The named snapshots in SNAPSHOT_DIR."""
+    try:
+        files = os.listdir(SNAPSHOT_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(name[: -len(".snap")] for name in files if name.endswith(".snap"))
@@ -0,0 +1,217 @@
+# slamtec_emulator/spec.py
+"""
+Access to the OpenAPI spec (swagger-conf.json).
+
+Starting the emulator only needs the operationId, path and method of every
+operation, so those are compiled into a small route manifest that is cached
+on disk, keyed by the hash of the spec file. The full spec is only parsed when
+the manifest is rebuilt or when some feature actually needs it (load_spec).
+
+The example responses served for operations without a handler
+(compile_examples) and the request schemas used by validation.py
+(compile_requests) are extracted and cached the same way.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+
+HTTP_METHODS = ("get", "post", "put", "delete")
+
+MANIFEST_VERSION = 1
+EXAMPLES_VERSION = 1
+REQUESTS_VERSION = 1
+
+# Example values of schemas without an example, enum or default
+FORMAT_EXAMPLES = {
+    "date-time": "1970-01-01T00:00:00Z",
+    "date": "1970-01-01",
+    "uuid": "00000000-0000-0000-0000-000000000000",
+}
+TYPE_EXAMPLES = {"string": "string", "integer": 0, "number": 0.0, "boolean": True}
+
+log = logging.getLogger(__name__)
+
+
+def default_cache_dir(spec_file):
+    return os.environ.get(
+        "EMULATOR_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(spec_file)), ".emulator-cache"),
+    )
+
+
+def spec_hash(spec_file):
+    with open(spec_file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def load_spec(spec_file):
+    """Parses the full spec once per process. Only call this when really needed."""
+    with open(spec_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compile_routes(spec):
+    """Extracts [operationId, path, method] for every operation in the spec."""
+    routes = []
+    for path, path_item in spec["paths"].items():
+        for method, operation in path_item.items():
+            if method.lower() in HTTP_METHODS:
+                routes.append([operation.get("operationId"), path, method.lower()])
+    return routes
+
+
+def resolve(spec, schema):
+    """Follows a local $ref ("#/components/...") to the object it names."""
+    while "$ref" in schema:
+        node = spec
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            node = node[part]
+        schema = node
+    return schema
+
+
+def example_value(spec, schema, seen=()):
+    """
+    A value valid against 'schema': its own example, enum or default when it
+    has one, otherwise built from its type (every property of an object, one
+    item per array). Recursive references end in an empty object.
+    """
+    ref = schema.get("$ref")
+    if ref is not None:
+        if ref in seen:
+            return {}
+        return example_value(spec, resolve(spec, schema), (*seen, ref))
+    for key in ("example", "default"):
+        if key in schema:
+            return schema[key]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    for key in ("oneOf", "anyOf"):
+        if schema.get(key):
+            return example_value(spec, schema[key][0], seen)
+    if "allOf" in schema:
+        value = {}
+        for part in schema["allOf"]:
+            value.update(example_value(spec, part, seen))
+        return value
+
+    kind = schema.get("type", "object" if "properties" in schema else None)
+    if kind == "object":
+        return {
+            name: example_value(spec, prop, seen)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [example_value(spec, schema.get("items", {}), seen)]
+    if kind in ("integer", "number") and "minimum" in schema:
+        return schema["minimum"]
+    if kind == "string" and schema.get("format") in FORMAT_EXAMPLES:
+        return FORMAT_EXAMPLES[schema["format"]]
+    return TYPE_EXAMPLES.get(kind, {})
+
+
+def compile_examples(spec):
+    """
+    Returns [method, path, status, media type, example] for the first success
+    response of every operation (media type and example are None for a
+    response without a body). Operations without a success response are left out.
+    """
+    examples = []
+    for path, path_item in spec["paths"].items():
+        for method, operation in path_item.items():
+            if method.lower() not in HTTP_METHODS:
+                continue
+            responses = operation.get("responses", {})
+            status = next((code for code in sorted(responses) if code.startswith("2")), None)
+            if status is None:
+                continue
+            response = resolve(spec, responses[status])
+            media_type, media = next(iter(response.get("content", {}).items()), (None, None))
+            example = None
+            if media is not None:
+                example = media.get("example")
+                if example is None and media_type != "application/octet-stream":
+                    example = example_value(spec, media.get("schema", {}))
+            examples.append([method.lower(), path, int(status), media_type, example])
+    return examples
+
+
+def compile_requests(spec):
+    """
+    Returns what request validation needs: {"schemas": components/schemas,
+    "operations": [[method, path, parameters, body]]}, where parameters are
+    [name, "path" or "query", required, schema] and body is [required,
+    schema] for a JSON request body (None otherwise).
+    """
+    operations = []
+    for path, path_item in spec["paths"].items():
+        shared = path_item.get("parameters", [])
+        for method, operation in path_item.items():
+            if method.lower() not in HTTP_METHODS:
+                continue
+            parameters = [
+                [p["name"], p["in"], bool(p.get("required")), p.get("schema", {})]
+                for p in map(functools.partial(resolve, spec), shared + operation.get("parameters", []))
+                if p.get("in") in ("path", "query")
+            ]
+            body = None
+            request_body = resolve(spec, operation.get("requestBody", {}))
+            media = request_body.get("content", {}).get("application/json")
+            if media is not None:
+                body = [bool(request_body.get("required")), media.get("schema", {})]
+            if parameters or body:
+                operations.append([method.lower(), path, parameters, body])
+    return {"schemas": spec.get("components", {}).get("schemas", {}), "operations": operations}
+
+
+def _load_cached(spec_file, cache_dir, kind, version, compile):
+    """
+    Returns compile(spec) for a spec, cached on disk as '<kind>-<hash>.json' and
+    only rebuilt when the spec file content has changed.
+    """
+    cache_dir = cache_dir or default_cache_dir(spec_file)
+    digest = spec_hash(spec_file)
+    cache_file = os.path.join(cache_dir, f"{kind}-{digest[:16]}.json")
+
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("version") == version and cached.get("sha256") == digest:
+            return cached[kind]
+    except (OSError, ValueError):
+        pass
+
+    compiled = compile(load_spec(spec_file))
+    cached = {"version": version, "sha256": digest, kind: compiled}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so concurrent workers never read a partial file
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cached, f, separators=(",", ":"))
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        log.warning("Could not write %s manifest to %s: %s", kind, cache_dir, e)
+    return compiled
+
+
+def load_route_manifest(spec_file, cache_dir=None):
+    """
+    Returns the compiled routes of a spec, rebuilding the cached manifest only
+    when the spec file content has changed.
+    """
+    return _load_cached(spec_file, cache_dir, "routes", MANIFEST_VERSION, compile_routes)
+
+
+def load_requests(spec_file, cache_dir=None):
+    """Returns the compiled request schemas of a spec (see compile_requests), cached like the routes."""
+    return _load_cached(spec_file, cache_dir, "requests", REQUESTS_VERSION, compile_requests)
+
+
+def load_examples(spec_file, cache_dir=None):
+    """Returns the compiled example responses of a spec (see compile_examples), cached like the routes."""
+    return _load_cached(spec_file, cache_dir, "examples", EXAMPLES_VERSION, compile_examples)
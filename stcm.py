@@ -0,0 +1,97 @@
+# slamtec_emulator/stcm.py
+"""
+The emulator's composite map ("STCM") file format.
+
+The real STCM format is proprietary; clients only ever save it and upload it
+again, so the emulator uses its own container that round-trips through
+GET/PUT /api/core/slam/v1/maps/stcm:
+
+    preamble   magic b"STCM", format version (uint32), metadata length (uint32)
+    metadata   UTF-8 JSON: virtual lines and rectangle areas
+    map        an explore-map block: the 36-byte header, then one byte per cell
+
+The cell data sits at a fixed offset, so files are memory-mapped on load.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from occupancy_map import EXPLORE_HEADER, OccupancyMap
+
+MAGIC = b"STCM"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<4sII")
+
+
+class StcmError(ValueError):
+    """Raised for data that is not a composite map written by this emulator."""
+
+
+def encode(occupancy_map, artifacts):
+    """
+    Encodes a map and its artifacts as a list of bytes-like segments; the cell
+    data is not copied (see OccupancyMap.explore_segments).
+    """
+    metadata = json.dumps(artifacts, separators=(",", ":")).encode("utf-8")
+    preamble = PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(metadata))
+    return [preamble, metadata] + occupancy_map.explore_segments()
+
+
+def _parse_head(head):
+    """Returns (artifacts, header fields, offset of the cell data) from the start of a file."""
+    if len(head) < PREAMBLE.size:
+        raise StcmError("truncated composite map")
+    magic, version, metadata_length = PREAMBLE.unpack_from(head)
+    if magic != MAGIC:
+        raise StcmError("not a composite map written by the emulator")
+    if version != FORMAT_VERSION:
+        raise StcmError(f"unsupported composite map version {version}")
+
+    offset = PREAMBLE.size + metadata_length
+    if len(head) < offset + EXPLORE_HEADER.size:
+        raise StcmError("truncated composite map")
+    try:
+        artifacts = json.loads(bytes(head[PREAMBLE.size : offset]).decode("utf-8"))
+    except ValueError as e:
+        raise StcmError(f"invalid composite map metadata: {e}") from e
+
+    origin_x, origin_y, width, height, resolution, size = EXPLORE_HEADER.unpack_from(head, offset)
+    if size != width * height or resolution <= 0:
+        raise StcmError("inconsistent map header")
+    # The header stores float32: undo the rounding of resolutions such as 0.05
+    resolution = round(resolution, 6)
+    return artifacts, (origin_x, origin_y, width, height, resolution), offset + EXPLORE_HEADER.size
+
+
+def decode(data):
+    """
+    Decodes a composite map from a bytes-like object. Returns (OccupancyMap,
+    artifacts); the map grid is a read-only view into 'data'.
+    """
+    artifacts, (origin_x, origin_y, width, height, resolution), offset = _parse_head(data)
+    if len(data) < offset + width * height:
+        raise StcmError("truncated map data")
+    grid = np.frombuffer(data, dtype=np.uint8, count=width * height, offset=offset)
+    return OccupancyMap(grid.reshape(height, width), resolution, (origin_x, origin_y)), artifacts
+
+
+def read_file(path):
+    """Like decode(), with the cells of the file memory-mapped rather than read."""
+    with open(path, "rb") as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) < PREAMBLE.size:
+            raise StcmError(f"{path}: truncated composite map")
+        metadata_length = PREAMBLE.unpack(preamble)[2]
+        head = preamble + f.read(metadata_length + EXPLORE_HEADER.size)
+
+    artifacts, (origin_x, origin_y, width, height, resolution), offset = _parse_head(head)
+    grid = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(height, width))
+    return OccupancyMap(grid, resolution, (origin_x, origin_y)), artifacts
+
+
+def write_file(path, occupancy_map, artifacts):
+    with open(path, "wb") as f:
+        for segment in encode(occupancy_map, artifacts):
+            f.write(segment)
@@ -0,0 +1,85 @@
+# slamtec_emulator/streaming.py
+"""
+Binary responses built from bytes-like segments (usually views of a map grid):
+streamed in chunks without joining the segments, with an ETag for conditional
+requests and single byte-range support for resumed or partial downloads.
+"""
+
+import uuid
+
+from flask import Response
+from werkzeug.datastructures import ContentRange
+
+# Size of the chunks handed to the WSGI server
+CHUNK_SIZE = 256 * 1024
+
+# Map versions restart at 1 with every process, so ETags carry a boot id to
+# keep a client's cached copy from matching a different map after a restart.
+BOOT_ID = uuid.uuid4().hex[:12]
+
+
+class Payload:
+    """A response body made of bytes-like segments, with an entity tag."""
+
+    def __init__(self, segments, tag):
+        self.segments = [memoryview(s).cast("B") for s in segments]
+        self.length = sum(len(s) for s in self.segments)
+        self.etag = f"{BOOT_ID}-{tag}"
+
+    def iter_range(self, start=0, stop=None, chunk_size=CHUNK_SIZE):
+        """Yields the bytes [start, stop) in chunks of at most chunk_size."""
+        stop = self.length if stop is None else stop
+        offset = 0
+        for segment in self.segments:
+            end = offset + len(segment)
+            if end > start and offset < stop:
+                lo, hi = max(start - offset, 0), min(stop, end) - offset
+                for i in range(lo, hi, chunk_size):
+                    yield bytes(segment[i : min(i + chunk_size, hi)])
+            offset = end
+            if offset >= stop:
+                break
+
+
+def payload_response(payload, request, mimetype="application/octet-stream"):
+    """
+    Serves a Payload for the current request: 304 when the client's ETag still
+    matches, 206 for a satisfiable single Range (honouring If-Range), 416 for
+    an unsatisfiable one, 200 with the whole body otherwise.
+    """
+    headers = {"Accept-Ranges": "bytes"}
+    if request.if_none_match.contains(payload.etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(payload.etag)
+        return response
+
+    start, stop, status = 0, payload.length, 200
+    if request.range is not None and _if_range_matches(request, payload):
+        span = request.range.range_for_length(payload.length)
+        if span is None:
+            response = Response(status=416, headers=headers)
+            response.content_range = ContentRange("bytes", None, None, payload.length)
+            return response
+        start, stop = span
+        status = 206
+
+    response = Response(
+        payload.iter_range(start, stop),
+        status=status,
+        mimetype=mimetype,
+        headers=headers,
+        direct_passthrough=True,
+    )
+    response.content_length = stop - start
+    if status == 206:
+        response.content_range = ContentRange("bytes", start, stop, payload.length)
+    response.set_etag(payload.etag)
+    return response
+
+
+def _if_range_matches(request, payload):
+    """A Range only applies if If-Range is absent or names the current entity."""
+    if_range = request.if_range
+    if if_range.etag is None and if_range.date is None:
+        return True
+    return if_range.etag == payload.etag
@@ -0,0 +1,439 @@
+# slamtec_emulator/task_engine.py
+"""
+The delivery task engine of a robot (/api/delivery/v1/tasks).
+
+Submitted tasks wait in a FIFO queue and run one at a time: MoveTo actions
+through the task points to the target POI, then the task's boxes are opened,
+the robot waits for the pickup to end, and the boxes are closed again.
+
+Tasks are found by task_id and order_id in O(1); submitting a batch is one
+pass over it plus one lock acquisition. Cancelling a queued task only marks
+it: the queue drops it when it reaches the front, so cancelling any number
+of tasks never scans the queue. Finished tasks are kept for listing until
+'retention' newer ones have finished.
+
+The running task advances on a scheduler timer that only exists while there
+is work; every step polls the robot (its action history, the box doors)
+instead of hooking into them, so the engine stays out of the action and
+cargo code paths.
+"""
+
+import collections
+import dataclasses
+import itertools
+import logging
+import os
+import uuid
+
+import event_bus
+import metrics
+from models.Action import ActionInfo, SlamtecActionName, SlamtecActionResult
+from models.Cargo import DoorStatus
+from models.Task import (
+    FINAL_STATUSES,
+    DeliveryTask,
+    DeliveryTaskStage,
+    DeliveryTaskStatus,
+    DeliveryTaskType,
+    TaskCargo,
+)
+from scheduler import scheduler
+
+# Interval between two steps of the running task, in seconds
+TASK_TICK = 0.1
+
+# How long the robot waits at the target for the pickup to end (PUT
+# :end_pickup) before closing the boxes anyway, in seconds
+PICKUP_TIMEOUT = float(os.environ.get("EMULATOR_PICKUP_TIMEOUT", "30"))
+
+# Finished tasks kept per robot for GET /api/delivery/v1/tasks?status=all
+DEFAULT_RETENTION = int(os.environ.get("EMULATOR_TASK_HISTORY", "1000"))
+
+# Statuses listed by GET /api/delivery/v1/tasks without a status parameter
+ACTIVE_STATUSES = frozenset(
+    (DeliveryTaskStatus.READY, DeliveryTaskStatus.RUNNING, DeliveryTaskStatus.CANCELING)
+)
+
+log = logging.getLogger(__name__)
+
+
+class TaskError(ValueError):
+    """A task entry that cannot be executed; the message says why."""
+
+
+class _Run:
+    """Progress of the running task between ticks."""
+
+    __slots__ = ("task_id", "steps", "index", "started", "action_id", "deadline", "opened", "stop")
+
+    def __init__(self, task_id, steps):
+        self.task_id = task_id
+        self.steps = steps  # [(kind, argument, stage)], see TaskEngine._steps
+        self.index = 0
+        self.started = False  # whether the current step has been started
+        self.action_id = None  # MoveTo action of the current step
+        self.deadline = None  # end of the pickup wait, simulated time
+        self.opened = {}  # (cargo id, box index) -> Cargo, for boxes opened and not closed yet
+        self.stop = None  # (final status, reason) once cancelled or ended early
+
+
+def _timestamp():
+    return str(int(scheduler.now() * 1000))
+
+
+def _action_result(action):
+    """(result, reason) of a finished action: an ActionInfo or a spilled action dict."""
+    if isinstance(action, ActionInfo):
+        return action.state.result, action.state.reason
+    return action["state"]["result"], action["state"].get("reason", "")
+
+
+class TaskEngine:
+    def __init__(self, robot, retention=None):
+        self.robot = robot
+        self.retention = DEFAULT_RETENTION if retention is None else retention
+        self.execution_enabled = True
+        self._lock = metrics.lock("tasks")
+        self._tasks = {}  # task_id -> DeliveryTask: queued, running and recently finished
+        self._orders = {}  # order_id -> task_id
+        self._ready = collections.deque()  # task ids in submission order, cancelled ones included
+        self._queued = 0  # READY tasks
+        self._finished = collections.deque()  # task ids, oldest first
+        self._order_ids = itertools.count(1)
+        self._run = None
+        self._timer = None
+        self._pickup_ended = False
+
+    # --- queries ---
+
+    @property
+    def queued(self):
+        """Number of tasks waiting to run."""
+        return self._queued
+
+    def get(self, task_id):
+        return self._tasks.get(task_id)
+
+    def by_order(self, order_id):
+        task_id = self._orders.get(order_id)
+        return None if task_id is None else self._tasks.get(task_id)
+
+    def list(self, status=None, task_type=None):
+        """
+        Tasks in submission order: the active ones (READY, RUNNING, CANCELING)
+        by default, every retained task for status "all", else those of one
+        status. task_type filters by type, case-insensitively as in the spec.
+        """
+        if status is None:
+            statuses = ACTIVE_STATUSES
+        elif status.lower() == "all":
+            statuses = None
+        else:
+            statuses = {status.upper()}
+        with self._lock:
+            tasks = list(self._tasks.values())
+        return [
+            task
+            for task in tasks
+            if (statuses is None or task.status in statuses)
+            and (task_type is None or task.type.lower() == task_type.lower())
+        ]
+
+    # --- submission ---
+
+    def submit(self, entries):
+        """
+        Queues one task per spec PostTaskRequestEntry. Returns (order ids of
+        the queued tasks, errors [{"index", "reason"}] of the rejected entries).
+        """
+        boxes = {cargo.id: {box.id for box in cargo.boxes} for cargo in self.robot.cargos}
+        tasks, errors = [], []
+        for i, entry in enumerate(entries):
+            try:
+                tasks.append(self._new_task(entry, boxes))
+            except TaskError as e:
+                errors.append({"index": i, "reason": str(e)})
+
+        with self._lock:
+            for task in tasks:
+                task.order_id = f"{next(self._order_ids):08d}"
+                self._tasks[task.id] = task
+                self._orders[task.order_id] = task.id
+                self._ready.append(task.id)
+            self._queued += len(tasks)
+            self._wake()
+        if tasks:
+            log.info("Queued %d delivery tasks (%d waiting)", len(tasks), self._queued)
+        return [task.order_id for task in tasks], errors
+
+    @staticmethod
+    def _new_task(entry, boxes):
+        if not isinstance(entry, dict):
+            raise TaskError("not a task object")
+        location = entry.get("location") or {}
+        target = location.get("poi_name")
+        if target is None or target == "":
+            raise TaskError("location.poi_name is required")
+        try:
+            task_type = DeliveryTaskType(entry.get("type", DeliveryTaskType.TAKEOUT))
+        except ValueError:
+            raise TaskError(f"unknown task type {entry.get('type')!r}") from None
+
+        cargos = []
+        for cargo in entry.get("cargos") or []:
+            cargo_id = cargo.get("cargo_id")
+            if cargo_id not in boxes:
+                raise TaskError(f"unknown cargo {cargo_id}")
+            try:
+                box_ids = [int(box) for box in cargo.get("boxes") or []]
+            except (TypeError, ValueError):
+                raise TaskError(f"cargo {cargo_id}: box ids must be integers") from None
+            unknown = [box for box in box_ids if box not in boxes[cargo_id]]
+            if unknown:
+                raise TaskError(f"cargo {cargo_id} has no box {unknown[0]}")
+            cargos.append(TaskCargo(cargo_id, box_ids))
+
+        return DeliveryTask(
+            id=str(uuid.uuid4()),
+            order_id="",
+            type=task_type,
+            target=str(target),
+            task_points=[str(point) for point in location.get("task_points") or []],
+            cargos=cargos,
+            no_pickup_wait=bool(entry.get("no_pickup_wait", False)),
+            timestamp=_timestamp(),
+        )
+
+    # --- control ---
+
+    def cancel(self, task_id, status=DeliveryTaskStatus.CANCELED, reason="Canceled by user"):
+        """
+        Ends a queued or running task with 'status'. A running task first
+        stops its move and closes its boxes. Returns False if there is no
+        such unfinished task.
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.status in FINAL_STATUSES:
+                return False
+            self._end(task, status, reason)
+        return True
+
+    def cancel_order(self, order_id):
+        task_id = self._orders.get(order_id)
+        return task_id is not None and self.cancel(task_id)
+
+    def cancel_all(self, status=DeliveryTaskStatus.CANCELED, reason="Canceled by user"):
+        """Ends every queued and running task with 'status'. Returns how many."""
+        with self._lock:
+            ended = 0
+            for task_id in self._ready:
+                task = self._tasks.get(task_id)
+                if task is not None and task.status == DeliveryTaskStatus.READY:
+                    self._end(task, status, reason)
+                    ended += 1
+            if self._run is not None and self._run.stop is None:
+                self._end(self._tasks[self._run.task_id], status, reason)
+                ended += 1
+            self._ready.clear()
+        return ended
+
+    def set_execution(self, enabled):
+        """While disabled, no new task starts (the running one carries on)."""
+        with self._lock:
+            self.execution_enabled = bool(enabled)
+            self._wake()
+
+    def start_pickup(self):
+        with self._lock:
+            run = self._run
+            if run is not None and run.deadline is not None:
+                self._update(run.task_id, stage=DeliveryTaskStage.USER_OPERATE_ROBOT)
+
+    def end_pickup(self):
+        """Ends the pickup wait of the running task, which then closes its boxes."""
+        self._pickup_ended = True
+
+    # --- execution (scheduler thread) ---
+
+    def _wake(self):
+        """Starts ticking if there is something to do. Call with _lock held."""
+        if self._timer is None and (self._run is not None or (self._queued and self.execution_enabled)):
+            self._timer = scheduler.call_every(TASK_TICK, self._tick, delay=0)
+
+    def _tick(self):
+        with self._lock:
+            run = self._run
+            if run is None:
+                task = self._next_ready() if self.execution_enabled else None
+                if task is None:
+                    self._timer = None
+                    return False
+                run = self._run = self._begin(task)
+        # Robot calls happen outside the lock; only this thread advances the run
+        self._advance(run)
+        return True
+
+    def _next_ready(self):
+        while self._ready:
+            task = self._tasks.get(self._ready.popleft())
+            if task is not None and task.status == DeliveryTaskStatus.READY:
+                self._queued -= 1
+                return task
+        return None
+
+    def _begin(self, task):
+        self._update(task.id, status=DeliveryTaskStatus.RUNNING)
+        self._pickup_ended = False
+        self.robot.events.publish(
+            event_bus.DELIVERY_TASK_START, task_id=task.id, order_id=task.order_id, target=task.target
+        )
+        log.info("[Task %s] Started: %s to %s", task.order_id, task.type.value, task.target)
+        return _Run(task.id, self._steps(task))
+
+    def _steps(self, task):
+        """The steps of a task: (kind, argument, stage)."""
+        steps = []
+        for point in task.task_points:
+            steps.append(("move", point, DeliveryTaskStage.GOING_TO_TASK_POINT))
+            steps.append(("stage", None, DeliveryTaskStage.ARRIVED_AT_TASK_POINT))
+        steps.append(("move", task.target, DeliveryTaskStage.ON_DELIVERING))
+        steps.append(("stage", None, DeliveryTaskStage.ARRIVED_AT_DELIVERY_POSE))
+        cargos = {cargo.id: cargo for cargo in self.robot.cargos}
+        boxes = [
+            (cargos[entry.cargo_id], index)
+            for entry in task.cargos
+            if entry.cargo_id in cargos
+            for index, box in enumerate(cargos[entry.cargo_id].boxes)
+            if box.id in entry.boxes
+        ]
+        for cargo, index in boxes:
+            steps.append(("door", (cargo, index, DoorStatus.OPEN), DeliveryTaskStage.ROBOT_OPERATE_CABINET))
+        if boxes and not task.no_pickup_wait:
+            steps.append(("pickup", None, DeliveryTaskStage.USER_OPERATE_ROBOT))
+        for cargo, index in boxes:
+            steps.append(("door", (cargo, index, DoorStatus.CLOSED), DeliveryTaskStage.ROBOT_OPERATE_CABINET))
+        return steps
+
+    def _advance(self, run):
+        while run.stop is None and run.index < len(run.steps):
+            kind, argument, stage = run.steps[run.index]
+            if not run.started:
+                with self._lock:
+                    self._update(run.task_id, stage=stage)
+            outcome = getattr(self, f"_step_{kind}")(run, argument)
+            if outcome is False:
+                return  # waiting
+            if outcome is not True:
+                with self._lock:
+                    self._stop(run, DeliveryTaskStatus.FAILED, outcome)
+                break
+            run.index += 1
+            run.started = False
+
+        if run.stop is not None:
+            self._wind_down(run)
+        with self._lock:
+            status, reason = run.stop or (DeliveryTaskStatus.SUCCEEDED, "")
+            self._finish(run.task_id, status, reason)
+            self._run = None
+
+    # Steps return True when done, False while waiting, or the reason of a failure
+
+    def _step_stage(self, run, argument):
+        return True
+
+    def _step_move(self, run, poi_name):
+        robot = self.robot
+        if not run.started:
+            poi = robot.pois.get(poi_name) or next(
+                (p for p in robot.pois.values() if p.get("metadata", {}).get("display_name") == poi_name),
+                None,
+            )
+            if poi is None:
+                return f"POI {poi_name} not found"
+            action = robot.start_new_action(SlamtecActionName.MOVE_TO, {"target": poi["pose"]})
+            if action is None:
+                return False  # the action queue is full: try again next tick
+            run.started = True
+            run.action_id = action.action_id
+
+        finished = robot.action_history.get(run.action_id)
+        if finished is None:
+            return False
+        run.action_id = None
+        result, reason = _action_result(finished)
+        if result != SlamtecActionResult.SUCCESS:
+            return f"Moving to {poi_name} failed: {reason or SlamtecActionResult(result).name}"
+        return True
+
+    def _step_door(self, run, argument):
+        cargo, index, status = argument
+        if not run.started:
+            cargo.operation(status, index)
+            run.started = True
+        if cargo.boxes[index].door_status != status:
+            return False
+        if status == DoorStatus.OPEN:
+            run.opened[cargo.id, index] = cargo
+        else:
+            run.opened.pop((cargo.id, index), None)
+        return True
+
+    def _step_pickup(self, run, argument):
+        if not run.started:
+            run.deadline = scheduler.now() + PICKUP_TIMEOUT
+            run.started = True
+        if self._pickup_ended:
+            return True
+        if scheduler.now() >= run.deadline:
+            task = self._tasks[run.task_id]
+            self.robot.events.publish(event_bus.DELIVERY_NO_PICKUP, task_id=task.id, order_id=task.order_id)
+            return True
+        return False
+
+    def _wind_down(self, run):
+        """Stops what a cancelled or failed task left running: its move and its open boxes."""
+        if run.action_id is not None:
+            self.robot.cancel_action(run.action_id, "Delivery task ended")
+        for (_, index), cargo in run.opened.items():
+            cargo.operation(DoorStatus.CLOSED, index)
+        run.opened.clear()
+
+    # --- bookkeeping (with _lock held) ---
+
+    def _update(self, task_id, **changes):
+        task = self._tasks[task_id]
+        self._tasks[task_id] = dataclasses.replace(task, **changes, timestamp=_timestamp())
+
+    def _stop(self, run, status, reason):
+        if run.stop is None:
+            run.stop = (status, reason)
+
+    def _end(self, task, status, reason):
+        """Ends a READY task at once; asks a running one to stop."""
+        run = self._run
+        if run is not None and run.task_id == task.id:
+            self._stop(run, status, reason)
+            if status == DeliveryTaskStatus.CANCELED:
+                self._update(task.id, status=DeliveryTaskStatus.CANCELING)
+        else:
+            self._queued -= 1
+            self._finish(task.id, status, reason)
+
+    def _finish(self, task_id, status, reason):
+        self._update(task_id, status=status, reason=reason)
+        task = self._tasks[task_id]
+        self._finished.append(task_id)
+        while len(self._finished) > self.retention:
+            old = self._tasks.pop(self._finished.popleft(), None)
+            if old is not None:
+                self._orders.pop(old.order_id, None)
+        self.robot.events.publish(
+            event_bus.DELIVERY_TASK_FINISHED,
+            task_id=task_id,
+            order_id=task.order_id,
+            status=status.value,
+            reason=reason,
+        )
+        log.info("[Task %s] %s %s", task.order_id, status.value, reason)
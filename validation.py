@@ -0,0 +1,286 @@
+# slamtec_emulator/validation.py
+"""
+Request validation against the spec: JSON request bodies against their
+requestBody schema, path and query parameters against theirs.
+
+Every schema is compiled once, at route creation, into nested check
+functions with their error locations baked in. Validating a request then
+costs a few function calls per field and no schema lookups. Supported
+keywords: type, enum, properties, required, items, minimum, maximum,
+nullable, oneOf/anyOf/allOf and $ref. Formats (uuid, date-time, ...) are
+not checked, so clients can keep using readable ids.
+
+EMULATOR_VALIDATION (or --validation) selects the mode:
+
+* strict (default): invalid requests get a 400 {"error": ...} and never
+  reach their handler.
+* warn: invalid requests are logged and handled anyway.
+* off: views are not wrapped at all.
+"""
+
+import functools
+import logging
+import os
+
+from flask import jsonify, request
+
+from spec import resolve
+
+log = logging.getLogger(__name__)
+
+STRICT = "strict"
+WARN = "warn"
+OFF = "off"
+MODES = (STRICT, WARN, OFF)
+
+# Python types of the JSON values of each schema type (type(True) is bool, so
+# booleans never pass as integers)
+JSON_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+}
+
+# Schema keys that do not constrain a value
+ANNOTATIONS = frozenset(("description", "example", "default", "format", "title"))
+
+# Parsers of path and query parameters (always strings) by schema type
+PARAMETER_PARSERS = {"integer": int, "number": float, "boolean": lambda v: {"true": True, "false": False}[v]}
+
+
+class Invalid(ValueError):
+    """A request does not match the spec; the message says where and why."""
+
+
+def _all(checks):
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value):
+        for check in checks:
+            check(value)
+
+    return check_all
+
+
+def _type_check(kind, nullable, where):
+    types = JSON_TYPES[kind] + ((type(None),) if nullable else ())
+
+    def check_type(value):
+        if type(value) not in types:
+            raise Invalid(f"{where}: expected {kind}")
+
+    return check_type
+
+
+def _enum_check(values, where):
+    try:
+        allowed = frozenset(values)
+    except TypeError:
+        allowed = tuple(values)
+
+    def check_enum(value):
+        if value not in allowed:
+            raise Invalid(f"{where}: must be one of {list(values)}")
+
+    return check_enum
+
+
+def _range_check(minimum, maximum, where):
+    def check_range(value):
+        if type(value) is bool or type(value) not in (int, float):
+            return
+        if minimum is not None and value < minimum:
+            raise Invalid(f"{where}: must be >= {minimum}")
+        if maximum is not None and value > maximum:
+            raise Invalid(f"{where}: must be <= {maximum}")
+
+    return check_range
+
+
+def _object_check(leaves, properties, required, where):
+    """
+    Checks an object: its type, its required names, the types of its plain
+    typed properties ('leaves', checked inline) and its other properties.
+    """
+    leaves = tuple(leaves.items())
+    properties = tuple(properties.items())
+    required = tuple(required)
+
+    def check_object(value):
+        if type(value) is not dict:
+            raise Invalid(f"{where}: expected object")
+        for name in required:
+            if name not in value:
+                raise Invalid(f"{where}.{name}: required")
+        for name, (types, kind) in leaves:
+            if name in value and type(value[name]) not in types:
+                raise Invalid(f"{where}.{name}: expected {kind}")
+        for name, check in properties:
+            if name in value:
+                check(value[name])
+
+    return check_object
+
+
+def _items_check(check_item):
+    def check_items(value):
+        if type(value) is list:
+            for item in value:
+                check_item(item)
+
+    return check_items
+
+
+def _any_check(options, where):
+    def check_any(value):
+        for option in options:
+            try:
+                option(value)
+                return
+            except Invalid:
+                pass
+        raise Invalid(f"{where}: matches none of the allowed schemas")
+
+    return check_any
+
+
+class SchemaCompiler:
+    """Compiles schemas into check functions, sharing one function per ($ref, location)."""
+
+    def __init__(self, schemas):
+        self.root = {"components": {"schemas": schemas}}
+        self._refs = {}
+
+    def compile(self, schema, where):
+        """Returns check(value), which raises Invalid when value does not match 'schema'."""
+        ref = schema.get("$ref")
+        if ref is not None:
+            key = (ref, where)
+            if key not in self._refs:
+                self._refs[key] = None  # being compiled: a recursive use binds late
+                self._refs[key] = self.compile(resolve(self.root, schema), where)
+            check = self._refs[key]
+            return check if check is not None else lambda value: self._refs[key](value)
+
+        checks = []
+        kind = schema.get("type", "object" if "properties" in schema else None)
+        nullable = schema.get("nullable", False)
+        if kind == "object" and not nullable and ("properties" in schema or "required" in schema):
+            leaves, properties = {}, {}
+            for name, prop in schema.get("properties", {}).items():
+                if prop.keys() - ANNOTATIONS == {"type"} and prop["type"] in JSON_TYPES:
+                    leaves[name] = (JSON_TYPES[prop["type"]], prop["type"])
+                else:
+                    properties[name] = self.compile(prop, f"{where}.{name}")
+            checks.append(_object_check(leaves, properties, schema.get("required", ()), where))
+        elif kind in JSON_TYPES:
+            checks.append(_type_check(kind, nullable, where))
+        if schema.get("enum"):
+            checks.append(_enum_check(schema["enum"], where))
+        if "minimum" in schema or "maximum" in schema:
+            checks.append(_range_check(schema.get("minimum"), schema.get("maximum"), where))
+        if "items" in schema:
+            checks.append(_items_check(self.compile(schema["items"], f"{where}[]")))
+        for key in ("oneOf", "anyOf"):
+            if schema.get(key):
+                checks.append(_any_check([self.compile(s, where) for s in schema[key]], where))
+        for part in schema.get("allOf", ()):
+            checks.append(self.compile(part, where))
+        return _all(checks) if checks else lambda value: None
+
+
+def _parameter_check(compiler, name, location, required, schema):
+    """check(view kwargs, query args) of one path or query parameter."""
+    where = f"{location} parameter {name}"
+    kind = resolve(compiler.root, schema).get("type")
+    parse = PARAMETER_PARSERS.get(kind)
+    check = compiler.compile(schema, where)
+
+    def check_parameter(kwargs, args):
+        raw = kwargs.get(name) if location == "path" else args.get(name)
+        if raw is None:
+            if required:
+                raise Invalid(f"{where}: required")
+            return
+        if parse is not None:
+            try:
+                raw = parse(raw)
+            except (ValueError, KeyError):
+                raise Invalid(f"{where}: expected {kind}") from None
+        check(raw)
+
+    return check_parameter
+
+
+def _body_check(compiler, required, schema):
+    """check(request) of a JSON request body."""
+    check = compiler.compile(schema, "body")
+
+    def check_body(request):
+        data = request.get_json(silent=True)
+        if data is None:
+            if request.get_data(cache=True):
+                raise Invalid("body: not a JSON document (Content-Type: application/json)")
+            if required:
+                raise Invalid("body: required")
+            return
+        check(data)
+
+    return check_body
+
+
+def compile_operation(compiler, parameters, body):
+    """Returns validate(request, view kwargs) -> error message or None for one operation."""
+    parameter_checks = [_parameter_check(compiler, *parameter) for parameter in parameters]
+    body_check = _body_check(compiler, *body) if body else None
+
+    def validate(request, kwargs):
+        try:
+            for check in parameter_checks:
+                check(kwargs, request.args)
+            if body_check is not None:
+                body_check(request)
+        except Invalid as e:
+            return str(e)
+        return None
+
+    return validate
+
+
+def validated(validate, view, mode):
+    """Wraps a Flask view function to validate its requests first."""
+
+    @functools.wraps(view)
+    def validated_view(*args, **kwargs):
+        error = validate(request, kwargs)
+        if error is not None:
+            if mode == STRICT:
+                return jsonify({"error": error}), 400
+            log.warning("Invalid request %s %s: %s", request.method, request.path, error)
+        return view(*args, **kwargs)
+
+    return validated_view
+
+
+def install(app, requests, endpoint_name, mode=None):
+    """
+    Wraps the views of 'app' whose operations have a request schema.
+    'requests' is spec.load_requests(), endpoint_name(method, path) names the
+    Flask endpoint of a spec operation.
+    """
+    mode = (mode or os.environ.get("EMULATOR_VALIDATION") or STRICT).lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown validation mode {mode!r}, expected one of {', '.join(MODES)}")
+    if mode == OFF:
+        return
+
+    compiler = SchemaCompiler(requests["schemas"])
+    for method, path, parameters, body in requests["operations"]:
+        endpoint = endpoint_name(method, path)
+        if endpoint in app.view_functions:
+            validate = compile_operation(compiler, parameters, body)
+            app.view_functions[endpoint] = validated(validate, app.view_functions[endpoint], mode)
@@ -0,0 +1,499 @@
+# slamtec_emulator/world.py
+"""
+The building the fleet works in: its floors, each with its own map, POIs and
+home docks, and its elevators, shared by every robot of the process.
+
+EMULATOR_WORLD (or --world) describes it:
+
+* unset: one floor ("PDD" / "0402") on the default map, as before.
+* "building:<floors>[:<elevators>[:<capacity>]]": a generated building with
+  floors 1F..<floors>F, all on the default map, and <elevators> cars
+  (default 2, each carrying <capacity> robots, default 2) serving every floor
+  from the corridor of the office map. Every floor has a POI "<floor>-<room>"
+  at the centre of each office room, and 1F has a home dock.
+* a JSON file:
+
+    {
+      "building": "HQ",
+      "floors": [
+        {"floor": "1F", "map": "maps/1f.stcm", "default": true,
+         "pois": [{"id": "...", "pose": {"x": 1, "y": 2, "yaw": 0}, "metadata": {"display_name": "101"}}],
+         "homedocks": [{"id": "...", "dock_name": "dock", "pose": {"x": 5, "y": 3, "yaw": 0}}]},
+        {"floor": "2F", "map": "office:60"}
+      ],
+      "elevators": [
+        {"elevator_id": "E1", "floors": ["1F", "2F"], "pose": {"x": 0, "y": 0, "yaw": 0},
+         "capacity": 2, "travel_time": 2.0, "door_time": 4.0}
+      ]
+    }
+
+  "map" is a load_map() source (default: the default map). Floors that share
+  a source share one map, and a floor's map is only loaded when a robot first
+  needs it. Robots keep their own copy of a floor's POIs and artifacts from
+  their first visit (see RobotState.change_floor).
+
+Elevators are simulated event by event on the scheduler: a timer per floor
+travelled and per door cycle, however many robots ride or wait. Waiting
+robots are told when they board and when they arrive instead of polling.
+With serve.py every worker process has its own building.
+"""
+
+import collections
+import json
+import logging
+import math
+import os
+import threading
+import uuid
+
+from occupancy_map import get_default_map, load_map
+from scheduler import scheduler
+
+# The floor robots start on without a world description
+DEFAULT_BUILDING = "PDD"
+DEFAULT_FLOOR = "0402"
+DEFAULT_MAP_ID = "3fa85f64-5717-4562-b3fc-2c963f66afa6"
+DEFAULT_DOCK = {
+    "id": "0f3c3f0e-9f4b-4f7e-8f53-2d1c4b7a9e01",
+    "dock_name": "Charging Station",
+    "pose": {"x": 5.0, "y": 3.0, "yaw": 0.0},
+}
+
+# Elevator defaults: seconds per floor travelled, seconds the doors stay open
+TRAVEL_TIME = 2.0
+DOOR_TIME = 4.0
+
+# Distance from the cabin centre within which a robot is at the elevator sill
+SILL_DISTANCE = 1.0
+
+# Generated buildings: elevators 4 m apart along the office corridor, robots
+# wait for them 1.2 m away, rooms are 8 m wide on both sides of a 4 m corridor
+ELEVATOR_SPACING = 4.0
+WAITING_OFFSET = 1.2
+OFFICE_ROOM = 8.0
+OFFICE_CORRIDOR = 2.0
+
+log = logging.getLogger(__name__)
+
+
+class WorldError(ValueError):
+    """Raised for an invalid world description."""
+
+
+def _namespace_id(*parts):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "emulator:" + "/".join(parts)))
+
+
+class Floor:
+    """A floor of the building: its map (loaded on first use), seed POIs and home docks."""
+
+    __slots__ = ("world", "building", "name", "order", "default", "source", "map_id", "_pois", "homedocks")
+
+    def __init__(
+        self, world, building, name, order, default=False, source=None, map_id=None, pois=None, homedocks=()
+    ):
+        self.world = world
+        self.building = building
+        self.name = name
+        self.order = order
+        self.default = default
+        self.source = source  # load_map() source, None for the default map
+        self.map_id = map_id or _namespace_id(building, name)
+        self._pois = pois  # list, a callable(floor) building it, or None for RobotState's
+        self.homedocks = [
+            {
+                **dock,
+                "floor": name,
+                "building": building,
+                "id": dock.get("id") or _namespace_id(building, name, str(i)),
+            }
+            for i, dock in enumerate(homedocks)
+        ]
+
+    @property
+    def map(self):
+        return self.world.map_for(self.source)
+
+    @property
+    def pois(self):
+        """The POIs a robot finds on its first visit (spec POI dicts), or None."""
+        if callable(self._pois):
+            self._pois = self._pois(self)
+        return self._pois
+
+    def info(self):
+        """The spec's FloorInfo."""
+        return {
+            "building": self.building,
+            "floor": self.name,
+            "order": self.order,
+            "is_default_floor": self.default,
+        }
+
+
+class Elevator:
+    """
+    A car serving some floors. Robots call it to their floor and board in
+    call order while it has room, then ride to their destination. It serves
+    the calls ahead in its direction of travel before turning around
+    (collective control), and idles where it is when there are none.
+
+    Robots are told through robot.elevator_boarded(elevator) and
+    robot.elevator_arrived(elevator, floor), called with the elevator's lock
+    held: they must not call back into the elevator.
+    """
+
+    def __init__(self, elevator_id, floors, pose, capacity=1, travel_time=TRAVEL_TIME, door_time=DOOR_TIME,
+                 door_type="front_door", waiting_pose=None):
+        if not floors:
+            raise WorldError(f"Elevator {elevator_id} serves no floor")
+        self.id = elevator_id
+        self.floors = list(floors)  # floor names, bottom to top
+        self._index = {name: i for i, name in enumerate(self.floors)}
+        self.pose = {key: float(pose.get(key, 0.0)) for key in ("x", "y", "yaw")}
+        self.waiting_pose = waiting_pose or {
+            "x": self.pose["x"] + WAITING_OFFSET * math.cos(self.pose["yaw"]),
+            "y": self.pose["y"] + WAITING_OFFSET * math.sin(self.pose["yaw"]),
+            "yaw": self.pose["yaw"] + math.pi,
+        }
+        self.capacity = int(capacity)
+        self.travel_time = float(travel_time)
+        self.door_time = float(door_time)
+        self.door_type = door_type
+
+        self.position = 0  # floor index the car is at, or left last
+        self.direction = 0  # +1 up, -1 down, 0 idle
+        self.moving = False
+        self.doors_open = False
+        self.riders = {}  # robot -> destination floor index, or None until known
+        self.waiting = collections.defaultdict(collections.deque)  # floor index -> robots, in call order
+        self.reserved = set()  # robots on their way to call the car, counted by eta()
+        self._destinations = {}  # waiting robot -> destination floor index or None
+        self.floors_travelled = 0
+        self._lock = threading.Lock()
+
+    def serves(self, floor):
+        return floor in self._index
+
+    @property
+    def floor(self):
+        return self.floors[self.position]
+
+    # --- requests (any thread) ---
+
+    def reserve(self, robot):
+        """Counts 'robot' as a future caller in eta(), until it calls or cancels."""
+        with self._lock:
+            self.reserved.add(robot)
+
+    def call(self, robot, floor, destination=None):
+        """Calls the car to 'floor' for 'robot', going to 'destination' (or None: told later)."""
+        with self._lock:
+            self.reserved.discard(robot)
+            index = self._index[floor]
+            self.waiting[index].append(robot)
+            self._destinations[robot] = None if destination is None else self._index[destination]
+            if self.doors_open and self.position == index:
+                self._board()
+            elif not self.moving and not self.doors_open:
+                self._dispatch()
+
+    def cancel(self, robot):
+        """Withdraws the call or reservation of a robot that has not boarded. Returns whether it had called."""
+        with self._lock:
+            self.reserved.discard(robot)
+            if robot not in self._destinations:
+                return False
+            del self._destinations[robot]
+            for index, queue in list(self.waiting.items()):
+                if robot in queue:
+                    queue.remove(robot)
+                    if not queue:
+                        del self.waiting[index]
+            return True
+
+    def remove(self, robot):
+        """Forgets a robot, waiting or riding, that was put elsewhere (a snapshot was restored)."""
+        self.cancel(robot)
+        with self._lock:
+            self.riders.pop(robot, None)
+
+    def send(self, robot, floor):
+        """Sets the destination of a rider. Returns False if the robot is not riding."""
+        with self._lock:
+            if robot not in self.riders:
+                return False
+            self.riders[robot] = self._index[floor]
+            if not self.moving and not self.doors_open:
+                self._dispatch()
+            return True
+
+    def riding(self, robot):
+        return robot in self.riders
+
+    def destination(self, robot):
+        """The floor a rider is going to, or None."""
+        index = self.riders.get(robot)
+        return None if index is None else self.floors[index]
+
+    def waiting_count(self):
+        return sum(len(queue) for queue in list(self.waiting.values()))
+
+    def eta(self, floor):
+        """Rough seconds until the car could pick a robot up at 'floor', for choosing a car."""
+        index = self._index[floor]
+        queued = self.waiting_count() + len(self.riders) + len(self.reserved)
+        trips = queued // max(self.capacity, 1)
+        return abs(self.position - index) * self.travel_time + trips * (self.door_time + self.travel_time)
+
+    # --- simulation (with _lock held) ---
+
+    def _stops(self):
+        """Floor indices the car has to stop at: rider destinations, and calls while it has room."""
+        stops = {destination for destination in self.riders.values() if destination is not None}
+        if len(self.riders) < self.capacity:
+            stops.update(self.waiting)
+        return stops
+
+    def _dispatch(self):
+        """Opens the doors here or sets off towards the next stop, if there is one."""
+        stops = self._stops()
+        if not stops:
+            self.direction = 0
+            return
+        if self.position in stops:
+            self._open()
+            return
+        ahead = [stop for stop in stops if (stop - self.position) * self.direction > 0]
+        if not ahead:
+            nearest = min(stops, key=lambda stop: abs(stop - self.position))
+            self.direction = 1 if nearest > self.position else -1
+        self.moving = True
+        scheduler.call_later(self.travel_time, self._step)
+
+    def _step(self):
+        with self._lock:
+            self.position += self.direction
+            self.floors_travelled += 1
+            self.moving = False
+            self._dispatch()
+
+    def _open(self):
+        self.doors_open = True
+        for robot, destination in list(self.riders.items()):
+            if destination == self.position:
+                del self.riders[robot]
+                robot.elevator_arrived(self, self.floors[self.position])
+        self._board()
+        scheduler.call_later(self.door_time, self._close)
+
+    def _board(self):
+        queue = self.waiting.get(self.position)
+        while queue and len(self.riders) < self.capacity:
+            robot = queue.popleft()
+            self.riders[robot] = self._destinations.pop(robot, None)
+            robot.elevator_boarded(self)
+        if queue is not None and not queue:
+            del self.waiting[self.position]
+
+    def _close(self):
+        with self._lock:
+            self.doors_open = False
+            self._dispatch()
+
+    # --- views ---
+
+    def info(self):
+        """The spec's ElevatorInfo."""
+        return {
+            "elevator_id": self.id,
+            "door_type": self.door_type,
+            "front_scheduling_poses": [{**self.waiting_pose, "z": 0.0, "pitch": 0.0, "roll": 0.0}],
+            "rear_scheduling_poses": [],
+        }
+
+    def status(self):
+        """The car's live state (emulator extension)."""
+        return {
+            "elevator_id": self.id,
+            "floor": self.floor,
+            "direction": {1: "up", -1: "down"}.get(self.direction, "idle"),
+            "moving": self.moving,
+            "doors_open": self.doors_open,
+            "riders": len(self.riders),
+            "capacity": self.capacity,
+            "waiting": {self.floors[index]: len(queue) for index, queue in list(self.waiting.items())},
+            "floors_travelled": self.floors_travelled,
+        }
+
+
+class World:
+    """The building: floors by name (in order) and elevators by id."""
+
+    def __init__(self, building=DEFAULT_BUILDING):
+        self.building = building
+        self.floors = {}  # name -> Floor, bottom to top
+        self.elevators = {}  # id -> Elevator
+        self._maps = {}  # load_map() source -> OccupancyMap
+        self._maps_lock = threading.Lock()
+
+    def add_floor(self, name, **kwargs):
+        if name in self.floors:
+            raise WorldError(f"Duplicate floor {name}")
+        floor = Floor(self, self.building, name, len(self.floors), **kwargs)
+        self.floors[name] = floor
+        return floor
+
+    def add_elevator(self, elevator):
+        unknown = [name for name in elevator.floors if name not in self.floors]
+        if unknown:
+            raise WorldError(f"Elevator {elevator.id} serves unknown floors {unknown}")
+        elevator.floors.sort(key=lambda name: self.floors[name].order)
+        elevator._index = {name: i for i, name in enumerate(elevator.floors)}
+        self.elevators[elevator.id] = elevator
+
+    @property
+    def default_floor(self):
+        floors = list(self.floors.values())
+        return next((floor for floor in floors if floor.default), floors[0])
+
+    def floor(self, name, building=None):
+        """The floor called 'name' (in 'building' if given), or None."""
+        if building not in (None, "", self.building):
+            return None
+        return self.floors.get(name)
+
+    def map_for(self, source):
+        if source is None:
+            return get_default_map()
+        occupancy_map = self._maps.get(source)
+        if occupancy_map is None:
+            with self._maps_lock:
+                occupancy_map = self._maps.get(source)
+                if occupancy_map is None:
+                    log.info("Loading floor map %s", source)
+                    occupancy_map = self._maps[source] = load_map(source)
+        return occupancy_map
+
+    def elevator_between(self, start, goal):
+        """The elevator serving both floors that could pick a robot up at 'start' first, or None."""
+        candidates = [e for e in self.elevators.values() if e.serves(start) and e.serves(goal)]
+        return min(candidates, key=lambda elevator: elevator.eta(start), default=None)
+
+    def homedock(self, dock_id):
+        """(floor, dock) of a home dock id, or (None, None)."""
+        for floor in self.floors.values():
+            for dock in floor.homedocks:
+                if dock["id"] == dock_id:
+                    return floor, dock
+        return None, None
+
+
+def _office_pois(floor):
+    """A POI at the centre of every room of an office map (see generate_office_map)."""
+    occupancy_map = floor.map
+    width = occupancy_map.width * occupancy_map.resolution
+    height = occupancy_map.height * occupancy_map.resolution
+    center_y = occupancy_map.origin_y + height / 2
+    room_y = (height / 2 + OFFICE_CORRIDOR) / 2
+    pois = []
+    for side, y in (("N", center_y + room_y), ("S", center_y - room_y)):
+        for i, left in enumerate(range(0, int(width // OFFICE_ROOM) + 1)):
+            x0 = left * OFFICE_ROOM
+            x1 = min(x0 + OFFICE_ROOM, width)
+            if x1 - x0 < 1.0:
+                continue
+            name = f"{floor.name}-{side}{i + 1:02d}"
+            pois.append(
+                {
+                    "id": _namespace_id(floor.building, floor.name, name),
+                    "pose": {"x": occupancy_map.origin_x + (x0 + x1) / 2, "y": y, "yaw": 0.0},
+                    "metadata": {"display_name": name, "type": "ROOM"},
+                }
+            )
+    return pois
+
+
+def generate_building(floors, elevators=2, capacity=2):
+    """A building of 'floors' floors on the default map with 'elevators' cars serving all of them."""
+    world = World()
+    for i in range(1, floors + 1):
+        world.add_floor(
+            f"{i}F",
+            default=i == 1,
+            pois=_office_pois,
+            homedocks=[DEFAULT_DOCK] if i == 1 else (),
+        )
+    names = list(world.floors)
+    for i in range(elevators):
+        x = ELEVATOR_SPACING * (i - (elevators - 1) / 2)
+        yaw = math.pi / 2 if i % 2 else -math.pi / 2  # waiting on alternate sides of the corridor
+        world.add_elevator(Elevator(f"E{i + 1}", names, {"x": x, "y": 0.0, "yaw": yaw}, capacity))
+    return world
+
+
+def load_world(source=None):
+    """Builds the World described by 'source' (see the module docstring)."""
+    if not source:
+        world = World()
+        world.add_floor(DEFAULT_FLOOR, default=True, map_id=DEFAULT_MAP_ID, homedocks=[DEFAULT_DOCK])
+        return world
+    if source.startswith("building:"):
+        try:
+            numbers = [int(n) for n in source.split(":")[1:]]
+            return generate_building(*numbers)
+        except (TypeError, ValueError) as e:
+            raise WorldError(f"Invalid generated building {source!r}: {e}") from None
+
+    try:
+        with open(source) as f:
+            config = json.load(f)
+        world = World(config.get("building", DEFAULT_BUILDING))
+        for floor in config["floors"]:
+            world.add_floor(
+                str(floor["floor"]),
+                default=bool(floor.get("default", False)),
+                source=floor.get("map"),
+                map_id=floor.get("map_id"),
+                pois=floor.get("pois", []),
+                homedocks=floor.get("homedocks", []),
+            )
+        for elevator in config.get("elevators", []):
+            world.add_elevator(
+                Elevator(
+                    str(elevator["elevator_id"]),
+                    [str(name) for name in elevator["floors"]],
+                    elevator.get("pose", {}),
+                    elevator.get("capacity", 1),
+                    elevator.get("travel_time", TRAVEL_TIME),
+                    elevator.get("door_time", DOOR_TIME),
+                    elevator.get("door_type", "front_door"),
+                    elevator.get("waiting_pose"),
+                )
+            )
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise WorldError(f"Cannot read world file {source}: {e!r}") from None
+    if not world.floors:
+        raise WorldError(f"World file {source} has no floors")
+    return world
+
+
+_world = None
+_world_lock = threading.Lock()
+
+
+def get_world():
+    """The building of this process, loaded from EMULATOR_WORLD on first use."""
+    global _world
+    if _world is None:
+        with _world_lock:
+            if _world is None:
+                _world = load_world(os.environ.get("EMULATOR_WORLD"))
+    return _world
+
+
+def set_world(world):
+    """Replaces the building; robots created before keep the one they were given."""
+    global _world
+    with _world_lock:
+        _world = world